@@ -0,0 +1,133 @@
+"""
+Perfiles de cuentas de Cocos y ejecución de una tarea para varias cuentas en paralelo.
+
+Las cuentas comparten los recursos costosos de crear (cliente de Google Sheets, cache de precios y
+limitador de escrituras) y cada una usa sus propios archivos de estado y su propia solapa.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import USER, PASS, GOOGLE_SHEET_FILE, SHEET_TAB, JSONGOOGLEFILE
+from daily_total import TOTAL_DAILY_TAB
+from log_config import get_logger
+from settings import ACCOUNTS, ACCOUNT_WORKERS, PRICE_CACHE_TTL, PRICE_CACHE_MAX_ENTRIES, PRICE_CACHE_FILE, \
+    SHEETS_WRITES_PER_MINUTE, MONTHLY_PERFORMANCE_TAB
+
+logger = get_logger(__name__)
+
+
+class AccountProfile:
+    """
+    Una cuenta de Cocos y dónde se guardan sus datos.
+
+    Args:
+        name (str): Nombre de la cuenta. Se agrega a los archivos de estado ('sync_state.<name>.json') y a las
+            solapas por defecto ('Operaciones - <name>'). None es la cuenta única de config.py, con los
+            archivos y solapas de siempre.
+        user (str), password (str): Credenciales de Cocos.
+        sheet_file (str): Documento de Google Sheets. Por defecto GOOGLE_SHEET_FILE.
+        sheet_tab (str), total_tab (str), monthly_tab (str): Solapas de operaciones, del total diario y del
+            rendimiento mensual.
+    """
+
+    def __init__(self, name, user, password, sheet_file=None, sheet_tab=None, total_tab=None, monthly_tab=None):
+        self.name = name
+        self.user = user
+        self.password = password
+        self.sheet_file = sheet_file or GOOGLE_SHEET_FILE
+        self.sheet_tab = sheet_tab or self._tab(SHEET_TAB)
+        self.total_tab = total_tab or self._tab(TOTAL_DAILY_TAB)
+        self.monthly_tab = monthly_tab or self._tab(MONTHLY_PERFORMANCE_TAB)
+
+    @classmethod
+    def from_config(cls, entry):
+        return cls(entry['name'], entry['user'], entry['password'], entry.get('sheet_file'),
+                   entry.get('sheet_tab'), entry.get('total_tab'), entry.get('monthly_tab'))
+
+    def state_file(self, path):
+        """Ruta del archivo de estado 'path' para esta cuenta."""
+        if not self.name or not path:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.name}{ext}"
+
+    def _tab(self, tab_name):
+        return f"{tab_name} - {self.name}" if self.name else tab_name
+
+    def __repr__(self):
+        return f"AccountProfile({self.name or 'default'!r})"
+
+
+def load_accounts(names=None, entries=None):
+    """
+    Devuelve los perfiles configurados en ACCOUNTS (o la cuenta única de config.py si no hay), filtrados
+    por 'names' si se indica.
+
+    Raises:
+        ValueError: si algún nombre no corresponde a una cuenta configurada.
+    """
+    entries = ACCOUNTS if entries is None else entries
+    accounts = [AccountProfile.from_config(entry) for entry in entries] or [AccountProfile(None, USER, PASS)]
+    if not names:
+        return accounts
+
+    by_name = {account.name: account for account in accounts}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Cuentas desconocidas: {', '.join(unknown)}")
+    return [by_name[name] for name in names]
+
+
+class SharedResources:
+    """
+    Recursos compartidos por todas las cuentas de una ejecución.
+
+    Attributes:
+        sheets (SheetsClient): Un solo cliente de Google Sheets: se autentica una vez.
+        price_cache (PriceCache): Los precios que consulta una cuenta los reutilizan las demás.
+        limiter (TokenBucket): La cuota de escrituras de Google Sheets es del usuario de servicio, no de la cuenta.
+        login_lock (Lock): Los logins se hacen de a uno, porque los códigos 2FA llegan a la misma casilla de Gmail.
+    """
+
+    def __init__(self, sheets=None, price_cache=None, limiter=None):
+        self.sheets = sheets
+        self.price_cache = price_cache
+        self.limiter = limiter
+        self.login_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        from price_cache import PriceCache
+        from rate_limiter import TokenBucket
+        from sheet_connection import SheetsClient
+
+        return cls(SheetsClient(JSONGOOGLEFILE),
+                   PriceCache(PRICE_CACHE_TTL, max_entries=PRICE_CACHE_MAX_ENTRIES, path=PRICE_CACHE_FILE),
+                   TokenBucket(SHEETS_WRITES_PER_MINUTE))
+
+
+def run_accounts(task, accounts, max_workers=None):
+    """
+    Ejecuta task(account) para cada cuenta, en paralelo con hasta 'max_workers' threads (por defecto
+    ACCOUNT_WORKERS). Con un solo worker las cuentas se procesan de a una en el thread que llama.
+
+    La falla de una cuenta no corta las demás: se registra y su resultado queda en None.
+
+    Returns:
+        list: El resultado de cada cuenta, en el mismo orden que 'accounts'.
+    """
+    def run(account):
+        try:
+            return task(account)
+        except Exception:
+            logger.error("Falló la sincronización de la cuenta %s", account.name or 'default', exc_info=True)
+            return None
+
+    max_workers = ACCOUNT_WORKERS if max_workers is None else max_workers
+    if len(accounts) <= 1 or max_workers <= 1:
+        return [run(account) for account in accounts]
+
+    workers = min(max_workers, len(accounts))
+    logger.info("Sincronizando %s cuentas con %s workers", len(accounts), workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, accounts))
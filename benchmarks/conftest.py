@@ -0,0 +1,11 @@
+"""Configuración de los benchmarks: sin config.py usa la misma configuración de prueba que los tests."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    import tests.conftest  # noqa: F401  (registra el config de prueba)
@@ -0,0 +1,325 @@
+"""
+Servidor HTTP local que imita los endpoints de la API de Cocos que usa el cliente (cocos.py).
+
+Sirve para correr el flujo completo sin credenciales ni correo, y para medir cómo se comporta el
+cliente con un servidor lento o inestable: permite inyectar latencia, errores 5xx y respuestas 429
+con Retry-After, y elegir el tamaño del set de transferencias.
+
+Uso desde código:
+
+    with FakeCocosServer(rows=10000, faults=FaultProfile(latency=0.05, rate_limit_rate=0.1)) as server:
+        cocos = CocosCapital('user', 'pass', base_url=server.url,
+                             two_factor_code_provider=server.two_factor_code_provider)
+
+Uso desde la línea de comandos (y COCOS_BASE_URL = 'http://127.0.0.1:8080' en config.py). Con --no-2fa el
+servidor no ofrece un factor 2FA, así main.py hace el login sin esperar el correo:
+
+    python -m benchmarks.fake_cocos_server --port 8080 --rows 10000 --latency 0.05 --error-rate 0.05 --no-2fa
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from benchmarks.synthetic import generate_transfers
+
+ACCOUNT_ID = 12345
+FACTOR_ID = 'fake-factor'
+TWO_FACTOR_CODE = '123456'
+
+TICKER_PATH = re.compile(r'^/api/v1/markets/tickers/([^/]+)$')
+FACTOR_PATH = re.compile(r'^/auth/v1/factors/([^/]+)/(challenge|verify)$')
+
+
+class FaultProfile:
+    """
+    Fallas a inyectar en las respuestas de los endpoints cuyo path empieza con 'paths'.
+
+    Args:
+        latency (float): Segundos de demora de cada respuesta.
+        jitter (float): Demora adicional aleatoria, entre 0 y 'jitter' segundos.
+        error_rate (float): Proporción de respuestas 503.
+        rate_limit_rate (float): Proporción de respuestas 429.
+        retry_after (int): Valor del header Retry-After de las respuestas 429.
+        paths (tuple): Prefijos de los paths afectados. Por defecto sólo /api/, así el login no falla.
+        seed (int): Semilla de las fallas aleatorias.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=0,
+                 paths=('/api/',), seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.paths = paths
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def applies_to(self, path):
+        return path.startswith(self.paths)
+
+    def delay(self):
+        with self._lock:
+            return self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+
+    def failure(self):
+        """Devuelve el status de la falla a inyectar (429 o 503), o None."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+
+class FakeCocosServer:
+    """
+    Servidor de prueba de la API de Cocos, en un thread propio.
+
+    Args:
+        transfers (list): Transferencias a servir. Si no se pasan, se generan 'rows' con el generador sintético.
+        rows (int): Cantidad de transferencias sintéticas.
+        tickers (int): Cantidad de tickers de las transferencias sintéticas.
+        faults (FaultProfile): Fallas a inyectar. Por defecto ninguna.
+        user (str), password (str): Credenciales aceptadas. None acepta cualquiera.
+        two_factor (bool): Si ofrece un factor 2FA en el login.
+        host (str), port (int): Dirección de escucha; con port=0 se elige un puerto libre.
+    """
+
+    def __init__(self, transfers=None, rows=1000, tickers=50, faults=None, user=None, password=None,
+                 two_factor=True, host='127.0.0.1', port=0):
+        self.transfers = transfers if transfers is not None else generate_transfers(rows, tickers=tickers)
+        self.faults = faults or FaultProfile()
+        self.user = user
+        self.password = password
+        self.two_factor = two_factor
+        self.two_factor_code = TWO_FACTOR_CODE
+        self.tokens = set()
+        self.refresh_tokens = set()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._prices = {}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def two_factor_code_provider(self, challenge_sent_at):
+        """Provider de código 2FA para CocosCapital: devuelve el código del último desafío."""
+        return self.two_factor_code
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, method, path, status):
+        with self._lock:
+            self.stats[(method, path, status)] += 1
+
+    def requests_to(self, path_prefix, status=None):
+        """Cantidad de requests recibidos en los paths que empiezan con 'path_prefix' (y con ese status)."""
+        return sum(count for (_, path, code), count in self.stats.items()
+                   if path.startswith(path_prefix) and (status is None or code == status))
+
+    def issue_tokens(self):
+        token, refresh = uuid.uuid4().hex, uuid.uuid4().hex
+        with self._lock:
+            self.tokens.add(token)
+            self.refresh_tokens.add(refresh)
+        return {'access_token': token, 'refresh_token': refresh, 'expires_in': 3600}
+
+    def price(self, ticker):
+        with self._lock:
+            if ticker not in self._prices:
+                self._prices[ticker] = round(random.Random(ticker).uniform(10, 5000), 2)
+            return self._prices[ticker]
+
+    def set_price(self, ticker, price):
+        """Cambia el precio que devuelve el servidor para el ticker, por ejemplo para disparar una alerta."""
+        with self._lock:
+            self._prices[ticker] = price
+
+    def portfolio_total(self):
+        ars = sum(t['quantity'] * self.price(t['ticker']) for t in self.transfers if t['type'] in ('BUY', 'SELL'))
+        return {'ars': round(ars, 2), 'usd': round(ars / 1000, 2)}
+
+    def portfolio_positions(self):
+        """Tenencia actual por ticker (compras menos ventas), valuada al precio del ticker."""
+        quantities = Counter()
+        for t in self.transfers:
+            if t['type'] in ('BUY', 'SELL'):
+                quantities[t['ticker']] += t['quantity']
+        return [{'ticker': ticker, 'quantity': quantity, 'last': self.price(ticker),
+                 'amount': round(quantity * self.price(ticker), 2)}
+                for ticker, quantity in sorted(quantities.items()) if quantity]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(FakeCocosHandler):
+            fake = server
+
+        return Handler
+
+
+class FakeCocosHandler(BaseHTTPRequestHandler):
+    """Atiende los requests de FakeCocosServer ('fake' es el servidor, asignado por subclase)."""
+
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, format, *args):
+        # Sin log por request: con miles de requests ensucia la salida de los benchmarks
+        pass
+
+    def _dispatch(self, method):
+        parts = urlsplit(self.path)
+        path, query = parts.path, parse_qs(parts.query)
+        body = self._read_body()
+
+        faults = self.fake.faults
+        if faults.applies_to(path):
+            delay = faults.delay()
+            if delay:
+                time.sleep(delay)
+            failure = faults.failure()
+            if failure == 429:
+                return self._send(method, path, 429, {'error': 'rate limited'},
+                                  {'Retry-After': str(faults.retry_after)})
+            if failure:
+                return self._send(method, path, failure, {'error': 'service unavailable'})
+
+        if path.startswith('/api/') and not self._authorized():
+            return self._send(method, path, 401, {'error': 'invalid token'})
+
+        status, payload = self._route(method, path, query, body)
+        self._send(method, path, status, payload)
+
+    def _route(self, method, path, query, body):
+        fake = self.fake
+        if method == 'POST' and path == '/auth/v1/token':
+            grant_type = query.get('grant_type', [''])[0]
+            if grant_type == 'password':
+                credenciales = {'email': fake.user, 'password': fake.password}
+                if any(valor and body.get(campo) != valor for campo, valor in credenciales.items()):
+                    return 400, {'error': 'invalid_grant'}
+                return 200, fake.issue_tokens()
+            if grant_type == 'refresh_token' and body.get('refresh_token') in fake.refresh_tokens:
+                return 200, fake.issue_tokens()
+            return 400, {'error': 'invalid_grant'}
+
+        if method == 'GET' and path == '/auth/v1/factors/default':
+            return (200, {'id': FACTOR_ID}) if fake.two_factor else (404, {'error': 'no factors'})
+
+        match = FACTOR_PATH.match(path)
+        if method == 'POST' and match:
+            if match.group(2) == 'challenge':
+                return 200, {'id': match.group(1), 'expires_at': int(time.time()) + 300}
+            if body.get('code') != fake.two_factor_code:
+                return 400, {'error': 'invalid code'}
+            return 200, fake.issue_tokens()
+
+        if method == 'GET' and path == '/api/v1/users/me':
+            return 200, {'id_accounts': [ACCOUNT_ID]}
+
+        if method == 'GET' and path == '/api/v1/transfers':
+            date_from = query.get('date_from', [''])[0]
+            date_to = query.get('date_to', ['9999-12-31'])[0]
+            return 200, [t for t in fake.transfers if date_from <= t['date'][:10] <= date_to]
+
+        match = TICKER_PATH.match(path)
+        if method == 'GET' and match:
+            ticker = match.group(1)
+            price = fake.price(ticker)
+            return 200, [{'short_ticker': ticker, 'term': term, 'last': price} for term in ('CI', '48hs')]
+
+        if method == 'GET' and path == '/api/v1/wallet/portfolio':
+            return 200, {'total': fake.portfolio_total(), 'tickers': fake.portfolio_positions()}
+
+        return 404, {'error': 'not found'}
+
+    def _authorized(self):
+        token = self.headers.get('authorization', '').replace('Bearer ', '', 1)
+        return token in self.fake.tokens
+
+    def _read_body(self):
+        length = int(self.headers.get('content-length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send(self, method, path, status, payload, headers=None):
+        self.fake.record(method, path, status)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de Cocos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rows', type=int, default=1000, help="Cantidad de transferencias sintéticas")
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0, help="Segundos de demora por respuesta de /api/")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proporción de respuestas 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Proporción de respuestas 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--no-2fa', dest='two_factor', action='store_false', help="Login sin factor 2FA")
+    args = parser.parse_args()
+
+    faults = FaultProfile(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after)
+    server = FakeCocosServer(rows=args.rows, tickers=args.tickers, faults=faults,
+                             two_factor=args.two_factor, host=args.host, port=args.port)
+    print(f"Fake Cocos en {server.url} con {len(server.transfers)} transferencias. "
+          f"Código 2FA: {server.two_factor_code}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Dobles en memoria de Cocos y de Google Sheets para correr el flujo completo en los benchmarks."""
+
+from settings import HTTP_TIMEOUT  # noqa: F401  (asegura que settings cargue con el config activo)
+from accounts import AccountProfile
+from dedup_index import DedupIndex
+from price_service import PriceService
+from sheet_upsert import SheetUpsertWriter, PositionRowIndex
+from sheet_writer import BatchSheetWriter, WriteJournal
+from trading import Trading
+from transfer_schema import transfers_frame
+
+
+class FakeCocos:
+    """Cliente de Cocos que devuelve transferencias y precios fijos."""
+
+    def __init__(self, transfers, price=100.0):
+        self.transfers = transfers
+        self.price = price
+        self.failed_transfer_windows = []
+
+    def get_transfers(self, date_from, date_to=None):
+        return [t for t in self.transfers if t['date'] >= date_from and (not date_to or t['date'] <= date_to)]
+
+    def get_transfers_frame(self, date_from, date_to=None, raw_sink=None):
+        transfers = self.get_transfers(date_from, date_to)
+        if raw_sink and transfers:
+            raw_sink(transfers)
+        return transfers_frame(transfers)
+
+    def get_ticket_price(self, ticker):
+        return [{'short_ticker': ticker, 'term': '48hs', 'last': self.price}]
+
+
+class FakeSpreadsheet:
+    """Planilla que cuenta los requests y las celdas escritas."""
+
+    def __init__(self, connector):
+        self.connector = connector
+        self.requests = 0
+        self.cells = 0
+
+    def values_batch_update(self, body):
+        self.requests += 1
+        for item in body['data']:
+            self.cells += sum(len(row) for row in item['values'])
+
+    def values_append(self, range_name, params, body):
+        self.requests += 1
+        self.cells += sum(len(row) for row in body['values'])
+        self.connector.rows.extend(body['values'])
+
+    def values_get(self, range_name):
+        return {'values': self.connector.rows}
+
+
+class FakeSheetConnector:
+    def __init__(self):
+        self.rows = []
+        self.sheet = type('Sheet', (), {})()
+        self.sheet.spreadsheet = FakeSpreadsheet(self)
+
+    def read_sheet_data(self, tab_name=None, skiprows=0, output_format='list'):
+        return [list(row) for row in self.rows]
+
+
+def make_trading(cocos, sheet_connector, tmp_path, write_mode='upsert', account=None, price_cache=None):
+    """Arma un Trading conectado a los dobles, con sus archivos locales en tmp_path."""
+    instance = Trading.__new__(Trading)
+    instance.account = account or AccountProfile(None, 'user', 'pass')
+    instance.cocos = cocos
+    instance.sheet_connector = sheet_connector
+    instance.price_service = PriceService(cocos, cache=price_cache)
+    instance.transfer_store = None
+    instance.portfolio_store = None
+    instance.monthly_performance = None
+    instance.sync_state_file = str(tmp_path / 'sync_state.json')
+    instance.dedup_index = DedupIndex(str(tmp_path / 'dedup_index.json'))
+    instance.sheet_writer = BatchSheetWriter(sheet_connector, WriteJournal(str(tmp_path / 'sheet_journal.jsonl')))
+    instance.upsert_writer = SheetUpsertWriter(sheet_connector, 'Operaciones',
+                                               PositionRowIndex(str(tmp_path / 'position_index.json')),
+                                               instance.sheet_writer) if write_mode == 'upsert' else None
+    return instance
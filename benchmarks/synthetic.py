@@ -0,0 +1,84 @@
+"""
+Generador de transferencias sintéticas con la forma de la respuesta de /api/v1/transfers.
+
+Sirve para los benchmarks y para poblar servidores de prueba sin credenciales reales.
+"""
+import random
+from datetime import datetime, timedelta
+
+TIPOS_SIN_TICKER = ('DEPOSIT', 'WITHDRAWAL')
+
+
+def generate_tickers(count):
+    """Devuelve 'count' tickers ficticios de cuatro letras (AAAA, AAAB, ...)."""
+    tickers = []
+    for i in range(count):
+        letters = ''
+        for _ in range(4):
+            i, rest = divmod(i, 26)
+            letters = chr(ord('A') + rest) + letters
+        tickers.append(letters)
+    return tickers
+
+
+def generate_transfers(rows, tickers=50, partial_fill_ratio=0.2, open_ratio=0.1, other_ratio=0.05,
+                       start='2022-01-03', seed=0):
+    """
+    Genera una lista de transferencias ordenadas por fecha.
+
+    Por cada lote se genera una compra y luego su venta: completa, en varias ventas parciales
+    (partial_fill_ratio) o ninguna, dejando la posición abierta (open_ratio). Una parte de las
+    transferencias (other_ratio) son depósitos y extracciones, que el flujo descarta.
+
+    Args:
+        rows (int): Cantidad de transferencias a generar.
+        tickers (int): Cantidad de tickers distintos.
+        partial_fill_ratio (float): Proporción de lotes cerrados con más de una venta.
+        open_ratio (float): Proporción de lotes que quedan abiertos.
+        other_ratio (float): Proporción de transferencias que no son compras ni ventas.
+        start (str): Fecha de la primera transferencia ('YYYY-MM-DD').
+        seed (int): Semilla, para que cada ejecución genere los mismos datos.
+
+    Returns:
+        list: Diccionarios con id, ticker, type, date, quantity, price y amount.
+    """
+    rng = random.Random(seed)
+    ticker_names = generate_tickers(tickers)
+    base_prices = {ticker: rng.uniform(10, 5000) for ticker in ticker_names}
+    start_date = datetime.strptime(start, '%Y-%m-%d')
+    transfers = []
+
+    def add(ticker, tipo, date, quantity, price):
+        amount = round(-quantity * price, 2)
+        transfers.append({
+            'id': len(transfers) + 1, 'ticker': ticker, 'type': tipo, 'date': date.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quantity': quantity, 'price': round(price, 2), 'amount': amount,
+        })
+
+    while len(transfers) < rows:
+        date = start_date + timedelta(days=rng.randrange(0, 700), minutes=rng.randrange(600, 1020))
+        if rng.random() < other_ratio:
+            tipo = rng.choice(TIPOS_SIN_TICKER)
+            monto = round(rng.uniform(1000, 100000), 2)
+            transfers.append({'id': len(transfers) + 1, 'ticker': 'ARS', 'type': tipo,
+                              'date': date.strftime('%Y-%m-%dT%H:%M:%S'), 'quantity': 0, 'price': 0,
+                              'amount': monto if tipo == 'DEPOSIT' else -monto})
+            continue
+
+        ticker = rng.choice(ticker_names)
+        price = base_prices[ticker] * rng.uniform(0.8, 1.2)
+        quantity = rng.randrange(1, 500)
+        add(ticker, 'BUY', date, quantity, price)
+
+        roll = rng.random()
+        if roll < open_ratio:
+            continue
+        fills = rng.randrange(2, 4) if roll < open_ratio + partial_fill_ratio and quantity > 3 else 1
+        cuts = sorted(rng.sample(range(1, quantity), fills - 1)) if fills > 1 else []
+        for parte in (b - a for a, b in zip([0] + cuts, cuts + [quantity])):
+            date += timedelta(days=rng.randrange(1, 90))
+            add(ticker, 'SELL', date, -parte, price * rng.uniform(0.85, 1.3))
+
+    transfers = transfers[:rows]
+    transfers.sort(key=lambda transfer: transfer['date'])
+    return transfers
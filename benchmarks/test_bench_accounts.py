@@ -0,0 +1,46 @@
+"""
+Benchmarks de la sincronización de varias cuentas contra el servidor local (fake_cocos_server.py).
+
+Cada cuenta hace su login y su sincronización completa; las cuentas comparten el cache de precios y se
+procesan con accounts.run_accounts. Con latencia de red, el tiempo total debería crecer bastante menos
+que linealmente con la cantidad de cuentas.
+"""
+
+import pytest
+from accounts import AccountProfile, run_accounts
+from benchmarks.fake_cocos_server import FakeCocosServer, FaultProfile
+from benchmarks.fakes import FakeSheetConnector, make_trading
+from cocos import CocosCapital
+from price_cache import PriceCache
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeCocosServer(rows=2_000, faults=FaultProfile(latency=0.02)) as server:
+        yield server
+
+
+@pytest.mark.parametrize('accounts', [1, 2, 4, 8])
+def test_sync_accounts(benchmark, server, accounts, tmp_path_factory):
+    profiles = [AccountProfile(f'cuenta{i}', 'user', 'pass') for i in range(accounts)]
+
+    def run():
+        price_cache = PriceCache()
+        run_dir = tmp_path_factory.mktemp('run')
+
+        def task(account):
+            cocos = CocosCapital(account.user, account.password, base_url=server.url,
+                                 two_factor_code_provider=server.two_factor_code_provider)
+            trading = make_trading(cocos, FakeSheetConnector(), run_dir / account.name, account=account,
+                                   price_cache=price_cache)
+            trading.get_and_save_range_movements('2022-01-01', '2024-12-31')
+            return trading.flush_writes()
+
+        for profile in profiles:
+            (run_dir / profile.name).mkdir()
+        return run_accounts(task, profiles)
+
+    results = benchmark.pedantic(run, rounds=3)
+    assert all(results)
@@ -0,0 +1,51 @@
+"""
+Benchmarks del cliente de Cocos y del flujo completo contra el servidor local (fake_cocos_server.py).
+
+Miden el efecto de la latencia, los 429 y los errores del servidor sobre la descarga de transferencias
+por ventanas y sobre get_and_save_range_movements de punta a punta.
+"""
+
+import pytest
+from benchmarks.fake_cocos_server import FakeCocosServer, FaultProfile
+from benchmarks.fakes import FakeSheetConnector, make_trading
+from cocos import CocosCapital, build_session
+
+pytest.importorskip('pytest_benchmark')
+
+FAULTS = {
+    'sin_fallas': FaultProfile(),
+    'latencia_50ms': FaultProfile(latency=0.05, jitter=0.02),
+    'rate_limit_10pct': FaultProfile(latency=0.01, rate_limit_rate=0.1, retry_after=0),
+    'errores_5pct': FaultProfile(latency=0.01, error_rate=0.05),
+}
+
+
+@pytest.fixture(scope='module', params=sorted(FAULTS))
+def server(request):
+    with FakeCocosServer(rows=10_000, faults=FAULTS[request.param]) as server:
+        yield server
+
+
+def connect(server):
+    return CocosCapital('user', 'pass', session=build_session(backoff_factor=0.05), base_url=server.url,
+                        two_factor_code_provider=server.two_factor_code_provider)
+
+
+def test_get_transfers(benchmark, server):
+    cocos = connect(server)
+    transfers = benchmark.pedantic(cocos.get_transfers, args=('2022-01-01', '2024-12-31'), rounds=3)
+    assert transfers
+
+
+def test_get_and_save_range_movements(benchmark, server, tmp_path_factory):
+    cocos = connect(server)
+
+    def setup():
+        trading = make_trading(cocos, FakeSheetConnector(), tmp_path_factory.mktemp('run'))
+        return (trading,), {}
+
+    def run(trading):
+        trading.get_and_save_range_movements('2022-01-01', '2024-12-31')
+        trading.flush_writes()
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
@@ -0,0 +1,86 @@
+"""
+Benchmarks de la carga de transferencias: DataFrame 'object' a partir de la lista de diccionarios contra el
+DataFrame tipado de transfer_schema, en memoria y contra el servidor local (lectura en streaming).
+
+Además del tiempo, cada benchmark guarda en extra_info la memoria del DataFrame ('frame_mb') o el pico de
+memoria de la descarga ('peak_mb'), para comparar con: python -m pytest benchmarks/test_bench_ingestion.py
+"""
+
+import functools
+import tracemalloc
+import pandas as pd
+import pytest
+from benchmarks.fake_cocos_server import FakeCocosServer
+from benchmarks.synthetic import generate_transfers
+from cocos import CocosCapital
+from transfer_schema import transfers_frame, split_transfers
+from transform_data import filter_another_operations_df
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [10_000, 100_000]
+
+BUILDERS = {'object': pd.DataFrame, 'tipado': transfers_frame}
+
+
+@functools.lru_cache(maxsize=None)
+def transfers(rows):
+    return generate_transfers(rows, tickers=200)
+
+
+def frame_mb(df):
+    return round(df.memory_usage(deep=True).sum() / 1e6, 2)
+
+
+def split_object(df):
+    """La separación anterior: una pasada por la columna 'type' para cada grupo."""
+    df = filter_another_operations_df(df)
+    return df[df['type'] == 'BUY'], df[df['type'] == 'SELL'], df[~df['type'].isin(['BUY', 'SELL'])]
+
+
+def split_typed(df):
+    return split_transfers(filter_another_operations_df(df))
+
+
+@pytest.mark.parametrize('rows', SIZES)
+@pytest.mark.parametrize('kind', sorted(BUILDERS))
+def test_build_frame(benchmark, rows, kind):
+    df = benchmark(BUILDERS[kind], transfers(rows))
+    benchmark.extra_info['frame_mb'] = frame_mb(df)
+
+
+@pytest.mark.parametrize('rows', SIZES)
+@pytest.mark.parametrize('kind', sorted(BUILDERS))
+def test_filter_and_split(benchmark, rows, kind):
+    df = BUILDERS[kind](transfers(rows))
+    split = split_typed if kind == 'tipado' else split_object
+    buys, sells, _ = benchmark(split, df)
+    assert len(buys) and len(sells)
+
+
+@pytest.fixture(scope='module')
+def cocos():
+    with FakeCocosServer(transfers=transfers(SIZES[-1])) as server:
+        yield CocosCapital('user', 'pass', base_url=server.url,
+                           two_factor_code_provider=server.two_factor_code_provider)
+
+
+def download_object(cocos):
+    return pd.DataFrame(cocos.get_transfers('2022-01-01', '2024-12-31'))
+
+
+def download_typed(cocos):
+    return cocos.get_transfers_frame('2022-01-01', '2024-12-31')
+
+
+@pytest.mark.parametrize('download', [download_object, download_typed], ids=['object', 'tipado_streaming'])
+def test_download(benchmark, cocos, download):
+    """Descarga completa por ventanas: el pico de memoria incluye las respuestas y los diccionarios."""
+    tracemalloc.start()
+    try:
+        df = download(cocos)
+        benchmark.extra_info['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info['frame_mb'] = frame_mb(df)
+    assert len(benchmark.pedantic(download, args=(cocos,), rounds=3)) == len(df)
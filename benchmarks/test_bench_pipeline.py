@@ -0,0 +1,80 @@
+"""
+Benchmarks de las etapas del flujo de sincronización, con transferencias sintéticas.
+
+Se corren aparte de los tests: python -m pytest benchmarks (requiere pytest-benchmark).
+"""
+
+import functools
+import pandas as pd
+import pytest
+from benchmarks.fakes import FakeCocos, FakeSheetConnector, make_trading
+from benchmarks.synthetic import generate_transfers
+from trading_operations import TradingOperations
+from transfer_schema import transfers_frame
+from transform_data import separate_transfers_by_type_df, filter_another_operations_df, convert_to_template_format, \
+    build_template_df, filter_already_inserted
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+@functools.lru_cache(maxsize=None)
+def transfers(rows):
+    return generate_transfers(rows)
+
+
+@functools.lru_cache(maxsize=None)
+def split(rows):
+    df = filter_another_operations_df(transfers_frame(transfers(rows)))
+    return separate_transfers_by_type_df(df)
+
+
+@functools.lru_cache(maxsize=None)
+def matched(rows):
+    buys, sells, _ = split(rows)
+    cerradas, abiertas, _ = TradingOperations().analizar_match(buys, sells)
+    abiertas = abiertas.assign(**{'Precio Hoy': 100.0}).add_prefix('buy_')
+    return pd.concat([cerradas, abiertas])
+
+
+@pytest.mark.parametrize('rows', SIZES)
+def test_separate_transfers_by_type(benchmark, rows):
+    df = transfers_frame(transfers(rows))
+    benchmark(separate_transfers_by_type_df, df)
+
+
+@pytest.mark.parametrize('rows', SIZES)
+def test_analizar_match(benchmark, rows):
+    buys, sells, _ = split(rows)
+    benchmark(lambda: TradingOperations().analizar_match(buys, sells))
+
+
+@pytest.mark.parametrize('rows', SIZES)
+def test_convert_to_template_format(benchmark, rows):
+    benchmark(convert_to_template_format, matched(rows))
+
+
+@pytest.mark.parametrize('rows', SIZES)
+def test_filter_already_inserted(benchmark, rows):
+    template = build_template_df(matched(rows))
+    # La mitad de las posiciones ya está en la planilla, leída como texto
+    inserted = template.iloc[::2].astype(str)
+    benchmark(filter_already_inserted, template, inserted)
+
+
+@pytest.mark.parametrize('rows', SIZES[:2])
+@pytest.mark.parametrize('write_mode', ['upsert', 'append'])
+def test_get_and_save_range_movements(benchmark, tmp_path_factory, rows, write_mode):
+    """Flujo completo contra dobles en memoria: cada ronda parte de una planilla y archivos vacíos."""
+    cocos = FakeCocos(transfers(rows))
+
+    def setup():
+        trading = make_trading(cocos, FakeSheetConnector(), tmp_path_factory.mktemp('run'), write_mode)
+        return (trading,), {}
+
+    def run(trading):
+        trading.get_and_save_range_movements('2022-01-01')
+        trading.flush_writes()
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
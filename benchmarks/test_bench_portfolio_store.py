@@ -0,0 +1,45 @@
+"""
+Benchmarks de las consultas al histórico del portfolio (portfolio_store.py): series diarias por ticker y por
+cuenta sobre varios años de fotos, que usan los índices en lugar de recorrer toda la tabla.
+"""
+
+import datetime
+import random
+import pytest
+from portfolio_store import PortfolioStore
+
+pytest.importorskip('pytest_benchmark')
+
+DAYS = 730
+ACCOUNTS = ['pablo', 'sofia']
+TICKERS = [f'T{i:03d}' for i in range(100)]
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    """Dos años de fotos diarias de dos cuentas con 100 posiciones cada una (146k posiciones)."""
+    store = PortfolioStore(str(tmp_path_factory.mktemp('portfolio') / 'portfolio.sqlite'))
+    rng = random.Random(0)
+    start = datetime.datetime(2023, 1, 1, 18)
+    for offset in range(DAYS):
+        for account in ACCOUNTS:
+            positions = [{'ticker': ticker, 'quantity': rng.randrange(1, 500), 'last': rng.uniform(10, 5000)}
+                         for ticker in TICKERS]
+            store.save({'total': {'ars': rng.uniform(1e6, 2e6), 'usd': rng.uniform(1e3, 2e3)}, 'tickers': positions},
+                       account=account, taken_at=start + datetime.timedelta(days=offset))
+    return store
+
+
+def test_ticker_series(benchmark, store):
+    series = benchmark(store.ticker_series, 'T042', 'pablo')
+    assert len(series) == DAYS
+
+
+def test_ticker_series_all_accounts_one_month(benchmark, store):
+    series = benchmark(store.ticker_series, 'T042', None, '2024-03-01', '2024-03-31')
+    assert len(series) == 31 * len(ACCOUNTS)
+
+
+def test_account_series(benchmark, store):
+    series = benchmark(store.account_series, 'sofia')
+    assert len(series) == DAYS
@@ -0,0 +1,88 @@
+"""
+Benchmarks de las alertas de precio (price_alerts.py).
+
+La evaluación de los umbrales se mide con 10k y 100k lotes. El watcher se mide contra el servidor local
+(fake_cocos_server.py): consultas por segundo, latencia de cada consulta desde que le tocaba hasta que se
+evaluaron los umbrales y, moviendo el precio de un ticker en el servidor, cuánto tarda en llegar la alerta.
+Los resultados quedan en 'extra_info' del reporte.
+"""
+
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.fake_cocos_server import FakeCocosServer, FaultProfile
+from cocos import CocosCapital, build_session
+from price_alerts import AlertRules, OpenLots, PriceWatcher
+from price_service import PriceService
+from rate_limiter import AsyncTokenBucket
+
+pytest.importorskip('pytest_benchmark')
+
+TICKERS = [f'TK{i:03d}' for i in range(50)]
+
+# Consultas por minuto y ráfaga del limitador compartido (None: sin límite)
+LIMITS = {'sin_limite': None, 'limite_1800_por_minuto': (1800, 10)}
+
+
+def open_lots(n_lots, prices):
+    rng = np.random.default_rng(0)
+    tickers = rng.choice(TICKERS, size=n_lots)
+    quantity = rng.integers(1, 100, size=n_lots)
+    cost = np.array([prices(ticker) for ticker in tickers]) * rng.uniform(0.97, 1.03, size=n_lots)
+    return OpenLots(pd.DataFrame({'id': np.arange(n_lots), 'ticker': tickers, 'date': '2024-01-02',
+                                  'quantity': quantity, 'price': cost, 'amount': -quantity * cost}))
+
+
+@pytest.mark.parametrize('n_lots', [10_000, 100_000])
+def test_evaluate(benchmark, n_lots):
+    lots = open_lots(n_lots, lambda ticker: 100.0)
+    rules = AlertRules(lots, gain_pct=10, loss_pct=10)
+    # Los precios hacen una caminata al azar de hasta 1% por tick: sólo algunos lotes cruzan un umbral
+    rng = np.random.default_rng(1)
+    ticks = 100.0 * np.cumprod(rng.uniform(0.99, 1.01, size=(50, len(lots.tickers))), axis=0)
+    state = iter(range(10 ** 9))
+
+    benchmark(lambda: rules.evaluate(ticks[next(state) % len(ticks)]))
+
+
+class AlertClock:
+    """Sink que registra cuándo llega la primera alerta de cada ticker."""
+
+    def __init__(self):
+        self.received = {}
+
+    def send(self, alerts):
+        now = time.perf_counter()
+        for alert in alerts:
+            self.received.setdefault(alert['ticker'], now)
+
+
+@pytest.mark.parametrize('limit', sorted(LIMITS))
+def test_watcher_against_fake_server(benchmark, limit):
+    with FakeCocosServer(rows=10, faults=FaultProfile(latency=0.02, jitter=0.01)) as server:
+        cocos = CocosCapital('user', 'pass', session=build_session(backoff_factor=0.05), base_url=server.url,
+                             two_factor_code_provider=server.two_factor_code_provider)
+        lots = open_lots(2_000, server.price)
+        limiter = AsyncTokenBucket(*LIMITS[limit]) if LIMITS[limit] else None
+        watcher = PriceWatcher(PriceService(cocos).get_price, lots, [AlertClock()], default_interval=1.0,
+                               limiter=limiter, max_workers=8,
+                               rules=AlertRules(lots, gain_pct=15, loss_pct=15))
+        moved = {}
+
+        def move_price():
+            # Con el watcher andando, un ticker sube 25%: sus lotes entran en la zona de ganancia
+            time.sleep(1.0)
+            moved['at'] = time.perf_counter()
+            server.set_price(TICKERS[0], server.price(TICKERS[0]) * 1.25)
+
+        mover = threading.Thread(target=move_price)
+        mover.start()
+        stats = benchmark.pedantic(watcher.run, args=(4.0,), rounds=1, iterations=1)
+        mover.join()
+
+    received = watcher.sinks[0].received
+    assert TICKERS[0] in received
+    benchmark.extra_info.update(stats)
+    benchmark.extra_info['alert_latency'] = round(received[TICKERS[0]] - moved['at'], 4)
@@ -0,0 +1,58 @@
+"""
+Benchmarks del arranque en frío de cada comando de cocos_sync, con python -X importtime.
+
+Cada medición corre un intérprete nuevo que importa main.py (la CLI) y los módulos que importa el comando, sin
+ejecutarlo. El tiempo total de imports queda en extra_info['import_seconds'] del reporte de pytest-benchmark.
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que importa cada comando de cocos_sync (además de main)
+COMMAND_MODULES = {
+    'totals': ['accounts', 'cocos', 'daily_total', 'price_cache', 'rate_limiter', 'sheet_connection',
+               'sheet_writer', 'token_store'],
+    'sync': ['trading', 'gspread', 'oauth2client.service_account'],
+    'prices': ['trading', 'gspread', 'oauth2client.service_account'],
+}
+
+
+@pytest.fixture(scope='module')
+def config_dir(tmp_path_factory):
+    """Directorio con un config.py de prueba, si no existe el config.py real."""
+    if os.path.exists(os.path.join(ROOT, 'config.py')):
+        return ROOT
+    from tests.conftest import MockConfig
+
+    directory = tmp_path_factory.mktemp('config')
+    valores = {name: value for name, value in vars(MockConfig).items() if not name.startswith('_')}
+    (directory / 'config.py').write_text(''.join(f'{name} = {value!r}\n' for name, value in valores.items()))
+    return str(directory)
+
+
+def import_time(modules, config_dir):
+    """Importa los módulos en un intérprete nuevo. Devuelve los segundos de import y los módulos cargados."""
+    code = f"import sys, main, {', '.join(modules)}; print(' '.join(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, config_dir]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    micros = sum(int(line.split('|')[0].split(':')[1]) for line in result.stderr.splitlines()
+                 if line.startswith('import time:') and line.split('|')[0].split(':')[1].strip().isdigit())
+    return micros / 1e6, set(result.stdout.split())
+
+
+@pytest.mark.parametrize('command', sorted(COMMAND_MODULES))
+def test_command_cold_start(benchmark, command, config_dir):
+    resultado = benchmark.pedantic(import_time, args=(COMMAND_MODULES[command], config_dir), rounds=3, iterations=1)
+    segundos, modulos = resultado
+    benchmark.extra_info['import_seconds'] = round(segundos, 3)
+
+    if command == 'totals':
+        # El total diario no debe cargar pandas
+        assert 'pandas' not in modulos
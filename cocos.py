@@ -1,24 +1,120 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import exctract_2fa_from_gmail
 from log_config import get_logger
+from instrumentation import timed, instrument_session
 import datetime
 import json
 from config import GMAIL_USER, GMAIL_APP_PASS
+try:
+    import ijson
+except ImportError:  # ijson es opcional: sin él cada ventana de movimientos se lee completa antes de convertirla.
+    ijson = None
+from settings import HTTP_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_POOL_SIZE, TWO_FACTOR_TIMEOUT, \
+    TWO_FACTOR_POLL_INTERVAL, TRANSFER_WINDOW_MONTHS, TRANSFER_FETCH_WORKERS, TRANSFER_WINDOW_RETRIES, COCOS_BASE_URL
 logger = get_logger(__name__)
 
-BASE_URL = 'https://api.cocos.capital'
+BASE_URL = COCOS_BASE_URL
+
+# Respuestas que se reintentan: rate limit y errores transitorios del servidor.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def build_session(retries=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR, pool_size=HTTP_POOL_SIZE):
+    """
+    Crea una sesión HTTP con pool de conexiones persistentes y reintentos con backoff exponencial.
+
+    Se reintentan los errores de conexión y, en los GET, las respuestas 429/5xx respetando el header
+    Retry-After. Los POST (login, 2FA) no se reintentan ante una respuesta del servidor para no
+    repetir desafíos de 2FA.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return instrument_session(session)
+
+
+def iter_json_items(response):
+    """
+    Recorre los elementos de la lista JSON de una respuesta pedida con stream=True, a medida que se leen.
+
+    Con ijson el cuerpo se decodifica por partes directo del socket; sin él, se lee completo con json().
+    """
+    raw = getattr(response, 'raw', None)
+    if ijson is None or raw is None:
+        return iter(response.json())
+    # Que urllib3 descomprima (gzip) lo que se lee del socket
+    raw.decode_content = True
+    return ijson.items(raw, 'item', use_float=True)
+
+
+def split_date_range(date_from, date_to, window_months=1):
+    """
+    Divide el rango inclusivo [date_from, date_to] ('YYYY-MM-DD') en ventanas consecutivas de
+    'window_months' meses calendario. Devuelve una lista de pares (desde, hasta) como texto.
+    """
+    start = datetime.datetime.strptime(date_from, "%Y-%m-%d").date()
+    end = datetime.datetime.strptime(date_to, "%Y-%m-%d").date()
+    windows = []
+    while start <= end:
+        month_index = start.month - 1 + window_months
+        next_start = datetime.date(start.year + month_index // 12, month_index % 12 + 1, 1)
+        window_end = min(next_start - datetime.timedelta(days=1), end)
+        windows.append((start.isoformat(), window_end.isoformat()))
+        start = next_start
+    return windows
+
 
 class CocosCapital:
 
-    def __init__(self, user, password):
+    def __init__(self, user, password, session=None, timeout=HTTP_TIMEOUT, token_store=None, base_url=None,
+                 two_factor_code_provider=None):
+        """
+        Args:
+            base_url (str): URL de la API. Por defecto BASE_URL (setting COCOS_BASE_URL); sirve para apuntar
+                a un servidor de prueba.
+            two_factor_code_provider (callable): Recibe el momento (epoch) en que se pidió el desafío 2FA y
+                devuelve el código. Por defecto lo espera en el correo de GMAIL_USER.
+        """
         self.user = user
         self.password = password
         self.account_id = None
         self.token = None
+        self.refresh_token = None
+        self.token_expires_at = None
         self.headers = self.basic_headers()
-        self.login()
+        self.session = session or build_session()
+        self.timeout = timeout
+        self.token_store = token_store
+        self.failed_transfer_windows = []
+        self.base_url = (base_url or BASE_URL).rstrip('/')
+        self.two_factor_code_provider = two_factor_code_provider or self.wait_two_factor_email
+
+        # Reutilizar la sesión guardada evita el login con 2FA; si no sirve, se hace el login completo.
+        if not self.restore_session():
+            self.login()
+
+    def request(self, method, url, **kwargs):
+        """
+        Hace una llamada HTTP usando la sesión compartida, con los headers y el timeout por defecto.
+        """
+        kwargs.setdefault('headers', self.headers)
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
 
+    @timed('login')
     def login(self):
         """
         Handles the login process by authenticating and then initializing headers and user data.
@@ -39,23 +135,117 @@ class CocosCapital:
             if self.account_id:
                 # Update headers with the new account ID after all authentication steps.
                 self.update_account_id_in_headers(self.account_id)
+
+            if self.token and self.account_id:
+                self.save_session()
         else:
             logger.error("Authentication failed, unable to proceed without token.")
 
+    def restore_session(self):
+        """
+        Restaura la sesión guardada en el token store, renovando el token si venció.
+        Devuelve True si la sesión restaurada sirve, False si hace falta el login completo.
+        """
+        if not self.token_store:
+            return False
+
+        data = self.token_store.load()
+        if not data or not data.get('access_token') or not data.get('account_id'):
+            return False
+
+        self.refresh_token = data.get('refresh_token')
+        self.token_expires_at = data.get('expires_at')
+        self.update_token_in_headers(data['access_token'])
+        self.update_account_id_in_headers(data['account_id'])
+
+        if self.token_is_expired() and not self.refresh_session():
+            self.clear_session()
+            return False
+
+        # El token puede haber sido revocado aunque no esté vencido: se valida con una llamada liviana.
+        if not self.get_my_information() and not self.refresh_session():
+            self.clear_session()
+            return False
+
+        logger.info("Sesión restaurada sin login.")
+        return True
+
+    def clear_session(self):
+        """
+        Descarta los tokens y la cuenta de una sesión que no se pudo restaurar, para que el login empiece de cero.
+        """
+        self.headers = self.basic_headers()
+        self.token = None
+        self.refresh_token = None
+        self.token_expires_at = None
+        self.account_id = None
+
+    def refresh_session(self):
+        """
+        Pide un access token nuevo con el refresh token. Devuelve True si lo consiguió.
+        """
+        if not self.refresh_token:
+            return False
+        try:
+            response = self.request('POST', f'{self.base_url}/auth/v1/token?grant_type=refresh_token',
+                                    json={'refresh_token': self.refresh_token})
+            response.raise_for_status()
+            self.set_session_tokens(response.json())
+        except Exception as e:
+            logger.warning("Token refresh failed: %s", e)
+            return False
+
+        logger.info("Token renovado con refresh token.")
+        self.save_session()
+        return True
+
+    def token_is_expired(self, margin=60):
+        """
+        Indica si el access token vence dentro de los próximos 'margin' segundos.
+        """
+        return self.token_expires_at is not None and time.time() + margin >= self.token_expires_at
+
+    def set_session_tokens(self, data):
+        """
+        Actualiza el access token, el refresh token y el vencimiento con una respuesta de autenticación.
+        """
+        self.update_token_in_headers(data['access_token'])
+        self.refresh_token = data.get('refresh_token', self.refresh_token)
+        if data.get('expires_at'):
+            self.token_expires_at = data['expires_at']
+        elif data.get('expires_in'):
+            self.token_expires_at = time.time() + data['expires_in']
+
+    def save_session(self):
+        """
+        Guarda la sesión actual en el token store, si hay uno.
+        """
+        if not self.token_store:
+            return
+        self.token_store.save({
+            'access_token': self.token,
+            'refresh_token': self.refresh_token,
+            'expires_at': self.token_expires_at,
+            'account_id': self.account_id,
+        })
+
     def authenticate(self, username, password):
         """
         Authenticates the user and returns a token.
         """
         data = {'email': username, 'password': password, 'gotrue_meta_security': {}}
         try:
-            response = requests.post(f'{BASE_URL}/auth/v1/token?grant_type=password', headers=self.headers, json=data)
+            response = self.request('POST', f'{self.base_url}/auth/v1/token?grant_type=password', json=data)
             response.raise_for_status()
             logger.info("Successful login.")
-            return response.json()['access_token']
+            data = response.json()
+            self.set_session_tokens(data)
+            return data['access_token']
         except Exception as e:
             logger.error("Login error: %s", e)
             return None
 
+    @timed('2fa')
     def handle_two_factor_authentication(self):
         """
         Handle the process of two-factor authentication.
@@ -69,8 +259,8 @@ class CocosCapital:
         """
         Get the default channel for two-factor authentication.
         """
-        url = f"{BASE_URL}/auth/v1/factors/default"
-        response = requests.get(url, headers=self.headers)
+        url = f"{self.base_url}/auth/v1/factors/default"
+        response = self.request('GET', url)
         try:
             response.raise_for_status()
             return response.json()['id']
@@ -82,15 +272,14 @@ class CocosCapital:
         """
         Verify the two-factor authentication code with the server.
         """
-        url = f"{BASE_URL}/auth/v1/factors/{channel_id}/verify"
+        url = f"{self.base_url}/auth/v1/factors/{channel_id}/verify"
         payload = {"challenge_id": channel_id, "code": code}
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.request('POST', url, json=payload)
         try:
             response.raise_for_status()
-            self.token = response.json()['access_token']
 
             # Actualizo el token ya que cambia en cada verificación de 2FA.
-            self.update_token_in_headers(self.token)
+            self.set_session_tokens(response.json())
         except Exception as e:
             logger.error("Failed to verify 2FA code: %s", e)
             self.token = None
@@ -162,50 +351,179 @@ class CocosCapital:
         return 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.ewogICJyb2xlIjogImFub24iLAogICJpc3MiOiAic3VwYWJhc2UiLAogICJpYXQiOiAxNzA0NjgyODAwLAogICJleHAiOiAxODYyNTM1NjAwCn0.f0w62k0q0eyyGBDkAP7vUUEg_Ingb9YbOlhsGCC4R3c'
 
     def get_two_factor_code(self, challenge_channel):
-        url = f"{BASE_URL}/auth/v1/factors/{challenge_channel}/challenge"
+        url = f"{self.base_url}/auth/v1/factors/{challenge_channel}/challenge"
         payload = {
             "expires_at": 123,
             "id": challenge_channel,
         }
-        r = requests.post(url, headers=self.headers, json=payload)
+        challenge_sent_at = time.time()
+        r = self.request('POST', url, json=payload)
 
-        time.sleep(10)
-        code = exctract_2fa_from_gmail.obtener_codigo_2FA(GMAIL_USER, GMAIL_APP_PASS, 'no-reply@cocos.capital')
+        code = self.two_factor_code_provider(challenge_sent_at)
         logger.info("\nCódigo 2FA: %s", code)
         return code
 
+    @staticmethod
+    def wait_two_factor_email(challenge_sent_at):
+        """
+        Espera el correo con el código 2FA enviado después de 'challenge_sent_at' y devuelve el código.
+        """
+        # Esperar sólo lo que tarde en llegar el correo con el código, hasta el timeout configurado.
+        return exctract_2fa_from_gmail.esperar_codigo_2FA(
+            GMAIL_USER, GMAIL_APP_PASS, 'no-reply@cocos.capital', challenge_sent_at,
+            timeout=TWO_FACTOR_TIMEOUT, intervalo=TWO_FACTOR_POLL_INTERVAL)
+
     def add_device_as_trusted(self, device_id):
-        url = f'{BASE_URL}/auth/v1/factors/devices'
+        url = f'{self.base_url}/auth/v1/factors/devices'
         payload = {"deviceId": device_id}
         '3fcb6022-55f1-4234-9180-3baa9ce271ba'
 
+    def get_portfolio(self):
+        """
+        Obtiene el portfolio completo de la cuenta: los totales en ARS y USD y sus posiciones.
+        """
+        url = f'{self.base_url}/api/v1/wallet/portfolio'
+        response = self.request('GET', url)
+        response.raise_for_status()
+        return response.json()
+
     def get_account_total(self):
-        url = f'{BASE_URL}/api/v1/wallet/portfolio'
-        response = requests.get(url, headers=self.headers)
-        return response.json()['total']
+        return self.get_portfolio()['total']
+
+    @timed('get_transfers')
+    def get_transfers(self, date_from, date_to=None, window_months=TRANSFER_WINDOW_MONTHS):
+        """
+        Obtiene las transferencias entre dos fechas, divididas en ventanas que se piden en paralelo.
+
+        Las ventanas que fallan después de sus reintentos se saltean y quedan en 'self.failed_transfer_windows',
+        así igual se devuelve el resto del rango. Devuelve una lista ordenada por ventana (nunca None).
+        """
+        self.failed_transfer_windows = []
+        transfers_by_window = {}
+        for window_from, window_to, transfers in self.iter_transfer_windows(date_from, date_to, window_months):
+            if transfers is None:
+                self.failed_transfer_windows.append((window_from, window_to))
+            else:
+                transfers_by_window[window_from] = transfers
+
+        if self.failed_transfer_windows:
+            logger.error("Ventanas de movimientos sin datos: %s", self.failed_transfer_windows)
 
-    def get_transfers(self, date_from, date_to=None):
+        transfers = []
+        seen_ids = set()
+        for window_from in sorted(transfers_by_window):
+            for transfer in transfers_by_window[window_from]:
+                # Una transferencia en el límite entre ventanas puede venir repetida
+                transfer_id = transfer.get('id') if isinstance(transfer, dict) else None
+                if transfer_id is not None:
+                    if transfer_id in seen_ids:
+                        continue
+                    seen_ids.add(transfer_id)
+                transfers.append(transfer)
+        return transfers
+
+    def iter_transfer_windows(self, date_from, date_to=None, window_months=TRANSFER_WINDOW_MONTHS,
+                              max_workers=TRANSFER_FETCH_WORKERS, parse=None):
+        """
+        Genera (window_from, window_to, transfers) por cada ventana apenas se obtiene.
+
+        'transfers' es None si la ventana falló después de sus reintentos. 'parse' se pasa a get_transfers_window.
+        """
         if date_to is None:
             date_to = datetime.datetime.now().strftime("%Y-%m-%d")
-        try:
-            url = f'{BASE_URL}/api/v1/transfers?date_from={date_from}&date_to={date_to}'
-            response = requests.get(url, headers=self.headers)
-            logger.info("\nBuscando movimientos históricos desde %s hasta el %s", date_from, date_to)
-            transfers = response.json()
-            return transfers
-        except Exception as e:
-            logger.error("\n Fallo al traer los movimientos históricos: %s", e)
+        windows = split_date_range(date_from, date_to, window_months)
+        logger.info("\nBuscando movimientos históricos desde %s hasta el %s en %s ventanas",
+                    date_from, date_to, len(windows))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+            futures = {pool.submit(self.get_transfers_window, window_from, window_to, parse=parse):
+                       (window_from, window_to) for window_from, window_to in windows}
+            for future in as_completed(futures):
+                window_from, window_to = futures[future]
+                try:
+                    yield window_from, window_to, future.result()
+                except Exception as e:
+                    logger.error("\n Fallo al traer los movimientos del %s al %s: %s", window_from, window_to, e)
+                    yield window_from, window_to, None
+
+    @timed('get_transfers')
+    def get_transfers_frame(self, date_from, date_to=None, window_months=TRANSFER_WINDOW_MONTHS, raw_sink=None):
+        """
+        Como get_transfers, pero devuelve un DataFrame tipado (ver transfer_schema) en lugar de una lista de dicts.
+
+        Cada ventana se lee como stream y se convierte a columnas tipadas mientras llega la respuesta, así el
+        histórico completo nunca se guarda como dicts. 'raw_sink', si se indica, recibe las transferencias
+        crudas de cada ventana a medida que llegan (por ejemplo TransferStore.append). Los ids repetidos entre
+        ventanas se descartan.
+        """
+        from transfer_schema import TransferColumns, concat_transfer_frames
+
+        def parse(response):
+            columns, raw = TransferColumns(), [] if raw_sink else None
+            for transfer in iter_json_items(response):
+                columns.add(transfer)
+                if raw is not None:
+                    raw.append(transfer)
+            return columns.to_frame(), raw
+
+        self.failed_transfer_windows = []
+        frames_by_window = {}
+        for window_from, window_to, window in self.iter_transfer_windows(date_from, date_to, window_months,
+                                                                         parse=parse):
+            if window is None:
+                self.failed_transfer_windows.append((window_from, window_to))
+                continue
+            frames_by_window[window_from], raw = window
+            if raw_sink and raw:
+                raw_sink(raw)
+
+        if self.failed_transfer_windows:
+            logger.error("Ventanas de movimientos sin datos: %s", self.failed_transfer_windows)
+
+        transfers = concat_transfer_frames([frames_by_window[window_from] for window_from in sorted(frames_by_window)])
+        # Una transferencia en el límite entre ventanas puede venir repetida
+        if 'id' in transfers.columns:
+            transfers = transfers[transfers['id'].isna() | ~transfers['id'].duplicated()].reset_index(drop=True)
+        return transfers
+
+    def get_transfers_window(self, date_from, date_to, retries=TRANSFER_WINDOW_RETRIES, parse=None):
+        """
+        Obtiene una sola ventana de transferencias, reintentando los errores que no reintenta el adaptador
+        HTTP (timeouts de lectura, JSON truncado o inválido).
+
+        Sin 'parse' devuelve la lista JSON decodificada. Con 'parse', la respuesta se pide como stream y
+        parse(response) arma el resultado mientras se lee el cuerpo.
+        """
+        url = f'{self.base_url}/api/v1/transfers?date_from={date_from}&date_to={date_to}'
+        for attempt in range(retries + 1):
+            try:
+                if parse is None:
+                    response = self.request('GET', url)
+                    response.raise_for_status()
+                    return response.json()
+                response = self.request('GET', url, stream=True)
+                try:
+                    response.raise_for_status()
+                    return parse(response)
+                finally:
+                    response.close()
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning("Reintentando movimientos del %s al %s: %s", date_from, date_to, e)
+                time.sleep(HTTP_BACKOFF_FACTOR * (2 ** attempt))
 
     def get_ticket_price(self, ticket):
-        data = requests.get(f'{BASE_URL}/api/v1/markets/tickers/{ticket}?segment=C', headers=self.headers)
+        data = self.request('GET', f'{self.base_url}/api/v1/markets/tickers/{ticket}?segment=C')
+        data.raise_for_status()
         return data.json()
 
     def get_my_information(self):
         """
         Fetches user information from the API.
         """
-        url = f'{BASE_URL}/api/v1/users/me'
-        response = requests.get(url, headers=self.headers)
+        url = f'{self.base_url}/api/v1/users/me'
+        response = self.request('GET', url)
         try:
             response.raise_for_status()
             return response.json()
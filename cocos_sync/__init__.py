@@ -0,0 +1,9 @@
+"""
+Línea de comandos de la sincronización Cocos Capital -> Google Sheets.
+
+    python -m cocos_sync totals
+    python -m cocos_sync sync --since 2022-09-01 --until 2023-12-31
+    python -m cocos_sync prices
+    python -m cocos_sync backfill --since 2022-09-01 --source store
+    python -m cocos_sync watch --duration 3600
+"""
@@ -0,0 +1,4 @@
+import sys
+from cocos_sync.cli import main
+
+sys.exit(main())
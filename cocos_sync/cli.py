@@ -0,0 +1,192 @@
+import argparse
+import csv
+import io
+import os
+import sys
+from contextlib import contextmanager
+from accounts import load_accounts
+from cocos_sync import commands
+from helpers import column_letter
+from instrumentation import metrics
+from log_config import get_logger
+from settings import METRICS_PROMETHEUS_FILE
+
+logger = get_logger(__name__)
+
+# Cantidad de funciones del resumen de cProfile que se registran en el log
+PROFILE_TOP_FUNCTIONS = 25
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cocos_sync', description="Sincroniza Cocos Capital con Google Sheets.")
+    parser.add_argument('--dry-run', metavar='ARCHIVO',
+                        help="No escribe la planilla ni el estado local: guarda lo que se hubiera escrito en un "
+                             "CSV, o en Parquet si el archivo termina en .parquet")
+    parser.add_argument('--profile', metavar='ARCHIVO',
+                        help="Perfila la ejecución y guarda el reporte (cProfile: .prof o .txt; pyinstrument: .html). "
+                             "Las cuentas se procesan de a una, en el thread principal, para que el perfil incluya "
+                             "todo el trabajo")
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+    parser.add_argument('--account', action='append', dest='accounts', metavar='NOMBRE',
+                        help="Procesa sólo esta cuenta de ACCOUNTS (se puede repetir). Por defecto, todas")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMANDO')
+
+    subparsers.add_parser('all', help="Total diario y sincronización de operaciones (por defecto)")
+    subparsers.add_parser('totals', help="Sólo el total diario de la cuenta (no carga pandas)")
+
+    sync = subparsers.add_parser('sync', help="Operaciones nuevas desde la última ejecución")
+    sync.add_argument('--since', default=commands.SYNC_SINCE,
+                      help="Fecha YYYY-MM-DD desde la que se piden los movimientos en la primera ejecución")
+    sync.add_argument('--until', help="Fecha YYYY-MM-DD hasta la que se piden los movimientos")
+
+    subparsers.add_parser('prices', help="Actualiza el precio de hoy de las posiciones abiertas")
+
+    history = subparsers.add_parser('history', help="Serie diaria del histórico local del portfolio, en CSV")
+    history.add_argument('--ticker', help="Posición diaria en este ticker en lugar del total de la cuenta")
+    history.add_argument('--since', help="Día YYYY-MM-DD de inicio")
+    history.add_argument('--until', help="Día YYYY-MM-DD de fin")
+    history.add_argument('--output', default='-', help="Archivo CSV de salida. Por defecto, la salida estándar")
+
+    watch = subparsers.add_parser('watch', help="Alertas de precio de las posiciones abiertas (no escribe la planilla)")
+    watch.add_argument('--duration', type=float, help="Segundos de vigilancia. Por defecto, hasta Ctrl+C")
+
+    backfill = subparsers.add_parser('backfill', help="Reprocesa todas las operaciones de un rango de fechas")
+    backfill.add_argument('--since', default=commands.SYNC_SINCE, help="Fecha YYYY-MM-DD de inicio")
+    backfill.add_argument('--until', help="Fecha YYYY-MM-DD de fin")
+    backfill.add_argument('--source', choices=['api', 'store'], default='api',
+                          help="'store' lee las transferencias de la copia local, sin llamar a la API")
+    return parser
+
+
+def run_command(args, accounts):
+    """Ejecuta el comando elegido y devuelve el sheet writer de cada cuenta (None si falló)."""
+    dry_run = bool(args.dry_run)
+    # Los perfiladores sólo miden el thread principal: al perfilar, las cuentas no usan el pool de threads
+    workers = 1 if args.profile else None
+    if args.command == 'totals':
+        return commands.totals(dry_run=dry_run, accounts=accounts, workers=workers)
+    if args.command == 'sync':
+        return commands.sync(args.since, args.until, dry_run=dry_run, accounts=accounts, workers=workers)
+    if args.command == 'prices':
+        return commands.prices(dry_run=dry_run, accounts=accounts, workers=workers)
+    if args.command == 'history':
+        # No escribe la planilla: no hay sheet writers
+        export_history(commands.history(args.ticker, args.since, args.until, accounts=accounts), args.output)
+        return []
+    if args.command == 'watch':
+        commands.watch(args.duration, dry_run=dry_run, accounts=accounts)
+        return []
+    if args.command == 'backfill':
+        return commands.backfill(args.since, args.until, source=args.source, dry_run=dry_run, accounts=accounts,
+                                 workers=workers)
+    return commands.sync_all(dry_run=dry_run, accounts=accounts, workers=workers)
+
+
+def writes_to_rows(writes):
+    """Una fila por fila de la planilla: tipo de escritura, rango y los valores en columnas A, B, C..."""
+    return [dict({'tipo': write['kind'], 'rango': write['range']},
+                 **{column_letter(i): value for i, value in enumerate(row, start=1)})
+            for write in writes for row in write['rows']]
+
+
+def export_writes(writes, path):
+    """Guarda las escrituras de la simulación en CSV, o en Parquet si 'path' termina en .parquet."""
+    rows = writes_to_rows(writes)
+    width = max((len(row) - 2 for row in rows), default=0)
+    columns = ['tipo', 'rango'] + [column_letter(i) for i in range(1, width + 1)]
+
+    if path.endswith('.parquet'):
+        import pandas as pd
+        # Parquet necesita un tipo por columna: las celdas se guardan como texto, igual que en la planilla
+        pd.DataFrame(rows, columns=columns).astype('string').to_parquet(path, index=False)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    logger.info("Simulación: %s filas guardadas en %s", len(rows), path)
+
+
+def export_history(rows, path='-'):
+    """Guarda la serie del histórico del portfolio en CSV, o la muestra por la salida estándar con path='-'."""
+    columns = list(rows[0]) if rows else ['account', 'day']
+    f = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    try:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    logger.info("Histórico: %s filas", len(rows))
+
+
+@contextmanager
+def profiled(path, profiler='cprofile'):
+    """
+    Perfila el bloque y guarda el reporte en 'path'.
+
+    Con cProfile guarda las estadísticas binarias (para pstats o snakeviz), o el resumen en texto si 'path'
+    termina en .txt; además registra las funciones más costosas en el log. Con pyinstrument (opcional)
+    guarda el reporte HTML.
+    """
+    if not path:
+        yield
+        return
+
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument no está instalado: se usa cProfile.")
+        else:
+            sampler = Profiler()
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(sampler.output_html())
+                logger.info("Perfil de pyinstrument guardado en %s", path)
+            return
+
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        if path.endswith('.txt'):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(report.getvalue())
+        else:
+            profile.dump_stats(path)
+        logger.info("Perfil de cProfile guardado en %s\n%s", path, report.getvalue())
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        accounts = load_accounts(args.accounts)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.dry_run and os.path.dirname(args.dry_run):
+        os.makedirs(os.path.dirname(args.dry_run), exist_ok=True)
+
+    try:
+        with profiled(args.profile, args.profiler):
+            sheet_writers = run_command(args, accounts)
+        if args.dry_run:
+            export_writes([write for writer in sheet_writers if writer is not None for write in writer.writes],
+                          args.dry_run)
+    finally:
+        metrics.report(METRICS_PROMETHEUS_FILE)
+    # Código de salida 1 si falló alguna cuenta
+    return 0 if all(writer is not None for writer in sheet_writers) else 1
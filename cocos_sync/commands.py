@@ -0,0 +1,141 @@
+"""
+Trabajos de la sincronización. Cada uno importa sólo lo que usa.
+
+Todos reciben la lista de cuentas a procesar (ver accounts.load_accounts) y las procesan en paralelo con
+hasta 'workers' threads (por defecto ACCOUNT_WORKERS), compartiendo el cliente de Google Sheets, el cache
+de precios y el limitador de escrituras. Devuelven el sheet writer de cada cuenta, en el mismo orden (None
+si la cuenta falló).
+
+El total diario no carga pandas ni gspreadmanager, así un arranque en frío que sólo registra el total es
+mucho más rápido que una sincronización completa.
+"""
+from accounts import SharedResources, load_accounts, run_accounts
+
+# Fecha desde la que se piden los movimientos en la primera sincronización
+SYNC_SINCE = '2022-09-01'
+
+
+def totals(dry_run=False, accounts=None, workers=None):
+    """Registra el total diario de cada cuenta en su solapa de total diario."""
+    from cocos import CocosCapital
+    from daily_total import insert_total_daily
+    from sheet_writer import BatchSheetWriter, DryRunSheetWriter, WriteJournal
+    from portfolio_store import PortfolioStore
+    from token_store import TokenStore
+    from settings import TOKEN_STORE_FILE, TOKEN_STORE_KEY, SHEET_JOURNAL_FILE, PORTFOLIO_STORE_FILE
+
+    resources = SharedResources.from_settings()
+    portfolio_store_file = PORTFOLIO_STORE_FILE
+    if dry_run and portfolio_store_file:
+        # La simulación guarda la foto del portfolio en una copia, sin modificar el histórico
+        import tempfile
+        from helpers import dry_run_copy
+        portfolio_store_file = dry_run_copy(portfolio_store_file, tempfile.mkdtemp(prefix='cocos_sync_dry_run_'))
+    portfolio_store = PortfolioStore(portfolio_store_file) if portfolio_store_file else None
+
+    def task(account):
+        with resources.login_lock:
+            cocos = CocosCapital(account.user, account.password,
+                                 token_store=TokenStore(account.state_file(TOKEN_STORE_FILE), TOKEN_STORE_KEY))
+        if dry_run:
+            sheet_writer = DryRunSheetWriter()
+        else:
+            sheet_writer = BatchSheetWriter(resources.sheets.connector(account.sheet_file, account.total_tab),
+                                            WriteJournal(account.state_file(SHEET_JOURNAL_FILE)), resources.limiter)
+        insert_total_daily(cocos, sheet_writer, account.total_tab, portfolio_store, account.name)
+        sheet_writer.flush()
+        return sheet_writer
+
+    return run_accounts(task, accounts or load_accounts(), workers)
+
+
+def run_trading(job, dry_run=False, accounts=None, workers=None):
+    """Arma un Trading por cuenta con los recursos compartidos, ejecuta job(trading) y envía sus escrituras."""
+    from trading import Trading
+
+    resources = SharedResources.from_settings()
+
+    def task(account):
+        cocos = Trading(dry_run=dry_run, account=account, resources=resources)
+        job(cocos)
+        cocos.flush_writes()
+        return cocos.sheet_writer
+
+    return run_accounts(task, accounts or load_accounts(), workers)
+
+
+def sync(since=SYNC_SINCE, until=None, dry_run=False, accounts=None, workers=None):
+    """Sincroniza las operaciones nuevas desde la última ejecución ('since' sólo vale para la primera)."""
+    return run_trading(lambda cocos: cocos.get_and_save_new_movements(since, until), dry_run, accounts, workers)
+
+
+def prices(dry_run=False, accounts=None, workers=None):
+    """Actualiza el precio de hoy de las posiciones abiertas, sin pedir movimientos."""
+    return run_trading(lambda cocos: cocos.refresh_open_prices(), dry_run, accounts, workers)
+
+
+def backfill(since=SYNC_SINCE, until=None, source='api', dry_run=False, accounts=None, workers=None):
+    """
+    Reprocesa todas las operaciones del rango, sin usar el estado incremental. Lo ya escrito en la
+    planilla no se duplica. Con source='store' las transferencias se leen de la copia local.
+    """
+    return run_trading(lambda cocos: cocos.get_and_save_range_movements(since, until, source=source),
+                       dry_run, accounts, workers)
+
+
+def sync_all(since=SYNC_SINCE, dry_run=False, accounts=None, workers=None):
+    """Total diario y sincronización de operaciones, con un solo login por cuenta."""
+    def job(cocos):
+        cocos.insert_total_daily()
+        cocos.get_and_save_new_movements(since)
+
+    return run_trading(job, dry_run, accounts, workers)
+
+
+def history(ticker=None, since=None, until=None, accounts=None):
+    """
+    Serie diaria del histórico local del portfolio (ver portfolio_store.py), sin llamar a la API ni leer la
+    planilla: el total de cada cuenta o, con 'ticker', su posición en ese ticker. Devuelve una lista de
+    diccionarios con la cuenta y el día de cada fila.
+    """
+    import os
+    from portfolio_store import PortfolioStore
+    from settings import PORTFOLIO_STORE_FILE
+    from log_config import get_logger
+
+    if not PORTFOLIO_STORE_FILE or not os.path.exists(PORTFOLIO_STORE_FILE):
+        get_logger(__name__).warning("No hay histórico del portfolio: PORTFOLIO_STORE_FILE = %r", PORTFOLIO_STORE_FILE)
+        return []
+
+    store = PortfolioStore(PORTFOLIO_STORE_FILE)
+    rows = []
+    for account in accounts or load_accounts():
+        name = account.name or ''
+        if ticker:
+            rows += store.ticker_series(ticker, name, since, until)
+        else:
+            rows += [dict(account=name, **row) for row in store.account_series(name, since, until)]
+    return rows
+
+
+def watch(duration=None, dry_run=False, accounts=None):
+    """
+    Vigila el precio de los lotes abiertos de las cuentas (los del estado de sincronización) y avisa cuando
+    cruzan los umbrales de ganancia o de pérdida, durante 'duration' segundos o hasta Ctrl+C. Los precios se
+    piden con la sesión de la primera cuenta: son los mismos para todas. En la simulación las alertas sólo
+    van al log. Devuelve las métricas del watcher.
+    """
+    from cocos import CocosCapital
+    from price_alerts import LogSink, PriceWatcher, RefreshingFetch, load_open_lots
+    from price_service import PriceService
+    from token_store import TokenStore
+    from settings import TOKEN_STORE_FILE, TOKEN_STORE_KEY
+
+    accounts = accounts or load_accounts()
+    lots = load_open_lots(accounts)
+    cocos = CocosCapital(accounts[0].user, accounts[0].password,
+                         token_store=TokenStore(accounts[0].state_file(TOKEN_STORE_FILE), TOKEN_STORE_KEY))
+    # El watcher puede durar más que el token: la consulta lo renueva cuando vence o la API lo rechaza
+    fetch_price = RefreshingFetch(cocos, PriceService(cocos).get_price)
+    watcher = PriceWatcher.from_settings(fetch_price, lots, sinks=[LogSink()] if dry_run else None)
+    return watcher.run(duration)
@@ -0,0 +1,47 @@
+"""
+Total diario de la cuenta.
+
+No depende de pandas ni de gspreadmanager, para que el comando que sólo registra el total arranque rápido.
+"""
+from helpers import get_now_str
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+TOTAL_DAILY_TAB = 'Total diario'
+
+
+def total_row(total, now_str):
+    """Arma la fila [fecha, total ARS, total USD], con los montos redondeados a dos decimales."""
+    return [now_str, round(total['ars'], 2), round(total['usd'], 2)]
+
+
+def insert_total_daily(cocos, sheet_writer, tab_name=TOTAL_DAILY_TAB, portfolio_store=None, account=None):
+    """
+    Encola en la solapa 'tab_name' el total actual de la cuenta en ARS y USD, con la fecha de hoy.
+
+    Los datos se envían con el flush del sheet_writer. Si falla la consulta del total, se registra el
+    error con todos los detalles y no se encola nada. Con 'portfolio_store' (ver portfolio_store.py) se
+    guarda además la respuesta completa del portfolio, como foto del día de la cuenta 'account'.
+    """
+    try:
+        # Obtiene el portfolio (total y posiciones) desde el objeto `cocos`
+        portfolio = cocos.get_portfolio()
+        total = portfolio['total']
+        now_str = get_now_str()
+        logger.debug("Fecha: %s, Total ARS: %s, Total USD: %s", now_str, total['ars'], total['usd'])
+
+        to_insert = [total_row(total, now_str)]
+        logger.debug("Datos preparados para insertar: %s", to_insert)
+
+        sheet_writer.append(tab_name, to_insert)
+    except Exception:
+        logger.error("Error al insertar datos en Google Sheets", exc_info=True)
+        return
+
+    if portfolio_store is not None:
+        try:
+            portfolio_store.save(portfolio, account)
+        except Exception:
+            # El histórico local no debe impedir que se registre el total en la planilla
+            logger.error("Error al guardar la foto del portfolio en %s", portfolio_store.path, exc_info=True)
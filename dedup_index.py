@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from log_config import get_logger
+from transform_data import build_unique_key
+
+logger = get_logger(__name__)
+
+
+class DedupIndex:
+    """
+    Índice local de las operaciones ya insertadas en la planilla, para no releerla en cada ejecución.
+
+    Guarda en un archivo JSON un hash estable de la clave de deduplicación (ver build_unique_key) de cada
+    fila insertada. Las filas nuevas se comparan contra ese conjunto; la planilla completa sólo se lee
+    para reconstruir el índice, cuando no existe o cuando se pide explícitamente.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = set()
+        self.has_header = False
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def load(self):
+        """Carga el índice guardado. Devuelve False si no existe o no se puede leer."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo leer el índice de deduplicación %s: %s", self.path, e)
+            return False
+
+        self.hashes = set(stored['hashes'])
+        self.has_header = stored.get('has_header', True)
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'has_header': self.has_header, 'hashes': sorted(self.hashes)}, f)
+        os.replace(tmp_path, self.path)
+
+    def rebuild(self, sheet_rows):
+        """
+        Reconstruye el índice a partir de las filas de la planilla (lista de listas con encabezados).
+        """
+        self.hashes = set()
+        self.has_header = bool(sheet_rows)
+        if len(sheet_rows) > 1:
+            self.add(pd.DataFrame(sheet_rows[1:], columns=sheet_rows[0]))
+        logger.info("Índice de deduplicación reconstruido con %s claves", len(self.hashes))
+
+    def add(self, df):
+        """Agrega las claves de las filas del DataFrame al índice."""
+        self.hashes.update(self.keys(df))
+
+    def contains(self, df):
+        """Devuelve una lista de booleanos: True para las filas que ya están en el índice."""
+        return [key in self.hashes for key in self.keys(df)]
+
+    @staticmethod
+    def keys(df):
+        if df.empty:
+            return []
+        return [hashlib.blake2b(key.encode(), digest_size=8).hexdigest() for key in build_unique_key(df)]
@@ -1,8 +1,17 @@
 import imaplib
 import email
 import logging
+import quopri
+import re
+import time
 
-from bs4 import BeautifulSoup
+MESES_IMAP = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# El código viene en un <span> con 'font-size: 32px'. La regex evita parsear el HTML completo.
+CODIGO_2FA_REGEX = re.compile(r'font-size:\s*32px[^>]*>\s*([^<\s]+)\s*<', re.IGNORECASE)
+
+# Margen para diferencias de reloj entre esta máquina y el servidor de correo.
+TOLERANCIA_RELOJ_SEGUNDOS = 30
 
 
 def conectar_imap(email_address, password):
@@ -49,6 +58,8 @@ def eliminar_correo(mail, email_id):
 
 def procesar_html(html_content):
     """Procesa el contenido HTML para encontrar y devolver el código 2FA."""
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, 'html.parser')
 
     codigo_2fa = soup.find('span', style=lambda value: value and 'font-size: 32px' in value)
@@ -62,3 +73,97 @@ def obtener_codigo_2FA(email_address, password, sender_address):
     if latest_email_id:
         return extraer_y_eliminar_codigo_2fa(mail, latest_email_id)
     return None
+
+
+def formatear_fecha_imap(timestamp):
+    """Formatea un timestamp como fecha para SEARCH SINCE (ej. '05-Mar-2024'), sin depender del locale."""
+    fecha = time.gmtime(timestamp)
+    return f"{fecha.tm_mday:02d}-{MESES_IMAP[fecha.tm_mon - 1]}-{fecha.tm_year}"
+
+
+def buscar_correos_desde(mail, sender_address, desde):
+    """Busca correos del remitente recibidos desde el día del timestamp 'desde' (un día antes por zona horaria)."""
+    status, data = mail.search(None, f'(FROM "{sender_address}" SINCE {formatear_fecha_imap(desde - 86400)})')
+    return data[0].split()
+
+
+def obtener_fecha_y_texto(mail, email_id):
+    """
+    Obtiene la fecha de recepción (timestamp) y el cuerpo crudo del correo, sin marcarlo como leído.
+
+    Sólo se descarga BODY.PEEK[TEXT], no el mensaje RFC822 completo.
+    """
+    status, data = mail.fetch(email_id, '(INTERNALDATE BODY.PEEK[TEXT])')
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            fecha = imaplib.Internaldate2tuple(response_part[0])
+            return (time.mktime(fecha) if fecha else None), response_part[1]
+    return None, None
+
+
+def extraer_codigo(contenido):
+    """
+    Extrae el código 2FA del cuerpo crudo del correo con la regex precompilada.
+
+    Prueba primero el contenido tal cual y después decodificado como quoted-printable. Devuelve None si
+    no lo encuentra, para que se use el parseo completo con BeautifulSoup.
+    """
+    for candidato in (contenido, quopri.decodestring(contenido)):
+        match = CODIGO_2FA_REGEX.search(candidato.decode('utf-8', errors='ignore'))
+        if match:
+            return match.group(1)
+    return None
+
+
+def esperar_codigo_2FA(email_address, password, sender_address, desde, timeout=120, intervalo=2):
+    """
+    Espera el correo con el código 2FA enviado a partir de 'desde' y devuelve el código.
+
+    Consulta la casilla cada 'intervalo' segundos sobre una única conexión IMAP y termina apenas llega
+    el correo, o devuelve None al superar 'timeout'. Sólo considera correos recibidos después del
+    desafío, así no se toma el código de un login anterior.
+
+    Args:
+        email_address (str): Cuenta de Gmail.
+        password (str): Clave de aplicación de Gmail.
+        sender_address (str): Remitente de los correos con el código.
+        desde (float): Timestamp del pedido del desafío 2FA.
+        timeout (float): Segundos máximos de espera.
+        intervalo (float): Segundos entre consultas a la casilla.
+    """
+    mail = conectar_imap(email_address, password)
+    limite = time.monotonic() + timeout
+    try:
+        while True:
+            codigo = buscar_codigo_reciente(mail, sender_address, desde)
+            if codigo:
+                return codigo
+            if time.monotonic() + intervalo > limite:
+                logging.warning("No llegó el correo con el código 2FA en %s segundos.", timeout)
+                return None
+            time.sleep(intervalo)
+            mail.noop()
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+
+def buscar_codigo_reciente(mail, sender_address, desde):
+    """Revisa los correos del remitente, del más nuevo al más viejo, hasta encontrar un código posterior a 'desde'."""
+    for email_id in reversed(buscar_correos_desde(mail, sender_address, desde)):
+        fecha, contenido = obtener_fecha_y_texto(mail, email_id)
+        if fecha is None or fecha < desde - TOLERANCIA_RELOJ_SEGUNDOS:
+            break
+
+        codigo = extraer_codigo(contenido) if contenido else None
+        if codigo:
+            eliminar_correo(mail, email_id)
+            return codigo
+
+        # Si la regex no alcanza (por ejemplo, cuerpo en base64), se parsea el mensaje completo.
+        codigo = extraer_y_eliminar_codigo_2fa(mail, email_id)
+        if codigo:
+            return codigo
+    return None
@@ -0,0 +1,34 @@
+import os
+import shutil
+from datetime import datetime
+
+
+def format_number(val):
+    """Convert numbers to a string with a fixed precision and replace '.' with ','."""
+    if isinstance(val, float):
+        return "{:.2f}".format(round(val, 2)).replace('.', ',')
+    if isinstance(val, int):
+        return str(val)
+    return val
+
+
+def get_now_str():
+    now = datetime.now()
+    return now.strftime("%d-%m-%Y")
+
+
+def column_letter(number):
+    """Convierte un número de columna (1 = A) a su letra en notación A1."""
+    letters = ''
+    while number > 0:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+def dry_run_copy(path, directory):
+    """Copia el archivo de estado (si existe) al directorio de la simulación y devuelve la ruta de la copia."""
+    copy_path = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(path):
+        shutil.copyfile(path, copy_path)
+    return copy_path
@@ -0,0 +1,161 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Partes variables de los paths de la API, para agrupar las llamadas por endpoint.
+ENDPOINT_PATTERNS = [
+    (re.compile(r'/markets/tickers/[^/?]+'), '/markets/tickers/{ticker}'),
+    (re.compile(r'/factors/(?!default\b|devices\b)[^/?]+'), '/factors/{id}'),
+]
+
+
+def endpoint_name(method, url):
+    """Devuelve 'METHOD /path' sin host, query ni partes variables, por ejemplo 'GET /api/v1/transfers'."""
+    path = re.sub(r'^[a-z]+://[^/]+', '', url).split('?', 1)[0]
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return f'{method} {path}'
+
+
+class RunMetrics:
+    """
+    Métricas de una ejecución: tiempo por etapa y llamadas HTTP por endpoint. Es seguro entre threads.
+
+    Las etapas se pueden anidar (por ejemplo, '2fa' dentro de 'login'), así que sus tiempos no se suman.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._start = clock()
+        self.stages = {}
+        self.http = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager que suma la duración del bloque a la etapa 'name'."""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - start
+            with self._lock:
+                stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+                stats['calls'] += 1
+                stats['seconds'] += elapsed
+            logger.debug("Etapa %s: %.3f s", name, elapsed)
+
+    def record_http(self, endpoint, status, seconds, size, retries):
+        with self._lock:
+            stats = self.http.setdefault(endpoint, {'calls': 0, 'errors': 0, 'retries': 0, 'bytes': 0,
+                                                    'seconds': 0.0, 'status': {}})
+            stats['calls'] += 1
+            stats['errors'] += status >= 400
+            stats['retries'] += retries
+            stats['bytes'] += size
+            stats['seconds'] += seconds
+            stats['status'][str(status)] = stats['status'].get(str(status), 0) + 1
+
+    def response_hook(self, response, *args, **kwargs):
+        """Hook de 'response' de requests: registra cada respuesta con sus reintentos y bytes."""
+        try:
+            retry = getattr(getattr(response, 'raw', None), 'retries', None)
+            retries = len(retry.history) if retry is not None and getattr(retry, 'history', None) else 0
+            # Con stream=True el body todavía no se leyó: leerlo acá anularía el streaming
+            body_size = 0 if kwargs.get('stream') else len(response.content or b'')
+            size = int(response.headers.get('Content-Length') or body_size)
+            self.record_http(endpoint_name(response.request.method, response.request.url), response.status_code,
+                             response.elapsed.total_seconds(), size, retries)
+        except Exception as e:
+            # Las métricas nunca deben cortar una llamada a la API
+            logger.debug("No se pudo registrar la llamada HTTP: %s", e)
+
+    def summary(self):
+        """Resumen de la ejecución, serializable a JSON."""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'total_seconds': round(self._clock() - self._start, 3),
+                'stages': {name: {'calls': s['calls'], 'seconds': round(s['seconds'], 3)}
+                           for name, s in sorted(self.stages.items())},
+                'http': {name: dict(s, seconds=round(s['seconds'], 3), status=dict(s['status']))
+                         for name, s in sorted(self.http.items())},
+            }
+
+    def prometheus_text(self):
+        """Las métricas en el formato de texto de Prometheus (para el textfile collector de node_exporter)."""
+        summary = self.summary()
+        lines = [
+            '# HELP cocos_sync_run_seconds Duración total de la ejecución.',
+            '# TYPE cocos_sync_run_seconds gauge',
+            f"cocos_sync_run_seconds {summary['total_seconds']}",
+            '# HELP cocos_sync_last_run_timestamp_seconds Momento de inicio de la última ejecución.',
+            '# TYPE cocos_sync_last_run_timestamp_seconds gauge',
+            f"cocos_sync_last_run_timestamp_seconds {summary['started_at']:.0f}",
+            '# HELP cocos_sync_stage_seconds Duración de cada etapa.',
+            '# TYPE cocos_sync_stage_seconds gauge',
+        ]
+        lines += [f'cocos_sync_stage_seconds{{stage="{name}"}} {stats["seconds"]}'
+                  for name, stats in summary['stages'].items()]
+
+        http_metrics = [('calls', 'Llamadas HTTP.'), ('errors', 'Respuestas HTTP con status >= 400.'),
+                   ('retries', 'Reintentos HTTP.'), ('bytes', 'Bytes recibidos.'),
+                   ('seconds', 'Segundos esperando respuestas HTTP.')]
+        for key, help_text in http_metrics:
+            lines += [f'# HELP cocos_sync_http_{key} {help_text}', f'# TYPE cocos_sync_http_{key} gauge']
+            for endpoint, stats in summary['http'].items():
+                method, path = endpoint.split(' ', 1)
+                lines.append(f'cocos_sync_http_{key}{{method="{method}",endpoint="{path}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self, prometheus_file=None):
+        """Registra el resumen como una línea JSON y, si se indica, lo exporta en formato Prometheus."""
+        logger.info("Resumen de la ejecución: %s", json.dumps(self.summary(), sort_keys=True))
+        if prometheus_file:
+            # Escritura atómica: node_exporter no debe leer un archivo a medio escribir
+            tmp_path = f"{prometheus_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, prometheus_file)
+
+
+# Métricas de la ejecución actual, compartidas por todos los módulos.
+metrics = RunMetrics()
+
+
+def reset_metrics():
+    """Empieza métricas nuevas (por ejemplo, al iniciar otra ejecución en el mismo proceso)."""
+    global metrics
+    metrics = RunMetrics()
+    return metrics
+
+
+def stage(name):
+    """Context manager que mide una etapa en las métricas de la ejecución actual."""
+    return metrics.stage(name)
+
+
+def timed(name):
+    """Decorador que mide cada llamada a la función como la etapa 'name'."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_session(session):
+    """Agrega a la sesión de requests el hook que cuenta llamadas, bytes y reintentos por endpoint."""
+    session.hooks.setdefault('response', []).append(lambda response, *args, **kwargs:
+                                                    metrics.response_hook(response, *args, **kwargs))
+    return session
@@ -1,10 +1,80 @@
+import itertools
 import logging
+import os
+import re
 
+_dump_counter = itertools.count(1)
 
-def setup_logging():
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+def setup_logging(level=logging.INFO):
+    """Configura el logging raíz una sola vez; si ya tiene handlers (propios o de otro entorno), no hace nada."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    logging.basicConfig(level=level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 
 def get_logger(name):
     setup_logging()
     return logging.getLogger(name)
+
+
+class _FrameText:
+    """Renderiza un DataFrame completo recién cuando el logging formatea el mensaje."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def __str__(self):
+        import pandas as pd
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+            return self.df.to_string()
+
+
+def log_frame(logger, label, df, by=None, level=logging.INFO):
+    """
+    Registra un DataFrame sin formatearlo entero en el camino normal.
+
+    En 'level' se registra sólo la forma (y la cantidad de valores distintos de la columna 'by', si se indica).
+    El DataFrame completo se registra sólo si el logger tiene DEBUG habilitado, y se guarda como Parquet
+    en LOG_FRAMES_DIR si está configurado.
+    """
+    if logger.isEnabledFor(level):
+        if by is not None and by in df.columns:
+            logger.log(level, "%s: %s filas x %s columnas, %s %s distintos",
+                       label, df.shape[0], df.shape[1], df[by].nunique(), by)
+        else:
+            logger.log(level, "%s: %s filas x %s columnas", label, df.shape[0], df.shape[1])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s:\n%s", label, _FrameText(df))
+    directory = frames_dir()
+    if directory:
+        dump_frame(logger, label, df, directory)
+
+
+def frames_dir():
+    """
+    Devuelve LOG_FRAMES_DIR. Se lee recién al registrar un DataFrame: importar este módulo sólo para tener
+    un logger no carga settings ni config.py.
+    """
+    from settings import LOG_FRAMES_DIR
+    return LOG_FRAMES_DIR
+
+
+def dump_frame(logger, label, df, directory):
+    """Guarda el DataFrame como '<directorio>/<nnn>_<label>.parquet' para depurarlo fuera del log."""
+    slug = re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')
+    path = os.path.join(directory, f"{next(_dump_counter):03d}_{slug}.parquet")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Parquet no admite nombres de columna no string ni columnas object con tipos mezclados
+        df.rename(columns=str).astype({col: str for col in df.columns[df.dtypes == object]}).to_parquet(path)
+    except ImportError:
+        # pyarrow es opcional: sin él no se guardan los DataFrames
+        logger.warning("No se guardó %s: hace falta el paquete 'pyarrow' para escribir Parquet.", label)
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("No se pudo guardar %s en %s: %s", label, path, e)
+        return None
+    logger.debug("%s guardado en %s", label, path)
+    return path
@@ -0,0 +1,181 @@
+from collections import deque
+import pandas as pd
+from log_config import get_logger
+from config import config
+
+logger = get_logger(__name__)
+
+# Margen para descartar restos de cantidad producidos por la aritmética de punto flotante.
+TOLERANCIA_CANTIDAD = 1e-9
+
+OBSERVACION_FIFO = "Match FIFO."
+OBSERVACION_FIFO_PARCIAL = "Match FIFO parcial."
+
+
+class Lote:
+    """Porción todavía abierta de una compra dentro del ledger."""
+
+    __slots__ = ('posicion', 'fila', 'cantidad', 'monto')
+
+    def __init__(self, posicion, fila, cantidad, monto):
+        self.posicion = posicion
+        self.fila = fila
+        self.cantidad = cantidad
+        self.monto = monto
+
+
+class LotLedger:
+    """
+    Ledger FIFO de lotes por ticker.
+
+    Recorre compras y ventas de cada ticker en orden de fecha: cada compra agrega un lote al final de
+    una cola y cada venta consume lotes desde el principio, partiendo el lote cuando la venta lo cierra
+    sólo en parte. Cada porción consumida genera una posición cerrada con las columnas 'buy_' y 'sell_'
+    que usa el resto del flujo. Lo que queda en las colas son las compras abiertas; las ventas que no
+    encuentran lotes (por ejemplo, compras anteriores al rango consultado) quedan como ventas sin match.
+    """
+
+    def __init__(self, column_config=None):
+        self.config = column_config or config
+
+    def match(self, buys_df, sells_df):
+        """
+        Empareja ventas contra compras en orden FIFO.
+
+        Args:
+            buys_df (pd.DataFrame): Compras, con cantidad positiva.
+            sells_df (pd.DataFrame): Ventas, con cantidad negativa.
+
+        Returns:
+            tuple: (posiciones_cerradas, compras_abiertas, ventas_sin_match). Las filas abiertas conservan
+            el índice original, con cantidad y monto reducidos si fueron consumidas en parte.
+        """
+        cantidad_col = self.config['cantidad']
+        monto_col = self.config['monto']
+
+        buy_records = buys_df.to_dict('records')
+        sell_records = sells_df.to_dict('records')
+
+        lotes_por_ticker = {}
+        sin_orden = []
+        compras_cerradas = []
+        ventas_cerradas = []
+        observaciones = []
+        ventas_abiertas = {}
+
+        for lado, posicion, ticker in self._eventos_ordenados(buys_df, sells_df, sin_orden):
+            if lado == 0:
+                fila = buy_records[posicion]
+                lote = Lote(posicion, fila, fila[cantidad_col], fila[monto_col])
+                lotes_por_ticker.setdefault(ticker, deque()).append(lote)
+                continue
+
+            venta = sell_records[posicion]
+            cantidad_venta = abs(venta[cantidad_col])
+            restante = cantidad_venta
+            cola = lotes_por_ticker.get(ticker)
+
+            while cola and restante > TOLERANCIA_CANTIDAD:
+                lote = cola[0]
+                cantidad = min(lote.cantidad, restante)
+                cantidad_compra = lote.fila[cantidad_col]
+
+                compras_cerradas.append(self._porcion(lote.fila, cantidad, cantidad_compra))
+                ventas_cerradas.append(self._porcion(venta, -cantidad, cantidad_venta))
+                completa = self._es_igual(cantidad, cantidad_compra) and self._es_igual(cantidad, cantidad_venta)
+                observaciones.append(OBSERVACION_FIFO if completa else OBSERVACION_FIFO_PARCIAL)
+
+                lote.monto -= lote.fila[monto_col] * cantidad / cantidad_compra
+                lote.cantidad -= cantidad
+                restante -= cantidad
+                if lote.cantidad <= TOLERANCIA_CANTIDAD:
+                    cola.popleft()
+
+            if restante > TOLERANCIA_CANTIDAD:
+                ventas_abiertas[posicion] = self._porcion(venta, -restante, cantidad_venta)
+
+        posiciones_cerradas = self._armar_cerradas(compras_cerradas, ventas_cerradas, observaciones)
+
+        lotes_abiertos = [lote for cola in lotes_por_ticker.values() for lote in cola]
+        compras_abiertas = {lote.posicion: self._fila_lote(lote) for lote in lotes_abiertos}
+        for lado, posicion in sin_orden:
+            if lado == 0:
+                compras_abiertas[posicion] = buy_records[posicion]
+            else:
+                ventas_abiertas[posicion] = sell_records[posicion]
+
+        compras_abiertas = self._armar_abiertas(buys_df, compras_abiertas)
+        ventas_abiertas = self._armar_abiertas(sells_df, ventas_abiertas)
+
+        logger.info("Ledger FIFO: %s posiciones cerradas | %s compras abiertas | %s ventas sin match",
+                    len(posiciones_cerradas), len(compras_abiertas), len(ventas_abiertas))
+
+        return posiciones_cerradas, compras_abiertas, ventas_abiertas
+
+    def _eventos_ordenados(self, buys_df, sells_df, sin_orden):
+        """
+        Devuelve los eventos (lado, posición, ticker) ordenados por ticker, fecha y lado.
+
+        A igual fecha las compras van antes que las ventas. Las filas sin ticker, fecha o cantidad no
+        pueden ubicarse en el ledger: se agregan a 'sin_orden' como (lado, posición) y quedan abiertas.
+        """
+        ticker_col = self.config['ticker']
+        fecha_col = self.config['fecha']
+        cantidad_col = self.config['cantidad']
+
+        eventos = pd.concat([
+            pd.DataFrame({
+                'ticker': df[ticker_col].to_numpy(),
+                'fecha': df[fecha_col].to_numpy(),
+                'cantidad': df[cantidad_col].to_numpy(),
+                'lado': lado,
+                'posicion': range(len(df)),
+            })
+            for lado, df in ((0, buys_df), (1, sells_df))
+        ], ignore_index=True)
+
+        incompletos = eventos[['ticker', 'fecha', 'cantidad']].isna().any(axis=1)
+        sin_orden.extend(zip(eventos.loc[incompletos, 'lado'].tolist(), eventos.loc[incompletos, 'posicion'].tolist()))
+
+        eventos = eventos[~incompletos].sort_values(['ticker', 'fecha', 'lado', 'posicion'], kind='stable')
+        return zip(eventos['lado'].tolist(), eventos['posicion'].tolist(), eventos['ticker'].tolist())
+
+    def _porcion(self, fila, cantidad, cantidad_total):
+        """Copia la fila con la cantidad indicada y el monto proporcional a esa cantidad."""
+        porcion = dict(fila)
+        porcion[self.config['cantidad']] = cantidad
+        porcion[self.config['monto']] = fila[self.config['monto']] * abs(cantidad) / cantidad_total
+        return porcion
+
+    def _fila_lote(self, lote):
+        """Devuelve la fila de compra con la cantidad y el monto que le quedan al lote."""
+        if self._es_igual(lote.cantidad, lote.fila[self.config['cantidad']]):
+            return lote.fila
+        fila = dict(lote.fila)
+        fila[self.config['cantidad']] = lote.cantidad
+        fila[self.config['monto']] = lote.monto
+        return fila
+
+    @staticmethod
+    def _es_igual(a, b):
+        return abs(a - b) <= TOLERANCIA_CANTIDAD
+
+    @staticmethod
+    def _armar_cerradas(compras, ventas, observaciones):
+        if not compras:
+            return pd.DataFrame()
+        cerradas = pd.concat([
+            pd.DataFrame(compras).add_prefix('buy_'),
+            pd.DataFrame(ventas).add_prefix('sell_'),
+        ], axis=1)
+        cerradas['observacion'] = observaciones
+        return cerradas
+
+    @staticmethod
+    def _armar_abiertas(df, filas_por_posicion):
+        """Arma el DataFrame de filas abiertas en el orden original y con el índice original."""
+        if not filas_por_posicion:
+            return df.iloc[0:0]
+        posiciones = sorted(filas_por_posicion)
+        return pd.DataFrame([filas_por_posicion[p] for p in posiciones], columns=df.columns,
+                            index=df.index[posiciones])
@@ -1,5 +1,17 @@
-from trading import Trading
+"""
+Punto de entrada para cron y Google Cloud Functions.
 
-cocos = Trading()
-cocos.insert_total_daily()
-cocos.get_and_save_range_movements('2022-09-01')
\ No newline at end of file
+Es un atajo a la línea de comandos de cocos_sync: sin argumentos ejecuta 'all' (total diario y
+sincronización de operaciones). Ver `python -m cocos_sync --help`.
+"""
+import sys
+from cocos_sync.cli import main
+
+
+def sync_all(event=None, context=None):
+    """Entry point de Google Cloud Functions. 'event' y 'context' no se usan."""
+    main(['all'])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
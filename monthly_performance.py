@@ -0,0 +1,206 @@
+"""
+Rendimiento mensual de la cuenta, mantenido de forma incremental.
+
+Por mes se calcula el resultado realizado (posiciones cerradas en el mes), el no realizado (posiciones
+abiertas a precio de hoy), la cantidad de operaciones cerradas y ganadoras y la variación del patrimonio
+respecto del mes anterior. Los agregados se guardan en un archivo JSON local, así cada ejecución sólo
+recalcula y escribe los meses que cambiaron, sin releer las solapas 'Operaciones' ni 'Total diario'.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from helpers import column_letter
+from log_config import get_logger
+from settings import MONTHLY_PERFORMANCE_TAB
+from transform_data import build_position_key, normalize_date_column
+
+logger = get_logger(__name__)
+
+MONTHLY_COLUMNS = ['Mes', 'Resultado realizado', 'Resultado no realizado', 'Operaciones cerradas',
+                   'Operaciones ganadoras', '% Ganadoras', 'Patrimonio al cierre', 'Variación patrimonio',
+                   'Variación patrimonio %']
+
+# Versión del formato de las claves de 'realized' (ver build_position_key)
+REALIZED_KEY_VERSION = 3
+
+
+def closed_positions_by_month(positions):
+    """
+    Resultado realizado de cada posición cerrada del template, con el mes de cierre ('YYYY-MM').
+
+    La clave de cada posición es la de build_position_key (los ids de su compra y su venta): así los cierres
+    parciales de un mismo lote no se pisan, aunque lleguen en ejecuciones distintas, y volver a procesar una
+    posición no la cuenta dos veces.
+    """
+    closed = positions[positions['Estado'] == 'Cerrada']
+    return pd.DataFrame({
+        'mes': normalize_date_column(closed['Fecha de Cierre']).str[:7],
+        'clave': build_position_key(closed),
+        'resultado': pd.to_numeric(closed['Rentabilidad Ars'], errors='coerce'),
+    })
+
+
+def unrealized_total(positions):
+    """Suma del resultado a hoy de las posiciones abiertas (las que no tienen precio no suman)."""
+    open_positions = positions[positions['Estado'] == 'Abierta']
+    return round(float(pd.to_numeric(open_positions['Rentabilidad ARs'], errors='coerce').sum()), 2)
+
+
+def month_end_equity(daily_totals):
+    """
+    Patrimonio al cierre de cada mes: el último total en ARS del mes, a partir de los totales diarios
+    (diccionarios con 'day' y 'total_ars', ver PortfolioStore.account_series).
+    """
+    if not daily_totals:
+        return {}
+    totals = pd.DataFrame(daily_totals)
+    series = pd.Series(pd.to_numeric(totals['total_ars'], errors='coerce').to_numpy(),
+                       index=pd.to_datetime(totals['day'], format='%Y-%m-%d')).dropna()
+    monthly = series.resample('MS').last().dropna()
+    return {month.strftime('%Y-%m'): round(float(value), 2) for month, value in monthly.items()}
+
+
+def cell(value):
+    """Valor para la planilla: vacío si falta, redondeado a dos decimales si es un número con decimales."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    return round(value, 2) if isinstance(value, float) else value
+
+
+class MonthlyPerformance:
+    """
+    Agregados por mes guardados en un archivo JSON local, y su solapa de la planilla.
+
+    Guarda el resultado realizado de cada posición cerrada por mes de cierre, el resultado no realizado del
+    mes (el de la última ejecución del mes: al terminar el mes queda fijo) y el patrimonio al cierre de
+    cada mes. La solapa tiene una fila por mes, en orden: la fila de un mes es su posición entre los meses
+    conocidos, así sólo se reescriben los meses que cambiaron (y los siguientes, si aparece un mes anterior).
+    """
+
+    def __init__(self, path, tab_name=MONTHLY_PERFORMANCE_TAB):
+        self.path = path
+        self.tab_name = tab_name
+        self.realized = {}
+        self.unrealized = {}
+        self.equity = {}
+        self.has_header = False
+
+    def load(self):
+        """Carga los agregados guardados. Devuelve False si no hay archivo o no se puede leer."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo leer el rendimiento mensual %s: %s", self.path, e)
+            return False
+
+        self.realized = stored['realized']
+        if stored.get('key_version') != REALIZED_KEY_VERSION:
+            # Con las claves anteriores, volver a procesar una posición la contaría dos veces
+            logger.warning("El rendimiento mensual %s usa otro formato de claves: se descarta el resultado realizado "
+                           "guardado. Ejecutar 'backfill' para recalcularlo.", self.path)
+            self.realized = {}
+        self.unrealized = stored['unrealized']
+        self.equity = stored['equity']
+        self.has_header = stored.get('has_header', True)
+        return True
+
+    def save(self):
+        """Guarda los agregados reemplazando el archivo de forma atómica."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key_version': REALIZED_KEY_VERSION, 'has_header': self.has_header, 'realized': self.realized,
+                       'unrealized': self.unrealized, 'equity': self.equity}, f)
+        os.replace(tmp_path, self.path)
+
+    def months(self):
+        return sorted(set(self.realized) | set(self.unrealized) | set(self.equity))
+
+    def update(self, positions, current_month, daily_totals=None):
+        """
+        Suma al estado las posiciones del template (ver transform_data.build_template_df) y los totales
+        diarios, y devuelve los meses que cambiaron.
+
+        Las posiciones abiertas del template tienen que ser todas las abiertas: su resultado a hoy pasa a
+        ser el no realizado de 'current_month' ('YYYY-MM').
+        """
+        months_before = self.months()
+        touched = set()
+
+        closed = closed_positions_by_month(positions)
+        closed = closed[closed['mes'].str.match(r'\d{4}-\d{2}$')]
+        for mes, clave, resultado in closed.itertuples(index=False):
+            resultado = None if pd.isna(resultado) else float(resultado)
+            del_mes = self.realized.setdefault(mes, {})
+            if clave not in del_mes or del_mes[clave] != resultado:
+                del_mes[clave] = resultado
+                touched.add(mes)
+
+        unrealized = unrealized_total(positions)
+        if self.unrealized.get(current_month) != unrealized:
+            self.unrealized[current_month] = unrealized
+            touched.add(current_month)
+
+        for month, equity in month_end_equity(daily_totals).items():
+            if self.equity.get(month) != equity:
+                self.equity[month] = equity
+                touched.add(month)
+
+        months = self.months()
+        # La variación de patrimonio de un mes depende del anterior: se recalcula también el mes siguiente
+        touched |= {months[months.index(month) + 1] for month in list(touched)
+                    if month in self.equity and months.index(month) + 1 < len(months)}
+        # Un mes nuevo antes de los conocidos corre una fila a todos los siguientes
+        new_months = [month for month in months if month not in months_before]
+        if new_months and months_before and new_months[0] < months_before[-1]:
+            touched |= {month for month in months if month >= new_months[0]}
+        return sorted(touched)
+
+    def rows(self, months):
+        """Filas de la solapa de los meses indicados, calculadas sobre los agregados guardados."""
+        if not months:
+            return []
+        all_months = self.months()
+        closed = pd.DataFrame([(month, resultado) for month in months
+                               for resultado in self.realized.get(month, {}).values()],
+                              columns=['mes', 'resultado'])
+        closed['resultado'] = closed['resultado'].astype(float)
+        por_mes = closed.groupby('mes')['resultado'].agg(
+            realizado='sum', cerradas='size', ganadoras=lambda resultados: int((resultados > 0).sum()))
+        por_mes = por_mes.reindex(months).fillna({'realizado': 0.0, 'cerradas': 0, 'ganadoras': 0})
+
+        equity = pd.Series(self.equity, dtype=float).reindex(all_months)
+        variacion = equity.diff()
+        variacion_pct = variacion / equity.shift(1) * 100
+
+        rows = []
+        for month in months:
+            cerradas = int(por_mes.at[month, 'cerradas'])
+            ganadoras = int(por_mes.at[month, 'ganadoras'])
+            rows.append([cell(value) for value in (
+                month,
+                float(por_mes.at[month, 'realizado']),
+                self.unrealized.get(month),
+                cerradas,
+                ganadoras,
+                ganadoras / cerradas * 100 if cerradas else None,
+                float(equity.at[month]),
+                float(variacion.at[month]),
+                float(variacion_pct.at[month]),
+            )])
+        return rows
+
+    def write(self, sheet_writer, months):
+        """Encola en el sheet_writer las filas de los meses indicados, cada una en su fila de la solapa."""
+        all_months = self.months()
+        last_column = column_letter(len(MONTHLY_COLUMNS))
+        if not self.has_header:
+            sheet_writer.update(f"'{self.tab_name}'!A1:{last_column}1", [MONTHLY_COLUMNS])
+            self.has_header = True
+        for month, row in zip(months, self.rows(months)):
+            number = all_months.index(month) + 2
+            sheet_writer.update(f"'{self.tab_name}'!A{number}:{last_column}{number}", [row])
+        logger.info("Rendimiento mensual en '%s': %s meses actualizados", self.tab_name, len(months))
@@ -0,0 +1,182 @@
+"""
+Histórico local del portfolio de cada cuenta.
+
+No depende de pandas, para que el comando que sólo registra el total diario siga arrancando rápido.
+"""
+import datetime
+import json
+import sqlite3
+from contextlib import closing
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    month TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    total_ars REAL,
+    total_usd REAL,
+    raw TEXT NOT NULL,
+    PRIMARY KEY (account, day)
+);
+CREATE TABLE IF NOT EXISTS positions (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    month TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    quantity REAL,
+    price REAL,
+    amount REAL,
+    PRIMARY KEY (account, day, ticker)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_month ON snapshots (account, month);
+CREATE INDEX IF NOT EXISTS idx_snapshots_series ON snapshots (account, day, total_ars, total_usd);
+CREATE INDEX IF NOT EXISTS idx_positions_series ON positions (ticker, day, account, quantity, price, amount);
+CREATE INDEX IF NOT EXISTS idx_positions_month ON positions (account, month);
+"""
+
+# Nombres posibles de cada dato de una posición en la respuesta de /wallet/portfolio.
+POSITION_FIELDS = {
+    'ticker': ('ticker', 'short_ticker', 'instrument_code'),
+    'quantity': ('quantity', 'qty'),
+    'price': ('last', 'price', 'last_price'),
+    'amount': ('amount', 'total', 'value'),
+}
+
+
+def first_field(item, names):
+    return next((item[name] for name in names if item.get(name) is not None), None)
+
+
+def portfolio_positions(portfolio):
+    """
+    Devuelve las posiciones de una respuesta de /wallet/portfolio como diccionarios con ticker, quantity,
+    price y amount.
+
+    Las posiciones son los diccionarios con ticker de las listas del primer nivel de la respuesta; los
+    datos que no vienen quedan en None. Si un ticker aparece más de una vez, queda el último.
+    """
+    positions = {}
+    for value in portfolio.values():
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if not isinstance(item, dict):
+                continue
+            ticker = first_field(item, POSITION_FIELDS['ticker'])
+            if ticker is None:
+                continue
+            positions[str(ticker)] = {name: first_field(item, names) for name, names in POSITION_FIELDS.items()}
+            positions[str(ticker)]['ticker'] = str(ticker)
+    return list(positions.values())
+
+
+class PortfolioStore:
+    """
+    Copia local de la respuesta completa de /wallet/portfolio de cada ejecución, en una base SQLite.
+
+    Se guarda una foto por cuenta y por día (una nueva ejecución el mismo día reemplaza la del día) con el
+    total y el JSON original, y una fila por posición. Los días anteriores no se modifican. Cada fila lleva el
+    mes ('YYYY-MM') como clave de partición, y los índices por cuenta y mes y por ticker y día permiten
+    armar series de tiempo sin pedirlas a la API ni leer la planilla.
+
+    La cuenta única de config.py se guarda como account ''.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Varias cuentas pueden guardar en paralelo: se espera el lock de SQLite en lugar de fallar
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, portfolio, account=None, taken_at=None):
+        """
+        Guarda la foto del portfolio del día de 'taken_at' (por defecto, ahora).
+
+        Returns:
+            int: Cantidad de posiciones guardadas.
+        """
+        taken_at = taken_at or datetime.datetime.now()
+        day = taken_at.strftime('%Y-%m-%d')
+        month = day[:7]
+        account = account or ''
+        total = portfolio.get('total') or {}
+        positions = portfolio_positions(portfolio)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (account, day, month, taken_at.isoformat(timespec='seconds'), total.get('ars'),
+                          total.get('usd'), json.dumps(portfolio, default=str)))
+            # La foto nueva del día reemplaza las posiciones de la anterior, incluidas las que ya no están
+            conn.execute("DELETE FROM positions WHERE account = ? AND day = ?", (account, day))
+            conn.executemany("INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [(account, day, month, p['ticker'], p['quantity'], p['price'], p['amount'])
+                              for p in positions])
+
+        logger.info("PortfolioStore: foto del %s con %s posiciones guardada en %s", day, len(positions), self.path)
+        return len(positions)
+
+    @staticmethod
+    def _range(conditions, params, since, until, account=None):
+        if account is not None:
+            conditions.append("account = ?")
+            params.append(account)
+        if since:
+            conditions.append("day >= ?")
+            params.append(since)
+        if until:
+            conditions.append("day <= ?")
+            params.append(until)
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    def _query(self, query, params):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def account_series(self, account=None, since=None, until=None):
+        """
+        Total diario de una cuenta ('' es la cuenta única), ordenado por día.
+
+        Args:
+            since (str, opcional): Día desde ('YYYY-MM-DD'), inclusive.
+            until (str, opcional): Día hasta ('YYYY-MM-DD'), inclusive.
+
+        Returns:
+            list: Diccionarios con day, total_ars y total_usd.
+        """
+        params = []
+        where = self._range([], params, since, until, account or '')
+        return self._query(f"SELECT day, total_ars, total_usd FROM snapshots{where} ORDER BY day", params)
+
+    def ticker_series(self, ticker, account=None, since=None, until=None):
+        """
+        Posición diaria de un ticker, ordenada por día y cuenta. Sin 'account' incluye todas las cuentas.
+
+        Returns:
+            list: Diccionarios con account, day, quantity, price y amount.
+        """
+        params = [ticker]
+        where = self._range(["ticker = ?"], params, since, until, account)
+        return self._query("SELECT account, day, quantity, price, amount FROM positions"
+                           f"{where} ORDER BY day, account", params)
+
+    def snapshot(self, day, account=None):
+        """Respuesta original de /wallet/portfolio guardada para ese día, o None."""
+        rows = self._query("SELECT raw FROM snapshots WHERE account = ? AND day = ?", [account or '', day])
+        return json.loads(rows[0]['raw']) if rows else None
+
+    def months(self, account=None):
+        """Meses ('YYYY-MM') con fotos de la cuenta, en orden."""
+        rows = self._query("SELECT DISTINCT month FROM snapshots WHERE account = ? ORDER BY month", [account or ''])
+        return [row['month'] for row in rows]
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
@@ -0,0 +1,416 @@
+"""
+Alertas de precio de las posiciones abiertas.
+
+Un watcher de larga duración consulta el precio de los tickers con compras abiertas (las que quedan sin cerrar
+en TradingOperations.analizar_match, guardadas en el estado de sincronización) y avisa cuando un lote supera
+el umbral de ganancia o de pérdida. Los avisos se envían a sinks intercambiables: el log, un webhook o un bot
+de Telegram.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from config import config
+from log_config import get_logger
+from rate_limiter import AsyncTokenBucket
+from settings import PRICE_ALERT_GAIN_PCT, PRICE_ALERT_LOSS_PCT, PRICE_ALERT_THRESHOLDS, PRICE_ALERT_INTERVAL, \
+    PRICE_ALERT_INTERVALS, PRICE_ALERT_REQUESTS_PER_MINUTE, PRICE_ALERT_WEBHOOK_URL, TELEGRAM_BOT_TOKEN, \
+    TELEGRAM_CHAT_ID, PRICE_FETCH_WORKERS, HTTP_TIMEOUT, SYNC_STATE_FILE
+
+logger = get_logger(__name__)
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+# Cantidad de consultas recientes con las que se calculan los percentiles de latencia
+LATENCY_WINDOW = 10_000
+
+
+class OpenLots:
+    """
+    Lotes abiertos como arrays de numpy, para evaluar los umbrales de todos los lotes en una sola operación.
+
+    Cada lote guarda la posición de su ticker en 'tickers', así el precio de cada lote es prices[ticker_index]
+    para un array 'prices' con un precio por ticker. Los lotes sin ticker o sin cantidad se descartan.
+
+    Args:
+        buys (pd.DataFrame): Compras abiertas, con las columnas de las transferencias de la API (ver
+            SyncState.open_buys) y opcionalmente 'account'.
+    """
+
+    def __init__(self, buys):
+        if buys.empty:
+            buys = pd.DataFrame(columns=[config['ticker'], config['cantidad'], config['precio']])
+        quantity = pd.to_numeric(buys[config['cantidad']], errors='coerce')
+        buys = buys[buys[config['ticker']].notna() & quantity.notna() & (quantity != 0)]
+
+        codes, tickers = pd.factorize(buys[config['ticker']].astype(object))
+        self.tickers = [str(ticker) for ticker in tickers]
+        self.ticker_index = codes
+        self.quantity = pd.to_numeric(buys[config['cantidad']], errors='coerce').to_numpy(dtype=float)
+        self.cost = pd.to_numeric(buys[config['precio']], errors='coerce').abs().to_numpy(dtype=float)
+        # Monto de compra: el de la transferencia o, si falta, precio por cantidad
+        amount = buys[config['monto']] if config['monto'] in buys.columns else pd.Series(np.nan, index=buys.index)
+        invested = pd.to_numeric(amount, errors='coerce').abs().to_numpy(dtype=float)
+        self.invested = np.where(np.isnan(invested) | (invested == 0), self.cost * self.quantity, invested)
+
+        self.accounts = buys['account'].tolist() if 'account' in buys.columns else [''] * len(buys)
+        self.ids = buys['id'].tolist() if 'id' in buys.columns else [None] * len(buys)
+        self.dates = buys[config['fecha']].astype(str).str[:10].tolist() if config['fecha'] in buys.columns \
+            else [None] * len(buys)
+
+    def __len__(self):
+        return len(self.ticker_index)
+
+
+def load_open_lots(accounts):
+    """Lotes abiertos del estado de sincronización de cada cuenta, con el nombre de la cuenta en 'account'."""
+    from sync_state import SyncState
+
+    frames = []
+    for account in accounts:
+        state = SyncState(account.state_file(SYNC_STATE_FILE))
+        if state.load() and not state.open_buys.empty:
+            frames.append(state.open_buys.assign(account=account.name or ''))
+    return OpenLots(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+
+
+class AlertRules:
+    """
+    Umbrales de ganancia y de pérdida de cada lote, evaluados sobre todos los lotes a la vez.
+
+    Un lote avisa cuando su variación entra en la zona de ganancia (>= gain_pct) o de pérdida (<= -loss_pct).
+    Mientras siga en esa zona no vuelve a avisar; si vuelve a la zona intermedia, puede avisar otra vez.
+
+    Los umbrales en % se pasan una sola vez a precios límite por lote, así cada evaluación es sólo comparar
+    el precio de cada lote contra sus límites. Los lotes sin monto de compra no avisan.
+    """
+
+    def __init__(self, lots, gain_pct=PRICE_ALERT_GAIN_PCT, loss_pct=PRICE_ALERT_LOSS_PCT, thresholds=None):
+        self.lots = lots
+        thresholds = thresholds or {}
+        # Umbral de cada lote: el de su ticker si tiene uno propio, o el general
+        by_ticker = np.array([thresholds.get(ticker, (gain_pct, loss_pct)) for ticker in lots.tickers],
+                             dtype=float).reshape(-1, 2)
+        self.gain_pct = by_ticker[lots.ticker_index, 0]
+        self.loss_pct = by_ticker[lots.ticker_index, 1]
+
+        # Variación en % por cada peso de diferencia entre el precio y el de compra
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.pct_per_peso = np.where(lots.invested > 0, lots.quantity / lots.invested * 100, np.nan)
+            self.upper = lots.cost + self.gain_pct / self.pct_per_peso
+            self.lower = lots.cost - self.loss_pct / self.pct_per_peso
+        # Zona actual de cada lote: 1 ganancia, -1 pérdida, 0 intermedia
+        self.zone = np.zeros(len(lots), dtype=np.int8)
+
+    def evaluate(self, prices):
+        """
+        Evalúa los umbrales de todos los lotes con el precio de cada ticker.
+
+        Args:
+            prices (np.ndarray): Precio de cada ticker de lots.tickers, NaN si todavía no se conoce. Los lotes
+                sin precio mantienen su zona.
+
+        Returns:
+            list: Una alerta (diccionario) por cada lote que entró en la zona de ganancia o de pérdida.
+        """
+        lots = self.lots
+        lot_prices = prices[lots.ticker_index]
+        zone = (lot_prices >= self.upper).astype(np.int8) - (lot_prices <= self.lower)
+        zone = np.where(np.isnan(lot_prices), self.zone, zone)
+        crossed = np.flatnonzero((zone != 0) & (zone != self.zone))
+        self.zone = zone
+
+        change = (lot_prices[crossed] - lots.cost[crossed]) * self.pct_per_peso[crossed]
+        return [{
+            'account': lots.accounts[i],
+            'ticker': lots.tickers[lots.ticker_index[i]],
+            'id': lots.ids[i],
+            'date': lots.dates[i],
+            'quantity': float(lots.quantity[i]),
+            'cost': float(lots.cost[i]),
+            'price': float(lot_prices[i]),
+            'change_pct': round(float(pct), 2),
+            'kind': 'gain' if zone[i] > 0 else 'loss',
+            'threshold_pct': float(self.gain_pct[i] if zone[i] > 0 else -self.loss_pct[i]),
+        } for i, pct in zip(crossed, change)]
+
+
+def format_alert(alert):
+    kind = 'ganancia' if alert['kind'] == 'gain' else 'pérdida'
+    account = f" [{alert['account']}]" if alert['account'] else ''
+    return (f"{alert['ticker']}{account}: {alert['change_pct']:+.2f}% ({kind}, umbral {alert['threshold_pct']:+g}%) "
+            f"| {alert['quantity']:g} comprados el {alert['date']} a {alert['cost']:g}, hoy {alert['price']:g}")
+
+
+class LogSink:
+    """Registra cada alerta en el log."""
+
+    def send(self, alerts):
+        for alert in alerts:
+            logger.warning("Alerta de precio: %s", format_alert(alert))
+
+
+class WebhookSink:
+    """Envía las alertas de cada tick en un POST con JSON ({'alerts': [...]}) a la URL indicada."""
+
+    def __init__(self, url, session=None, timeout=HTTP_TIMEOUT):
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def send(self, alerts):
+        self.session.post(self.url, json={'alerts': alerts}, timeout=self.timeout).raise_for_status()
+
+
+class TelegramSink:
+    """Envía las alertas de cada tick en un mensaje de un bot de Telegram (sendMessage)."""
+
+    def __init__(self, token, chat_id, session=None, timeout=HTTP_TIMEOUT, base_url=TELEGRAM_API_URL):
+        self.url = f'{base_url}/bot{token}/sendMessage'
+        self.chat_id = chat_id
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def send(self, alerts):
+        text = "\n".join(format_alert(alert) for alert in alerts)
+        self.session.post(self.url, json={'chat_id': self.chat_id, 'text': text},
+                          timeout=self.timeout).raise_for_status()
+
+
+def build_sinks():
+    """Sinks configurados en settings: siempre el log, y el webhook y Telegram si están configurados."""
+    sinks = [LogSink()]
+    if PRICE_ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(PRICE_ALERT_WEBHOOK_URL))
+    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+        sinks.append(TelegramSink(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID))
+    return sinks
+
+
+class RefreshingFetch:
+    """
+    Consulta de precios que mantiene viva la sesión de Cocos durante todo el watcher.
+
+    Antes de cada consulta renueva el token si está por vencer, y si la API responde 401 (token vencido o
+    revocado) lo renueva y reintenta una vez. La renovación usa el refresh token y, si no alcanza, el login
+    completo. Es seguro entre los threads del watcher: si varios reciben el 401 a la vez, renueva uno solo.
+    Si la renovación falla, no se vuelve a intentar hasta pasados 'retry_interval' segundos, para no repetir
+    el login (y su código 2FA) en cada consulta.
+
+    Args:
+        cocos (CocosCapital): Sesión con la que se piden los precios.
+        fetch_price (callable): Recibe el ticker y devuelve su precio (por ejemplo, PriceService.get_price).
+    """
+
+    def __init__(self, cocos, fetch_price, retry_interval=60, clock=time.monotonic):
+        self.cocos = cocos
+        self.fetch_price = fetch_price
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.renewals = 0
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker):
+        if self.cocos.token_is_expired():
+            self.renew(self.cocos.token)
+        token = self.cocos.token
+        try:
+            return self.fetch_price(ticker)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            logger.warning("La API rechazó el token al pedir el precio de %s: se renueva la sesión", ticker)
+            self.renew(token)
+            return self.fetch_price(ticker)
+
+    def renew(self, token):
+        """Renueva la sesión, salvo que otro thread ya haya reemplazado 'token' por uno nuevo."""
+        with self._lock:
+            if self.cocos.token != token or self.clock() < self._next_attempt:
+                return
+            if not self.cocos.refresh_session():
+                self.cocos.login()
+            self.renewals += 1
+            if not self.cocos.token:
+                logger.error("No se pudo renovar la sesión de Cocos: se reintenta en %s s", self.retry_interval)
+                self._next_attempt = self.clock() + self.retry_interval
+
+
+class PriceWatcher:
+    """
+    Consulta periódicamente el precio de los tickers de los lotes abiertos y envía a los sinks las alertas de
+    los lotes que cruzan un umbral.
+
+    El scheduler corre en un loop de asyncio, con una tarea por ticker y un intervalo por ticker: cada tarea
+    espera su turno, pasa por el limitador de tasa compartido y consulta el precio (las consultas a la API son
+    bloqueantes: van a un pool de threads acotado). Las primeras consultas se reparten a lo largo del
+    intervalo, para no pedir todos los tickers a la vez. Cada precio nuevo despierta al evaluador, que en cada
+    tick evalúa los umbrales de todos los lotes con una sola operación sobre arrays (ver AlertRules), con
+    todos los precios que llegaron desde el tick anterior.
+
+    Args:
+        fetch_price (callable): fetch_price(ticker) devuelve el último precio, o None. Por ejemplo
+            PriceService(cocos).get_price.
+        lots (OpenLots): Lotes abiertos a vigilar.
+        sinks (list): Objetos con send(alerts). Un sink que falla no corta a los demás.
+        intervals (dict): Segundos entre consultas por ticker. Los demás usan 'default_interval'.
+        limiter (AsyncTokenBucket): Limitador compartido por todas las consultas. None para no limitar.
+        rules (AlertRules): Umbrales. Por defecto, los de settings.
+    """
+
+    def __init__(self, fetch_price, lots, sinks, intervals=None, default_interval=PRICE_ALERT_INTERVAL,
+                 limiter=None, max_workers=PRICE_FETCH_WORKERS, rules=None, clock=time.monotonic):
+        self.fetch_price = fetch_price
+        self.lots = lots
+        self.sinks = sinks
+        intervals = intervals or {}
+        self.intervals = [intervals.get(ticker, default_interval) for ticker in lots.tickers]
+        self.limiter = limiter
+        self.max_workers = max_workers
+        self.rules = rules or AlertRules(lots)
+        self.prices = np.full(len(lots.tickers), np.nan)
+        self._clock = clock
+        self._stopped = False
+        self._loop = None
+        self._stop_event = None
+        self._updated = None
+        # Momento en que le tocaba a cada consulta que terminó después del último tick
+        self._pending = []
+
+        self.ticks = 0
+        self.polls = 0
+        self.errors = 0
+        self.alerts = 0
+        # Sólo las últimas LATENCY_WINDOW: un watcher que corre por días no acumula memoria
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.elapsed = 0.0
+
+    @classmethod
+    def from_settings(cls, fetch_price, lots, sinks=None):
+        return cls(fetch_price, lots, sinks or build_sinks(), intervals=PRICE_ALERT_INTERVALS,
+                   limiter=AsyncTokenBucket(PRICE_ALERT_REQUESTS_PER_MINUTE),
+                   rules=AlertRules(lots, thresholds=PRICE_ALERT_THRESHOLDS))
+
+    def run(self, duration=None):
+        """Vigila los precios durante 'duration' segundos (por defecto, hasta stop() o Ctrl+C)."""
+        try:
+            asyncio.run(self.watch(duration))
+        except KeyboardInterrupt:
+            logger.info("Alertas de precio detenidas.")
+        logger.info("Alertas de precio: %s", self.stats())
+        return self.stats()
+
+    def stop(self):
+        """Detiene el watcher. Se puede llamar desde otro thread."""
+        self._stopped = True
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def watch(self, duration=None):
+        tickers = self.lots.tickers
+        if not tickers:
+            logger.info("No hay posiciones abiertas para vigilar.")
+            return
+        logger.info("Vigilando %s lotes abiertos de %s tickers", len(self.lots), len(tickers))
+
+        self._stop_event = asyncio.Event()
+        self._updated = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stopped:
+            self._stop_event.set()
+        if duration is not None:
+            self._loop.call_later(duration, self._stop_event.set)
+        start = self._clock()
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as pool:
+            evaluator = asyncio.ensure_future(self._evaluate_loop(pool))
+            watchers = [asyncio.ensure_future(self._watch_ticker(i, self.intervals[i] * i / len(tickers), pool))
+                        for i in range(len(tickers))]
+            await self._stop_event.wait()
+            # Al detenerse se cancelan también las consultas que esperan al limitador
+            for task in watchers:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+            self._updated.set()
+            await evaluator
+            # Los precios que llegaron durante el último tick
+            if self._pending:
+                await self.tick(pool)
+
+        self._loop = None
+        self.elapsed += self._clock() - start
+
+    async def _watch_ticker(self, i, delay, pool):
+        ticker = self.lots.tickers[i]
+        await asyncio.sleep(delay)
+        due_at = self._clock()
+        while True:
+            price = await self._poll(ticker, pool)
+            if price is not None:
+                self.prices[i] = price
+            self._pending.append(due_at)
+            self._updated.set()
+            # Si una consulta se atrasa, la próxima se corre en lugar de acumularse
+            due_at = max(due_at + self.intervals[i], self._clock())
+            await asyncio.sleep(due_at - self._clock())
+
+    async def _evaluate_loop(self, pool):
+        while not self._stop_event.is_set():
+            await self._updated.wait()
+            self._updated.clear()
+            if self._pending:
+                await self.tick(pool)
+
+    async def tick(self, pool):
+        """Evalúa los umbrales con los precios que llegaron desde el tick anterior y envía las alertas."""
+        due, self._pending = self._pending, []
+        alerts = self.rules.evaluate(self.prices)
+        if alerts:
+            await asyncio.get_running_loop().run_in_executor(pool, self.send, alerts)
+
+        finished = self._clock()
+        self.ticks += 1
+        self.polls += len(due)
+        self.alerts += len(alerts)
+        self.latencies.extend(finished - due_at for due_at in due)
+
+    async def _poll(self, ticker, pool):
+        if self.limiter:
+            await self.limiter.acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, self.fetch_price, ticker)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Fallo al obtener el precio de %s: %s", ticker, e)
+            return None
+
+    def send(self, alerts):
+        for sink in self.sinks:
+            try:
+                sink.send(alerts)
+            except Exception as e:
+                logger.error("Fallo al enviar %s alertas con %s: %s", len(alerts), type(sink).__name__, e)
+
+    def stats(self):
+        """
+        Métricas del watcher: consultas por segundo y latencia de cada consulta, desde el momento en que le
+        tocaba hasta que se evaluaron los umbrales y se enviaron las alertas (incluye la espera del limitador).
+        Los percentiles y el máximo de latencia son los de las últimas LATENCY_WINDOW consultas.
+        """
+        latencies = np.array(self.latencies) if self.latencies else np.array([np.nan])
+        return {
+            'ticks': self.ticks,
+            'polls': self.polls,
+            'errors': self.errors,
+            'alerts': self.alerts,
+            'polls_per_second': round(self.polls / self.elapsed, 2) if self.elapsed else 0.0,
+            'latency_p50': round(float(np.percentile(latencies, 50)), 4),
+            'latency_p95': round(float(np.percentile(latencies, 95)), 4),
+            'latency_max': round(float(np.max(latencies)), 4),
+        }
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class PriceCache:
+    """
+    Cache de precios por (ticker, plazo) con vencimiento por plazo y desalojo LRU.
+
+    Cada plazo ('48hs', 'CI', etc.) tiene su propio TTL en segundos. Cuando se supera 'max_entries'
+    se descarta la entrada usada hace más tiempo. Si se indica 'path', el cache se puede guardar y
+    cargar desde un archivo JSON, para que una ejecución nueva reutilice cotizaciones recientes.
+    Lleva contadores de aciertos y fallos para medir cuántas consultas a la API se evitaron.
+    """
+
+    def __init__(self, ttl_by_term=None, default_ttl=300, max_entries=1024, path=None, clock=time.time):
+        self.ttl_by_term = dict(ttl_by_term or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializa las escrituras del archivo: varias cuentas pueden compartir el cache
+        self._save_lock = threading.Lock()
+
+        if self.path:
+            self.load()
+
+    def ttl_for(self, term):
+        return self.ttl_by_term.get(term, self.default_ttl)
+
+    def get(self, ticker, term):
+        """
+        Busca el precio vigente del ticker para el plazo.
+
+        Returns:
+            tuple: (encontrado, precio). Si no hay entrada o está vencida devuelve (False, None).
+        """
+        key = (ticker, term)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(term, entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, ticker, term, price, fetched_at=None):
+        """Guarda el precio del ticker para el plazo, desalojando la entrada menos usada si hace falta."""
+        key = (ticker, term)
+        with self._lock:
+            self._entries[key] = (price, self.clock() if fetched_at is None else fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
+
+    def load(self):
+        """Carga las entradas no vencidas del archivo de persistencia, si existe."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo leer el cache de precios %s: %s", self.path, e)
+            return
+
+        entries = sorted(stored.get('entries', []), key=lambda entry: entry['fetched_at'])
+        for entry in entries:
+            if not self._is_expired(entry['term'], entry['fetched_at']):
+                self.set(entry['ticker'], entry['term'], entry['price'], fetched_at=entry['fetched_at'])
+        logger.info("Cache de precios cargado: %s entradas vigentes", len(self._entries))
+
+    def save(self):
+        """Guarda las entradas vigentes en el archivo de persistencia, reemplazándolo de forma atómica."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [
+                {'ticker': ticker, 'term': term, 'price': price, 'fetched_at': fetched_at}
+                for (ticker, term), (price, fetched_at) in self._entries.items()
+                if not self._is_expired(term, fetched_at)
+            ]
+        tmp_path = f"{self.path}.tmp"
+        with self._save_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'entries': entries}, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("No se pudo guardar el cache de precios %s: %s", self.path, e)
+
+    def _is_expired(self, term, fetched_at):
+        return self.clock() - fetched_at > self.ttl_for(term)
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from log_config import get_logger
+from instrumentation import timed
+
+logger = get_logger(__name__)
+
+DEFAULT_TERM = "48hs"
+
+
+class PriceService:
+    """
+    Servicio de precios de tickers sobre la API de Cocos Capital.
+
+    Para un lote de tickers consulta cada ticker una sola vez y hace las consultas en paralelo con un
+    pool de threads acotado, de modo que el tiempo total sea el de la consulta más lenta y no la suma.
+    Si recibe un PriceCache, responde desde el cache mientras el precio siga vigente.
+    """
+
+    def __init__(self, cocos, max_workers=8, cache=None):
+        self.cocos = cocos
+        self.max_workers = max_workers
+        self.cache = cache
+
+    def get_price(self, ticker, term=DEFAULT_TERM):
+        """Devuelve el último precio del ticker para el plazo indicado, o None si no se encuentra."""
+        if self.cache:
+            found, price = self.cache.get(ticker, term)
+            if found:
+                return price
+
+        prices_by_term = self._get_prices_by_term(ticker)
+
+        # Una consulta trae todos los plazos del ticker: se guardan todos en el cache
+        if self.cache:
+            for price_term, price in prices_by_term.items():
+                self.cache.set(ticker, price_term, price)
+
+        return prices_by_term.get(term)
+
+    def _get_prices_by_term(self, ticker):
+        price_data = self.cocos.get_ticket_price(ticker)
+        if not price_data:
+            return {}
+        prices_by_term = {}
+        for subtipo in price_data:
+            if subtipo['short_ticker'] == ticker and subtipo['last'] is not None:
+                prices_by_term.setdefault(subtipo['term'], subtipo['last'])
+        return prices_by_term
+
+    @timed('price_fetch')
+    def get_prices(self, tickers, term=DEFAULT_TERM):
+        """
+        Obtiene los precios de varios tickers en paralelo.
+
+        Args:
+            tickers (iterable): Tickers a consultar. Puede tener repetidos y valores vacíos.
+            term (str): Plazo de liquidación del precio ('48hs', 'CI', etc.).
+
+        Returns:
+            dict: Precio por ticker. Los tickers que fallan quedan con None.
+        """
+        unique_tickers = list(dict.fromkeys(ticker for ticker in tickers if pd.notna(ticker)))
+        if not unique_tickers:
+            return {}
+
+        workers = min(self.max_workers, len(unique_tickers))
+        logger.info("Obteniendo precios de %s tickers con %s workers", len(unique_tickers), workers)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prices = dict(zip(unique_tickers, pool.map(lambda ticker: self._get_price_or_none(ticker, term),
+                                                       unique_tickers)))
+
+        if self.cache:
+            logger.info("Cache de precios: %s", self.cache.stats())
+            self.cache.save()
+
+        return prices
+
+    def _get_price_or_none(self, ticker, term):
+        try:
+            return self.get_price(ticker, term)
+        except Exception as e:
+            logger.error("Fallo al obtener el precio de %s: %s", ticker, e)
+            return None
@@ -0,0 +1,73 @@
+import threading
+import time
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Limitador de tasa de tipo token bucket, seguro entre threads.
+
+    Se recarga a razón de 'rate_per_minute' tokens por minuto hasta 'capacity'. Cada llamada a acquire()
+    consume un token y, si no hay, espera lo justo hasta que se recargue. Con la capacidad igual a la tasa
+    se permite una ráfaga de un minuto de cuota, como la cuota por usuario de la API de Google Sheets.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Consume un token, esperando si hace falta. Devuelve los segundos esperados."""
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                logger.info("Límite de escrituras alcanzado: esperando %.1f segundos", wait)
+                self._sleep(wait)
+                self._refill()
+            self.tokens -= 1
+            return wait
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    TokenBucket para corrutinas de asyncio: acquire() es una corrutina que espera con asyncio.sleep, así la
+    espera no bloquea el loop. Lo comparten todas las tareas de un mismo loop.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=None):
+        super().__init__(rate_per_minute, capacity, clock, sleep)
+        self._async_lock = None
+
+    async def acquire(self):
+        """Consume un token, esperando si hace falta. Devuelve los segundos esperados."""
+        # asyncio se importa recién acá: este módulo se carga en el arranque del total diario
+        import asyncio
+
+        self._sleep = self._sleep or asyncio.sleep
+        # El lock se crea dentro del loop: en Python 3.9 queda atado al loop en el que se crea
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            self._refill()
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                logger.debug("Límite de consultas alcanzado: esperando %.2f segundos", wait)
+                await self._sleep(wait)
+                self._refill()
+            self.tokens -= 1
+            return wait
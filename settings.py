@@ -0,0 +1,113 @@
+"""
+Parámetros opcionales de config.py.
+
+Los valores obligatorios (usuario, planilla, prefijos, etc.) se siguen importando directo desde config.
+Acá se leen los parámetros que se pueden omitir, con su valor por defecto.
+"""
+import config
+
+# Cantidad máxima de consultas de precio simultáneas contra la API de Cocos.
+PRICE_FETCH_WORKERS = getattr(config, 'PRICE_FETCH_WORKERS', 8)
+
+# Vigencia en segundos de los precios cacheados, por plazo de liquidación.
+PRICE_CACHE_TTL = getattr(config, 'PRICE_CACHE_TTL', {'48hs': 300, 'CI': 300})
+
+# Cantidad máxima de precios en el cache antes de descartar los menos usados.
+PRICE_CACHE_MAX_ENTRIES = getattr(config, 'PRICE_CACHE_MAX_ENTRIES', 1024)
+
+# Archivo JSON donde persistir el cache entre ejecuciones. None para no persistir.
+PRICE_CACHE_FILE = getattr(config, 'PRICE_CACHE_FILE', None)
+
+# URL de la API de Cocos. Se puede apuntar a un servidor local de prueba (ver benchmarks/fake_cocos_server.py).
+COCOS_BASE_URL = getattr(config, 'COCOS_BASE_URL', 'https://api.cocos.capital')
+
+# Timeout (conexión, lectura) en segundos para las llamadas HTTP a la API de Cocos.
+HTTP_TIMEOUT = getattr(config, 'HTTP_TIMEOUT', (5, 30))
+
+# Reintentos ante errores de conexión y respuestas 429/5xx, con backoff exponencial.
+HTTP_RETRIES = getattr(config, 'HTTP_RETRIES', 3)
+HTTP_BACKOFF_FACTOR = getattr(config, 'HTTP_BACKOFF_FACTOR', 0.5)
+
+# Los movimientos se piden en ventanas de N meses, con hasta N ventanas en paralelo y reintentos por ventana.
+TRANSFER_WINDOW_MONTHS = getattr(config, 'TRANSFER_WINDOW_MONTHS', 1)
+TRANSFER_FETCH_WORKERS = getattr(config, 'TRANSFER_FETCH_WORKERS', 4)
+TRANSFER_WINDOW_RETRIES = getattr(config, 'TRANSFER_WINDOW_RETRIES', 2)
+
+# Tamaño del pool de conexiones HTTP. Debe alcanzar para las consultas simultáneas de precios y movimientos.
+HTTP_POOL_SIZE = getattr(config, 'HTTP_POOL_SIZE', max(10, PRICE_FETCH_WORKERS, TRANSFER_FETCH_WORKERS))
+
+# Archivo cifrado donde se guarda la sesión de Cocos para evitar el login con 2FA en cada ejecución.
+TOKEN_STORE_FILE = getattr(config, 'TOKEN_STORE_FILE', '.cocos_session')
+
+# Clave Fernet para cifrar la sesión (generarla con Fernet.generate_key()). Sin clave no se guarda la sesión.
+TOKEN_STORE_KEY = getattr(config, 'TOKEN_STORE_KEY', None)
+
+# Segundos máximos de espera del correo con el código 2FA, y cada cuánto se revisa la casilla.
+TWO_FACTOR_TIMEOUT = getattr(config, 'TWO_FACTOR_TIMEOUT', 120)
+TWO_FACTOR_POLL_INTERVAL = getattr(config, 'TWO_FACTOR_POLL_INTERVAL', 2)
+
+# Archivo JSON con el estado de la sincronización incremental (última fecha procesada y lotes abiertos).
+SYNC_STATE_FILE = getattr(config, 'SYNC_STATE_FILE', 'sync_state.json')
+
+# Base SQLite con la copia local de las transferencias de la API. None para no guardarlas.
+TRANSFER_STORE_FILE = getattr(config, 'TRANSFER_STORE_FILE', 'transfers.sqlite')
+
+# Base SQLite con la foto diaria del portfolio de cada cuenta (totales y posiciones). None para no guardarla.
+PORTFOLIO_STORE_FILE = getattr(config, 'PORTFOLIO_STORE_FILE', 'portfolio.sqlite')
+
+# Archivo JSON con los agregados por mes de la solapa de rendimiento mensual. None para no generarla.
+MONTHLY_PERFORMANCE_FILE = getattr(config, 'MONTHLY_PERFORMANCE_FILE', 'monthly_performance.json')
+
+# Solapa del rendimiento mensual (con varias cuentas, se le agrega ' - <name>').
+MONTHLY_PERFORMANCE_TAB = getattr(config, 'MONTHLY_PERFORMANCE_TAB', 'Rendimiento mensual')
+
+# Archivo JSON con el índice de las operaciones ya insertadas en la planilla.
+DEDUP_INDEX_FILE = getattr(config, 'DEDUP_INDEX_FILE', 'dedup_index.json')
+
+# Cómo se escriben las operaciones: 'append' sólo agrega filas nuevas; 'upsert' (opcional, ver la migración en el
+# README) actualiza la fila de cada posición.
+SHEET_WRITE_MODE = getattr(config, 'SHEET_WRITE_MODE', 'append')
+
+# Archivo JSON con la fila de la planilla de cada posición, usado en el modo 'upsert'.
+POSITION_INDEX_FILE = getattr(config, 'POSITION_INDEX_FILE', 'position_index.json')
+
+# Registro local de las escrituras pendientes en la planilla, que se reintentan en la próxima ejecución.
+SHEET_JOURNAL_FILE = getattr(config, 'SHEET_JOURNAL_FILE', 'sheet_journal.jsonl')
+
+# Cuota de escrituras por minuto de la API de Google Sheets (por usuario).
+SHEETS_WRITES_PER_MINUTE = getattr(config, 'SHEETS_WRITES_PER_MINUTE', 60)
+
+# Archivo donde exportar las métricas de cada ejecución en formato Prometheus (textfile collector).
+# None para no exportarlas.
+METRICS_PROMETHEUS_FILE = getattr(config, 'METRICS_PROMETHEUS_FILE', None)
+
+# Directorio donde guardar como Parquet los DataFrames intermedios del match y la transformación, para depurar.
+# None para no guardarlos.
+LOG_FRAMES_DIR = getattr(config, 'LOG_FRAMES_DIR', None)
+
+# Umbrales de las alertas de precio: % de ganancia y de pérdida de cada lote abierto respecto de su monto de compra.
+PRICE_ALERT_GAIN_PCT = getattr(config, 'PRICE_ALERT_GAIN_PCT', 10)
+PRICE_ALERT_LOSS_PCT = getattr(config, 'PRICE_ALERT_LOSS_PCT', 10)
+
+# Umbrales por ticker que reemplazan a los anteriores, por ejemplo {'GGAL': (5, 3)} (ganancia %, pérdida %).
+PRICE_ALERT_THRESHOLDS = getattr(config, 'PRICE_ALERT_THRESHOLDS', {})
+
+# Segundos entre consultas de precio de cada ticker en las alertas, y los intervalos por ticker que lo reemplazan.
+PRICE_ALERT_INTERVAL = getattr(config, 'PRICE_ALERT_INTERVAL', 60)
+PRICE_ALERT_INTERVALS = getattr(config, 'PRICE_ALERT_INTERVALS', {})
+
+# Consultas de precio por minuto a la API de Cocos entre todos los tickers de las alertas.
+PRICE_ALERT_REQUESTS_PER_MINUTE = getattr(config, 'PRICE_ALERT_REQUESTS_PER_MINUTE', 120)
+
+# Destinos de las alertas además del log: un webhook (recibe un POST con las alertas en JSON) y un bot de Telegram.
+# None para no usarlos.
+PRICE_ALERT_WEBHOOK_URL = getattr(config, 'PRICE_ALERT_WEBHOOK_URL', None)
+TELEGRAM_BOT_TOKEN = getattr(config, 'TELEGRAM_BOT_TOKEN', None)
+TELEGRAM_CHAT_ID = getattr(config, 'TELEGRAM_CHAT_ID', None)
+
+# Cuentas de Cocos a sincronizar en una misma ejecución. Lista de diccionarios con 'name', 'user' y 'password',
+# y opcionalmente 'sheet_file', 'sheet_tab' y 'total_tab'. Vacía: una sola cuenta con USER y PASS de config.py.
+ACCOUNTS = getattr(config, 'ACCOUNTS', [])
+
+# Cantidad máxima de cuentas que se sincronizan en paralelo.
+ACCOUNT_WORKERS = getattr(config, 'ACCOUNT_WORKERS', 4)
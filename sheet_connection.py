@@ -0,0 +1,82 @@
+import threading
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+GOOGLE_SCOPES = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+# Tamaño de las solapas que se crean cuando no existen
+NEW_TAB_ROWS = 1000
+NEW_TAB_COLS = 26
+
+
+class SheetsClient:
+    """
+    Cliente de Google Sheets compartido entre cuentas y threads.
+
+    Autentica una sola vez y abre cada documento y cada solapa una sola vez. Las solapas que no existen se
+    crean, así cada cuenta puede escribir en la suya. gspread y oauth2client se importan recién al conectarse.
+    """
+
+    def __init__(self, json_google_file):
+        self.json_google_file = json_google_file
+        self._client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    def worksheet(self, doc_name, tab_name=None):
+        """Devuelve la solapa del documento (la primera si no se indica), creándola si no existe."""
+        import gspread
+
+        with self._lock:
+            key = (doc_name, tab_name)
+            if key not in self._worksheets:
+                spreadsheet = self._spreadsheet(doc_name)
+                if not tab_name:
+                    self._worksheets[key] = spreadsheet.sheet1
+                else:
+                    try:
+                        self._worksheets[key] = spreadsheet.worksheet(tab_name)
+                    except gspread.WorksheetNotFound:
+                        logger.info("Creando la solapa '%s' en '%s'", tab_name, doc_name)
+                        self._worksheets[key] = spreadsheet.add_worksheet(tab_name, NEW_TAB_ROWS, NEW_TAB_COLS)
+            return self._worksheets[key]
+
+    def connector(self, doc_name, tab_name=None):
+        return WorksheetConnector(doc_name, tab_name=tab_name, client=self)
+
+    def _spreadsheet(self, doc_name):
+        if self._client is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(self.json_google_file, GOOGLE_SCOPES)
+            self._client = gspread.authorize(credentials)
+        if doc_name not in self._spreadsheets:
+            self._spreadsheets[doc_name] = self._client.open(doc_name)
+        return self._spreadsheets[doc_name]
+
+
+class WorksheetConnector:
+    """
+    Conexión a una solapa de la planilla, sin pandas ni gspreadmanager.
+
+    Tiene la interfaz de GoogleSheetConector que usa el proyecto: el atributo 'sheet' (lo único que usa
+    BatchSheetWriter) y read_sheet_data(). Varias conexiones pueden compartir un SheetsClient.
+    """
+
+    def __init__(self, doc_name, json_google_file=None, tab_name=None, client=None):
+        self.doc_name = doc_name
+        self.client = client or SheetsClient(json_google_file)
+        self.sheet = self.client.worksheet(doc_name, tab_name)
+        logger.debug("Conectado a '%s' (%s)", doc_name, self.sheet.title)
+
+    def read_sheet_data(self, tab_name=None, skiprows=0, output_format='list'):
+        """Lee todas las filas de la solapa ('tab_name' o la conectada) como lista de listas, o DataFrame."""
+        sheet = self.client.worksheet(self.doc_name, tab_name) if tab_name else self.sheet
+        values = sheet.get_all_values()[skiprows:]
+        if output_format == 'list':
+            return values
+        import pandas as pd
+        return pd.DataFrame(values[1:], columns=values[0] if values else None)
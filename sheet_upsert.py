@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from helpers import column_letter
+from log_config import get_logger
+from instrumentation import timed
+from transform_data import build_position_key, dataframe_to_rows, position_identity, position_lot
+from sheet_writer import plain_rows
+
+logger = get_logger(__name__)
+
+ESTADO_CERRADA = 'Cerrada'
+ESTADO_ABIERTA = 'Abierta'
+
+# Versión del formato de las claves del índice: si cambia, el índice guardado se reconstruye desde la planilla
+POSITION_KEY_VERSION = 3
+
+
+def row_hash(row):
+    """Hash corto del contenido de una fila, para saber si hace falta reescribirla."""
+    return hashlib.blake2b(json.dumps(row, default=str).encode(), digest_size=8).hexdigest()
+
+
+class PositionRowIndex:
+    """
+    Índice local que ubica cada posición (ver build_position_key) en su fila de la planilla.
+
+    Para cada clave guarda el número de fila, el hash del contenido escrito y el estado. También guarda
+    la última fila usada y las filas que quedaron vacías al descartar una posición, para reutilizarlas
+    antes de agregar filas nuevas. La planilla completa sólo se lee para reconstruirlo, cuando el archivo no existe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        self.free_rows = []
+        self.stale_rows = []
+        self.has_header = False
+        self.last_row = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self):
+        """Carga el índice guardado. Devuelve False si no existe o no se puede leer."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo leer el índice de posiciones %s: %s", self.path, e)
+            return False
+        if stored.get('key_version') != POSITION_KEY_VERSION:
+            logger.info("El índice de posiciones %s usa otro formato de claves: se reconstruye", self.path)
+            return False
+
+        self.rows = stored['rows']
+        self.free_rows = stored.get('free_rows', [])
+        self.stale_rows = stored.get('stale_rows', [])
+        self.has_header = stored.get('has_header', True)
+        self.last_row = stored.get('last_row', 0)
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key_version': POSITION_KEY_VERSION, 'has_header': self.has_header,
+                       'last_row': self.last_row, 'rows': self.rows, 'free_rows': sorted(self.free_rows),
+                       'stale_rows': sorted(self.stale_rows)}, f)
+        os.replace(tmp_path, self.path)
+
+    def rebuild(self, sheet_rows):
+        """
+        Reconstruye el índice a partir de las filas de la planilla (lista de listas con encabezados).
+
+        Las filas vacías quedan libres. Si una posición aparece más de una vez (planillas escritas sólo
+        con append, donde la fila 'Abierta' quedaba junto a la 'Cerrada'), se conserva la fila cerrada
+        o la última, y las demás se marcan para vaciarlas en la próxima escritura.
+        """
+        self.rows = {}
+        self.free_rows = []
+        self.stale_rows = []
+        self.has_header = bool(sheet_rows)
+        self.last_row = len(sheet_rows)
+        if len(sheet_rows) <= 1:
+            logger.info("Índice de posiciones reconstruido sin filas")
+            return
+
+        header = sheet_rows[0]
+        df = pd.DataFrame([row + [''] * (len(header) - len(row)) for row in sheet_rows[1:]], columns=header)
+        df['fila'] = range(2, len(df) + 2)
+
+        vacias = (df[header] == '').all(axis=1)
+        self.free_rows = df.loc[vacias, 'fila'].tolist()
+        df = df[~vacias]
+
+        # Sin el número de orden, las filas con la misma clave son la misma posición escrita más de una vez
+        df['posicion'] = [position_identity(clave) for clave in build_position_key(df)]
+        df['cerrada'] = df['Estado'] == ESTADO_CERRADA
+        df = df.sort_values(['posicion', 'cerrada', 'fila'], kind='stable')
+        duplicadas = df['posicion'].duplicated(keep='last')
+        self.stale_rows = df.loc[duplicadas, 'fila'].tolist()
+        df = df[~duplicadas]
+        df['clave'] = build_position_key(df).to_numpy()
+
+        for clave, fila, estado in df[['clave', 'fila', 'Estado']].itertuples(index=False):
+            # El hash de la planilla no coincide con el de los valores sin formatear: se reescribe una vez
+            self.rows[clave] = {'row': int(fila), 'hash': None, 'estado': estado}
+
+        logger.info("Índice de posiciones reconstruido: %s posiciones | %s filas libres | %s duplicadas",
+                    len(self.rows), len(self.free_rows), len(self.stale_rows))
+
+
+class SheetUpsertWriter:
+    """
+    Escribe las posiciones en la planilla actualizando su fila en lugar de agregar una nueva.
+
+    Cada posición se identifica con build_position_key. Una posición abierta cuyo 'Precio Hoy' cambia se
+    reescribe en su misma fila, y al cerrarse entera toma la fila de la abierta de la misma compra.
+    Las posiciones nuevas ocupan las filas libres o las siguientes a la última conocida. Todo se encola
+    como escrituras de rangos fijos en el BatchSheetWriter, así reenviarlas tras una falla es seguro.
+    """
+
+    def __init__(self, sheet_connector, tab_name, index, sheet_writer):
+        self.sheet_connector = sheet_connector
+        self.tab_name = tab_name
+        self.index = index
+        self.sheet_writer = sheet_writer
+
+    @timed('upsert')
+    def upsert(self, df):
+        """
+        Encola las filas del DataFrame (con las columnas del template) para escribirlas en la planilla.
+
+        Returns:
+            dict: cantidad de filas 'actualizadas', 'agregadas', 'sin_cambios' y 'vaciadas'.
+        """
+        if not self.index.load():
+            self.rebuild_index()
+
+        resumen = {'actualizadas': 0, 'agregadas': 0, 'sin_cambios': 0, 'vaciadas': 0}
+        if df.empty:
+            logger.info("No hay posiciones para escribir.")
+            return resumen
+
+        columnas = df.columns.tolist()
+        claves = build_position_key(df).tolist()
+        filas = plain_rows(dataframe_to_rows(df, include_header=False))
+        updates = {}
+
+        if not self.index.has_header:
+            updates[1] = columnas
+            self.index.has_header = True
+            self.index.last_row = max(self.index.last_row, 1)
+
+        self._move_closed_positions(claves, df['Estado'].tolist())
+
+        # Vaciar las filas duplicadas y las de posiciones reemplazadas: quedan libres para reutilizarlas
+        fila_vacia = [''] * len(columnas)
+        vaciar = list(self.index.stale_rows) + self._rows_to_prune(claves)
+        for fila in vaciar:
+            updates[fila] = fila_vacia
+        self.index.free_rows = sorted(set(self.index.free_rows) | set(vaciar))
+        self.index.stale_rows = []
+        resumen['vaciadas'] = len(vaciar)
+
+        for clave, fila, estado in zip(claves, filas, df['Estado'].tolist()):
+            contenido = row_hash(fila)
+            indexada = self.index.rows.get(clave)
+            if indexada is not None and indexada['hash'] == contenido:
+                resumen['sin_cambios'] += 1
+                continue
+
+            if indexada is not None:
+                numero = indexada['row']
+                resumen['actualizadas'] += 1
+            else:
+                # Las posiciones nuevas ocupan primero las filas libres; si no hay, van después de la última
+                numero = self._next_free_row()
+                resumen['agregadas'] += 1
+            updates[numero] = fila
+            self.index.rows[clave] = {'row': numero, 'hash': contenido, 'estado': estado}
+
+        ultima_columna = column_letter(len(columnas))
+        for numero, valores in sorted(updates.items()):
+            self.sheet_writer.update(f"'{self.tab_name}'!A{numero}:{ultima_columna}{numero}", [valores])
+
+        self.index.save()
+        logger.info("Upsert en '%s': %s", self.tab_name, resumen)
+        return resumen
+
+    def rebuild_index(self):
+        """Reconstruye el índice de posiciones leyendo la planilla completa."""
+        sheet_rows = self.sheet_connector.read_sheet_data(tab_name=self.tab_name, output_format='list')
+        self.index.rebuild(sheet_rows)
+        self.index.save()
+
+    def _next_free_row(self):
+        if self.index.free_rows:
+            return self.index.free_rows.pop(0)
+        self.index.last_row += 1
+        return self.index.last_row
+
+    def _move_closed_positions(self, claves, estados):
+        """
+        Pasa al índice de cada posición cerrada nueva la fila de una abierta de la misma compra (o del mismo
+        lote y cantidad, sin ids) que ya no está entre las posiciones actuales: es la misma posición, que al
+        cerrarse cambió de clave.
+        """
+        claves_actuales = set(claves)
+        abiertas = {}
+        for clave, indexada in self.index.rows.items():
+            if indexada['estado'] == ESTADO_ABIERTA and clave not in claves_actuales:
+                abiertas.setdefault(self._closing_group(clave), []).append(clave)
+
+        for clave, estado in zip(claves, estados):
+            if estado != ESTADO_CERRADA or clave in self.index.rows:
+                continue
+            candidatas = abiertas.get(self._closing_group(clave))
+            if candidatas:
+                self.index.rows[clave] = self.index.rows.pop(candidatas.pop(0))
+
+    @staticmethod
+    def _closing_group(clave):
+        """Lo que comparten una abierta y la cerrada en que se convierte: su compra, o su lote y cantidad."""
+        return position_lot(clave) if clave.startswith('#') else clave.rsplit('_', 2)[0]
+
+    def _rows_to_prune(self, claves):
+        """
+        Devuelve las filas 'Abierta' del índice reemplazadas por otras claves del mismo lote.
+
+        Sin ids, cuando una venta cierra sólo parte de una compra, la posición abierta de 10 pasa a ser una
+        cerrada de 4 y una abierta de 6: la fila de 10 ya no corresponde y se vacía. Con ids, la abierta
+        conserva su clave y se actualiza en su fila.
+        """
+        claves_actuales = set(claves)
+        lotes_actuales = set(position_lot(clave) for clave in claves)
+
+        vaciar = []
+        for clave, indexada in list(self.index.rows.items()):
+            if (indexada['estado'] == ESTADO_ABIERTA and clave not in claves_actuales
+                    and position_lot(clave) in lotes_actuales):
+                vaciar.append(indexada['row'])
+                del self.index.rows[clave]
+        return vaciar
@@ -0,0 +1,227 @@
+import json
+import os
+from log_config import get_logger
+from instrumentation import timed
+
+logger = get_logger(__name__)
+
+VALUE_INPUT_OPTION = 'USER_ENTERED'
+
+
+def json_default(value):
+    """Convierte los escalares de numpy/pandas a tipos de Python; el resto, a texto."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def plain_rows(rows):
+    """Devuelve las filas con valores serializables, tal como se guardan en el registro y se envían a la API."""
+    return json.loads(json.dumps(rows, default=json_default))
+
+
+class WriteJournal:
+    """
+    Registro local, de sólo agregado, de las escrituras pendientes en la planilla.
+
+    Cada escritura se guarda como una línea JSON con un id antes de enviarse, y al confirmarse se agrega
+    una línea {"done": [ids]}. Antes de cada agregado se guarda también {"appending": [ids], "rows_before": n},
+    las filas que tenía la pestaña, para saber al reintentarlo si ya había llegado. Las escrituras sin
+    confirmar se vuelven a enviar en la próxima ejecución. Cuando no queda nada pendiente el archivo se vacía.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def pending(self):
+        """Devuelve las escrituras registradas que todavía no se confirmaron, en orden."""
+        entries, done = self._read()
+        return [entry for entry_id, entry in sorted(entries.items()) if entry_id not in done]
+
+    def record(self, writes):
+        """Registra las escrituras y les asigna un id. Devuelve las escrituras con su id."""
+        if not writes:
+            return []
+        next_id = max(self._read()[0], default=0) + 1
+        writes = [dict(write, id=next_id + i) for i, write in enumerate(writes)]
+        self._append_lines(writes)
+        return writes
+
+    def mark_done(self, ids):
+        self._append_lines([{'done': list(ids)}])
+
+    def mark_appending(self, ids, rows_before):
+        self._append_lines([{'appending': list(ids), 'rows_before': rows_before}])
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _read(self):
+        entries = {}
+        done = set()
+        if not self.path or not os.path.exists(self.path):
+            return entries, done
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Una línea cortada por una caída a mitad de escritura: se descarta
+                    logger.warning("Línea inválida en el registro de escrituras %s", self.path)
+                    continue
+                if 'done' in record:
+                    done.update(record['done'])
+                elif 'appending' in record:
+                    for entry_id in record['appending']:
+                        if entry_id in entries:
+                            entries[entry_id]['rows_before'] = record['rows_before']
+                else:
+                    entries[record['id']] = record
+        return entries, done
+
+    def _append_lines(self, records):
+        if not self.path:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, default=json_default) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BatchSheetWriter:
+    """
+    Junta las escrituras de una ejecución en la planilla y las envía todas juntas con flush().
+
+    Las actualizaciones de rangos (de cualquier pestaña) se envían en un único values:batchUpdate. Los
+    agregados al final de una pestaña se envían con un values:append por pestaña, porque sólo la API
+    conoce la última fila ocupada. Antes de enviar, todo se registra en el WriteJournal: si la API falla,
+    las escrituras quedan pendientes y se reintentan en el próximo flush(). Un agregado que llegó a la
+    planilla pero no se llegó a confirmar (por ejemplo, por una caída justo después) no se repite: se compara
+    la cantidad de filas de la pestaña con la registrada antes de enviarlo, asumiendo que nadie más agrega
+    filas en esa pestaña. Cada request de escritura espera un token del limitador, ajustado a la cuota de
+    escrituras de Google Sheets.
+    """
+
+    def __init__(self, sheet_connector, journal, limiter=None):
+        self.sheet_connector = sheet_connector
+        self.journal = journal
+        self.limiter = limiter
+        self.queue = []
+
+    def __len__(self):
+        return len(self.queue)
+
+    def update(self, range_name, rows):
+        """Encola la escritura de 'rows' (lista de listas) en el rango A1 indicado, con la pestaña incluida."""
+        self.queue.append({'kind': 'update', 'range': range_name, 'rows': plain_rows(rows)})
+
+    def append(self, tab_name, rows):
+        """Encola el agregado de 'rows' (lista de listas) al final de la pestaña."""
+        if rows:
+            self.queue.append({'kind': 'append', 'range': f"'{tab_name}'!A1", 'rows': plain_rows(rows)})
+
+    @timed('sheet_write')
+    def flush(self):
+        """
+        Envía las escrituras encoladas junto con las pendientes de ejecuciones anteriores.
+
+        Returns:
+            bool: True si no quedó nada pendiente.
+        """
+        pending = self.journal.pending()
+        if pending:
+            logger.info("Reintentando %s escrituras pendientes de ejecuciones anteriores", len(pending))
+        pending += self.journal.record(self.queue)
+        self.queue = []
+        if not pending:
+            return True
+
+        try:
+            self._send(pending)
+        except Exception:
+            logger.error("Error al escribir en Google Sheets: las escrituras quedan pendientes en %s",
+                         self.journal.path, exc_info=True)
+            return False
+
+        self.journal.clear()
+        return True
+
+    def _send(self, writes):
+        spreadsheet = self.sheet_connector.sheet.spreadsheet
+
+        updates = [write for write in writes if write['kind'] == 'update']
+        if updates:
+            self._acquire()
+            spreadsheet.values_batch_update({
+                'valueInputOption': VALUE_INPUT_OPTION,
+                'data': [{'range': write['range'], 'values': write['rows']} for write in updates],
+            })
+            self.journal.mark_done(write['id'] for write in updates)
+            logger.info("Actualizados %s rangos con un solo batchUpdate", len(updates))
+
+        # Agrupar los agregados por pestaña, respetando el orden en que se encolaron
+        appends = {}
+        for write in writes:
+            if write['kind'] == 'append':
+                appends.setdefault(write['range'], []).append(write)
+        for range_name, tab_writes in appends.items():
+            rows_before = self._row_count(spreadsheet, range_name)
+            tab_writes = self._skip_landed_appends(tab_writes, rows_before, range_name)
+            if not tab_writes:
+                continue
+            self.journal.mark_appending((write['id'] for write in tab_writes), rows_before)
+            self._acquire()
+            spreadsheet.values_append(range_name, {'valueInputOption': VALUE_INPUT_OPTION},
+                                      {'values': [row for write in tab_writes for row in write['rows']]})
+            self.journal.mark_done(write['id'] for write in tab_writes)
+            logger.info("Agregadas %s filas en %s", sum(len(write['rows']) for write in tab_writes), range_name)
+
+    @staticmethod
+    def _row_count(spreadsheet, range_name):
+        """Filas ocupadas de la pestaña según su columna A, donde values:append busca el final de la tabla."""
+        tab = range_name.rsplit('!', 1)[0]
+        return len(spreadsheet.values_get(f"{tab}!A:A").get('values', []))
+
+    def _skip_landed_appends(self, writes, rows_before, range_name):
+        """
+        Confirma sin reenviar los agregados de una ejecución anterior que ya están en la planilla: los que
+        se enviaron juntos cuando la pestaña tenía 'rows_before' filas y ahora tiene al menos esas más las suyas.
+        Devuelve los que hay que enviar.
+        """
+        sent = {}
+        for write in writes:
+            if 'rows_before' in write:
+                sent.setdefault(write['rows_before'], []).append(write)
+
+        landed = set()
+        for previous_rows, group in sent.items():
+            if rows_before >= previous_rows + sum(len(write['rows']) for write in group):
+                landed.update(write['id'] for write in group)
+        if landed:
+            self.journal.mark_done(sorted(landed))
+            logger.info("%s agregados pendientes en %s ya estaban en la planilla: no se reenvían",
+                        len(landed), range_name)
+        return [write for write in writes if write['id'] not in landed]
+
+    def _acquire(self):
+        if self.limiter:
+            self.limiter.acquire()
+
+
+class DryRunSheetWriter(BatchSheetWriter):
+    """
+    BatchSheetWriter para simulaciones: flush() no envía nada a Google Sheets ni usa el registro local,
+    sólo acumula en 'writes' las escrituras que se hubieran enviado, para exportarlas y revisarlas.
+    """
+
+    def __init__(self):
+        super().__init__(None, WriteJournal(None))
+        self.writes = []
+
+    def flush(self):
+        self.writes += self.queue
+        logger.info("Simulación: %s escrituras sin enviar a Google Sheets", len(self.queue))
+        self.queue = []
+        return True
@@ -0,0 +1,72 @@
+import json
+import os
+import pandas as pd
+from log_config import get_logger
+from transfer_schema import apply_transfer_schema
+
+logger = get_logger(__name__)
+
+
+class SyncState:
+    """
+    Estado de la sincronización incremental, guardado en un archivo JSON local.
+
+    Guarda la marca de agua (fecha de la última transferencia procesada y los ids procesados de ese día)
+    y los lotes que quedaron abiertos: las compras sin cerrar y las ventas sin match. Con eso, la próxima
+    ejecución sólo pide a la API las transferencias desde esa fecha y las empareja contra los lotes
+    abiertos, sin volver a procesar toda la historia.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_date = None
+        self.seen_ids = set()
+        self.open_buys = pd.DataFrame()
+        self.open_sells = pd.DataFrame()
+
+    def load(self):
+        """Carga el estado guardado. Devuelve False si no hay estado o no se puede leer."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo leer el estado de sincronización %s: %s", self.path, e)
+            return False
+
+        self.last_date = stored['last_date']
+        self.seen_ids = set(stored['seen_ids'])
+        # En el JSON las fechas quedan como texto: se vuelven a tipar como las transferencias de la API
+        self.open_buys = apply_transfer_schema(pd.DataFrame(stored['open_buys']))
+        self.open_sells = apply_transfer_schema(pd.DataFrame(stored['open_sells']))
+        logger.info("Estado de sincronización: última fecha %s | %s compras abiertas | %s ventas sin match",
+                    self.last_date, len(self.open_buys), len(self.open_sells))
+        return True
+
+    def update(self, last_date, seen_ids, open_buys, open_sells):
+        """
+        Actualiza la marca de agua y los lotes abiertos.
+
+        Si la fecha no avanzó, los ids del día se suman a los ya procesados en lugar de reemplazarlos.
+        """
+        if last_date == self.last_date:
+            self.seen_ids |= set(seen_ids)
+        elif last_date is not None:
+            self.last_date = last_date
+            self.seen_ids = set(seen_ids)
+        self.open_buys = open_buys
+        self.open_sells = open_sells
+
+    def save(self):
+        """Guarda el estado reemplazando el archivo de forma atómica."""
+        stored = {
+            'last_date': self.last_date,
+            'seen_ids': sorted(self.seen_ids),
+            'open_buys': self.open_buys.to_dict('records'),
+            'open_sells': self.open_sells.to_dict('records'),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, default=str)
+        os.replace(tmp_path, self.path)
@@ -9,10 +9,22 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Mock config module before any imports
 class MockConfig:
+    USER = 'user@example.com'
+    PASS = 'password'
+    ACCOUNT_ID = '11111'
+    JSONGOOGLEFILE = 'credenciales-google.json'
+    GOOGLE_SHEET_FILE = 'Trading Ars'
+    SHEET_TAB = 'Operaciones'
     GMAIL_USER = 'test@example.com'
     GMAIL_APP_PASS = 'test_password'
-    prefix_buy = 'BUY_'
-    prefix_sell = 'SELL_'
-    config = {}
+    prefix_buy = 'buy_'
+    prefix_sell = 'sell_'
+    config = {
+        'monto': 'amount',
+        'ticker': 'ticker',
+        'fecha': 'date',
+        'cantidad': 'quantity',
+        'precio': 'price'
+    }
 
 sys.modules['config'] = MockConfig()
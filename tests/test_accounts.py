@@ -0,0 +1,85 @@
+"""Tests for accounts module."""
+
+import threading
+import time
+import pytest
+from accounts import AccountProfile, load_accounts, run_accounts
+
+ENTRIES = [
+    {'name': 'pablo', 'user': 'pablo@example.com', 'password': 'x'},
+    {'name': 'sofia', 'user': 'sofia@example.com', 'password': 'y', 'sheet_file': 'Trading Sofia',
+     'sheet_tab': 'Operaciones'},
+]
+
+
+class TestAccountProfile:
+    """Test the per-account tabs and state files."""
+
+    def test_named_account_gets_own_tabs_and_files(self):
+        """Test that a named account writes to its own tabs and state files."""
+        account = load_accounts(entries=ENTRIES)[0]
+
+        assert account.sheet_tab == 'Operaciones - pablo'
+        assert account.total_tab == 'Total diario - pablo'
+        assert account.monthly_tab == 'Rendimiento mensual - pablo'
+        assert account.state_file('sync_state.json') == 'sync_state.pablo.json'
+        assert account.state_file('/data/transfers.sqlite') == '/data/transfers.pablo.sqlite'
+
+    def test_explicit_file_and_tab(self):
+        """Test that an account can write to its own spreadsheet."""
+        account = load_accounts(entries=ENTRIES)[1]
+
+        assert (account.sheet_file, account.sheet_tab) == ('Trading Sofia', 'Operaciones')
+
+    def test_default_account_keeps_current_files(self):
+        """Test that without ACCOUNTS the single account of config.py keeps the usual tabs and files."""
+        [account] = load_accounts(entries=[])
+
+        assert account.user == 'user@example.com'
+        assert account.sheet_tab == 'Operaciones'
+        assert account.state_file('sync_state.json') == 'sync_state.json'
+
+    def test_select_by_name(self):
+        assert [a.name for a in load_accounts(['sofia'], entries=ENTRIES)] == ['sofia']
+        with pytest.raises(ValueError):
+            load_accounts(['juan'], entries=ENTRIES)
+
+
+class TestRunAccounts:
+    """Test the bounded worker pool."""
+
+    def test_accounts_run_concurrently_up_to_the_limit(self):
+        """Test that at most max_workers accounts run at the same time and results keep their order."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def task(account):
+            with lock:
+                running.append(account)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(account)
+            return account.name
+
+        accounts = [AccountProfile(str(i), 'u', 'p') for i in range(5)]
+        assert run_accounts(task, accounts, max_workers=2) == ['0', '1', '2', '3', '4']
+        assert max(peak) == 2
+
+    def test_failed_account_does_not_stop_the_others(self):
+        """Test that an exception in one account leaves None as its result."""
+        def task(account):
+            if account.name == 'b':
+                raise RuntimeError('login')
+            return account.name
+
+        accounts = [AccountProfile(name, 'u', 'p') for name in 'abc']
+        assert run_accounts(task, accounts) == ['a', None, 'c']
+
+    def test_single_worker_runs_in_calling_thread(self):
+        """Test that max_workers=1 processes the accounts in order in the calling thread, as --profile needs."""
+        accounts = [AccountProfile(name, 'u', 'p') for name in 'abc']
+
+        assert run_accounts(lambda account: threading.current_thread(), accounts, max_workers=1) == \
+            [threading.current_thread()] * 3
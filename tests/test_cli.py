@@ -0,0 +1,123 @@
+"""Tests for the cocos_sync command line."""
+
+import csv
+import pytest
+from cocos_sync import cli, commands
+from sheet_writer import DryRunSheetWriter
+
+
+@pytest.fixture
+def no_report(monkeypatch):
+    monkeypatch.setattr(cli.metrics, 'report', lambda path: None)
+
+
+def dry_run_writer():
+    writer = DryRunSheetWriter()
+    writer.update("'Operaciones'!A2:C2", [['Cerrada', 'GGAL', 1200.5]])
+    writer.append('Total diario', [['02-01-2023', 1000.0, 1.0]])
+    writer.flush()
+    return writer
+
+
+class TestCli:
+    """Test the subcommands, the dry-run export and the profiler."""
+
+    def test_sync_passes_date_range(self, monkeypatch, no_report):
+        """Test that --since and --until reach the sync job."""
+        calls = []
+
+        def sync(since, until, dry_run, accounts, workers):
+            calls.append((since, until, dry_run))
+            return []
+
+        monkeypatch.setattr(commands, 'sync', sync)
+
+        cli.main(['sync', '--since', '2023-01-01', '--until', '2023-02-01'])
+
+        assert calls == [('2023-01-01', '2023-02-01', False)]
+
+    def test_dry_run_exports_writes_to_csv(self, monkeypatch, no_report, tmp_path):
+        """Test that a dry run saves one CSV row per sheet row it would have written."""
+        calls = []
+
+        def totals(dry_run, accounts, workers):
+            calls.append(dry_run)
+            return [dry_run_writer()]
+
+        monkeypatch.setattr(commands, 'totals', totals)
+        path = tmp_path / 'simulacion.csv'
+
+        cli.main(['--dry-run', str(path), 'totals'])
+
+        with open(path, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert calls == [True]
+        assert rows[0] == {'tipo': 'update', 'rango': "'Operaciones'!A2:C2", 'A': 'Cerrada', 'B': 'GGAL', 'C': '1200.5'}
+        assert rows[1]['tipo'] == 'append' and rows[1]['A'] == '02-01-2023' and rows[1]['C'] == '1.0'
+
+    def test_profile_writes_text_report(self, monkeypatch, no_report, tmp_path):
+        """Test that --profile with a .txt file writes the cProfile summary."""
+        monkeypatch.setattr(commands, 'prices', lambda dry_run, accounts, workers: [DryRunSheetWriter()])
+        path = tmp_path / 'perfil.txt'
+
+        cli.main(['--profile', str(path), 'prices'])
+
+        assert 'function calls' in path.read_text()
+
+    def test_profile_runs_accounts_in_main_thread(self, monkeypatch, no_report, tmp_path):
+        """Test that --profile processes the accounts one at a time, so the profiler sees their work."""
+        calls = []
+
+        def prices(dry_run, accounts, workers):
+            calls.append(workers)
+            return []
+
+        monkeypatch.setattr(commands, 'prices', prices)
+
+        cli.main(['prices'])
+        cli.main(['--profile', str(tmp_path / 'perfil.txt'), 'prices'])
+
+        assert calls == [None, 1]
+
+    def test_default_command_is_all(self):
+        """Test that running without a subcommand selects the full sync."""
+        args = cli.build_parser().parse_args([])
+        assert args.command is None
+        assert cli.build_parser().parse_args(['backfill', '--source', 'store']).source == 'store'
+
+    def test_failed_account_sets_exit_code(self, monkeypatch, no_report):
+        """Test that the exit code is 1 when one of the accounts failed."""
+        monkeypatch.setattr(commands, 'prices', lambda dry_run, accounts, workers: [DryRunSheetWriter(), None])
+
+        assert cli.main(['prices']) == 1
+
+    def test_watch_runs_for_duration(self, monkeypatch, no_report):
+        """Test that --duration reaches the watcher and that watching writes nothing to the sheet."""
+        calls = []
+        monkeypatch.setattr(commands, 'watch', lambda duration, dry_run, accounts: calls.append((duration, dry_run)))
+
+        assert cli.main(['watch', '--duration', '1.5']) == 0
+        assert calls == [(1.5, False)]
+
+    def test_history_exports_csv(self, monkeypatch, no_report, tmp_path):
+        """Test that the history command writes the stored series as CSV without running a sync."""
+        calls = []
+
+        def history(ticker, since, until, accounts):
+            calls.append((ticker, since, until))
+            return [{'account': '', 'day': '2024-01-31', 'total_ars': 1000.0, 'total_usd': 1.0}]
+
+        monkeypatch.setattr(commands, 'history', history)
+        path = tmp_path / 'historico.csv'
+
+        assert cli.main(['history', '--since', '2024-01-01', '--output', str(path)]) == 0
+
+        with open(path, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert calls == [(None, '2024-01-01', None)]
+        assert rows == [{'account': '', 'day': '2024-01-31', 'total_ars': '1000.0', 'total_usd': '1.0'}]
+
+    def test_unknown_account_is_rejected(self):
+        """Test that --account with a name not in ACCOUNTS stops before running anything."""
+        with pytest.raises(SystemExit):
+            cli.main(['--account', 'otra', 'prices'])
@@ -0,0 +1,201 @@
+"""Tests for cocos module."""
+
+import io
+import json
+import time
+import pytest
+from cryptography.fernet import Fernet
+from cocos import CocosCapital, build_session, split_date_range, RETRY_STATUS_CODES
+from token_store import TokenStore
+
+
+class FakeResponse:
+    """Minimal response returned by FakeSession."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.raw = io.BytesIO(json.dumps(payload).encode())
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self.payload
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Session that records requests and answers with a fixed payload or per-path routes."""
+
+    def __init__(self, payload=None, routes=None):
+        self.payload = payload
+        self.routes = routes or {}
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        for path, (status_code, payload) in self.routes.items():
+            if path in url:
+                return FakeResponse(payload, status_code)
+        return FakeResponse(self.payload)
+
+    def paths(self):
+        return [url.split('.capital', 1)[1] for _, url, _ in self.requests]
+
+
+@pytest.fixture
+def cocos_without_login(monkeypatch):
+    """CocosCapital instance that skips the login flow."""
+    monkeypatch.setattr(CocosCapital, 'login', lambda self: None)
+    return CocosCapital('user', 'pass', session=FakeSession(), timeout=(1, 2))
+
+
+class TestSession:
+    """Test the pooled HTTP session."""
+
+    def test_build_session_mounts_retrying_adapter(self):
+        """Test that the session retries GETs on 429/5xx honoring Retry-After."""
+        session = build_session(retries=4, backoff_factor=0.1, pool_size=12)
+        adapter = session.get_adapter('https://api.cocos.capital')
+        retry = adapter.max_retries
+
+        assert retry.total == 4
+        assert retry.backoff_factor == 0.1
+        assert set(retry.status_forcelist) == set(RETRY_STATUS_CODES)
+        assert retry.respect_retry_after_header
+        assert 'POST' not in retry.allowed_methods
+        assert adapter._pool_maxsize == 12
+
+    def test_requests_use_session_headers_and_timeout(self, cocos_without_login):
+        """Test that API calls go through the session with default headers and timeout."""
+        cocos_without_login.session.payload = [{'short_ticker': 'GGAL', 'term': '48hs', 'last': 1}]
+        cocos_without_login.get_ticket_price('GGAL')
+
+        method, url, kwargs = cocos_without_login.session.requests[0]
+        assert method == 'GET'
+        assert url.endswith('/api/v1/markets/tickers/GGAL?segment=C')
+        assert kwargs['timeout'] == (1, 2)
+        assert kwargs['headers'] is cocos_without_login.headers
+
+
+@pytest.fixture
+def token_store(tmp_path):
+    return TokenStore(str(tmp_path / 'session'), Fernet.generate_key())
+
+
+class TestTokenStore:
+    """Test the encrypted session store and session reuse."""
+
+    def test_round_trip_is_encrypted(self, token_store):
+        """Test that saved sessions are readable back but not stored in plain text."""
+        token_store.save({'access_token': 'secret-token', 'account_id': 1})
+
+        assert token_store.load() == {'access_token': 'secret-token', 'account_id': 1}
+        with open(token_store.path, 'rb') as f:
+            assert b'secret-token' not in f.read()
+
+    def test_wrong_key_returns_none(self, token_store):
+        """Test that a session encrypted with another key is ignored."""
+        token_store.save({'access_token': 'secret-token', 'account_id': 1})
+        assert TokenStore(token_store.path, Fernet.generate_key()).load() is None
+
+    def test_without_key_is_disabled(self, tmp_path):
+        """Test that no file is written without an encryption key."""
+        store = TokenStore(str(tmp_path / 'session'), None)
+        store.save({'access_token': 'secret-token'})
+        assert not store.enabled
+        assert not (tmp_path / 'session').exists()
+
+    def test_valid_session_skips_login(self, token_store, monkeypatch):
+        """Test that a fresh stored session is reused without logging in."""
+        token_store.save({'access_token': 'tok', 'refresh_token': 'ref',
+                          'expires_at': time.time() + 3600, 'account_id': 7})
+        monkeypatch.setattr(CocosCapital, 'login', lambda self: pytest.fail('login should not run'))
+        session = FakeSession(routes={'/api/v1/users/me': (200, {'id_accounts': [7]})})
+
+        cocos = CocosCapital('user', 'pass', session=session, token_store=token_store)
+
+        assert cocos.headers['authorization'] == 'Bearer tok'
+        assert cocos.headers['x-account-id'] == '7'
+        assert session.paths() == ['/api/v1/users/me']
+
+    def test_expired_session_is_refreshed(self, token_store, monkeypatch):
+        """Test that an expired token is renewed with the refresh token and saved."""
+        token_store.save({'access_token': 'old', 'refresh_token': 'ref',
+                          'expires_at': time.time() - 10, 'account_id': 7})
+        monkeypatch.setattr(CocosCapital, 'login', lambda self: pytest.fail('login should not run'))
+        session = FakeSession(routes={
+            'grant_type=refresh_token': (200, {'access_token': 'new', 'refresh_token': 'ref2', 'expires_in': 3600}),
+            '/api/v1/users/me': (200, {'id_accounts': [7]}),
+        })
+
+        cocos = CocosCapital('user', 'pass', session=session, token_store=token_store)
+
+        assert cocos.token == 'new'
+        assert token_store.load()['refresh_token'] == 'ref2'
+
+    def test_failed_refresh_falls_back_to_login(self, token_store, monkeypatch):
+        """Test that a full login runs, without the stale session headers, when the refresh token is rejected."""
+        token_store.save({'access_token': 'old', 'refresh_token': 'ref',
+                          'expires_at': time.time() - 10, 'account_id': 7})
+        logins = []
+        monkeypatch.setattr(CocosCapital, 'login', lambda self: logins.append(dict(self.headers)))
+        session = FakeSession(routes={'grant_type=refresh_token': (400, {})})
+
+        cocos = CocosCapital('user', 'pass', session=session, token_store=token_store)
+
+        assert len(logins) == 1
+        assert 'authorization' not in logins[0] and 'x-account-id' not in logins[0]
+        assert (cocos.token, cocos.refresh_token, cocos.account_id) == (None, None, None)
+
+
+class TestTransferWindows:
+    """Test the windowed transfer fetcher."""
+
+    def test_split_date_range_by_month(self):
+        """Test that windows follow calendar months and cover the whole range."""
+        assert split_date_range('2023-01-15', '2023-03-10') == [
+            ('2023-01-15', '2023-01-31'),
+            ('2023-02-01', '2023-02-28'),
+            ('2023-03-01', '2023-03-10'),
+        ]
+        assert split_date_range('2023-11-01', '2024-02-01', window_months=2) == [
+            ('2023-11-01', '2023-12-31'),
+            ('2024-01-01', '2024-02-01'),
+        ]
+
+    def test_failed_window_does_not_discard_the_rest(self, cocos_without_login, monkeypatch):
+        """Test that a window failing after its retries is reported and skipped."""
+        monkeypatch.setattr('cocos.time.sleep', lambda seconds: None)
+        cocos_without_login.session = FakeSession(routes={
+            'date_from=2023-01-01': (200, [{'id': 1, 'date': '2023-01-10'}, {'id': 2, 'date': '2023-01-31'}]),
+            'date_from=2023-02-01': (500, {}),
+            'date_from=2023-03-01': (200, [{'id': 2, 'date': '2023-01-31'}, {'id': 3, 'date': '2023-03-02'}]),
+        })
+
+        transfers = cocos_without_login.get_transfers('2023-01-01', '2023-03-31')
+
+        assert [t['id'] for t in transfers] == [1, 2, 3]
+        assert cocos_without_login.failed_transfer_windows == [('2023-02-01', '2023-02-28')]
+
+    def test_transfers_frame_streams_windows(self, cocos_without_login, monkeypatch):
+        """Test that windows are streamed into one typed frame, deduplicated, with each raw window sent to the sink."""
+        monkeypatch.setattr('cocos.time.sleep', lambda seconds: None)
+        cocos_without_login.session = FakeSession(routes={
+            'date_from=2023-01-01': (200, [{'id': 1, 'date': '2023-01-10'}, {'id': 2, 'date': '2023-01-31'}]),
+            'date_from=2023-02-01': (500, {}),
+            'date_from=2023-03-01': (200, [{'id': 2, 'date': '2023-01-31'}, {'id': 3, 'date': '2023-03-02'}]),
+        })
+        raw_windows = []
+
+        transfers = cocos_without_login.get_transfers_frame('2023-01-01', '2023-03-31', raw_sink=raw_windows.append)
+
+        assert transfers['id'].tolist() == [1, 2, 3]
+        assert str(transfers['date'].dtype).startswith('datetime64')
+        assert sorted(len(window) for window in raw_windows) == [2, 2]
+        assert all(kwargs['stream'] for _, _, kwargs in cocos_without_login.session.requests)
+        assert cocos_without_login.failed_transfer_windows == [('2023-02-01', '2023-02-28')]
@@ -0,0 +1,61 @@
+"""Tests for daily_total module."""
+
+import daily_total
+from daily_total import insert_total_daily, total_row
+from portfolio_store import PortfolioStore
+
+
+class FakeCocos:
+    def __init__(self, total=None, error=None):
+        self.total = total
+        self.error = error
+
+    def get_portfolio(self):
+        if self.error:
+            raise self.error
+        return {'total': self.total, 'tickers': [{'ticker': 'GGAL', 'quantity': 10, 'last': 1200.0}]}
+
+
+class FakeSheetWriter:
+    """Sheet writer that records queued appends."""
+
+    def __init__(self):
+        self.appended = []
+
+    def append(self, tab_name, rows):
+        self.appended.append((tab_name, rows))
+
+
+class TestInsertTotalDaily:
+    """Test that the daily total is queued without pandas or a sheet connection."""
+
+    def test_total_is_queued_with_rounded_amounts(self, monkeypatch):
+        """Test that the total is queued in the 'Total diario' tab with two decimals."""
+        monkeypatch.setattr(daily_total, 'get_now_str', lambda: '02-01-2023')
+        writer = FakeSheetWriter()
+
+        insert_total_daily(FakeCocos({'ars': 1234.5678, 'usd': 1.234}), writer)
+
+        assert writer.appended == [('Total diario', [['02-01-2023', 1234.57, 1.23]])]
+
+    def test_api_error_queues_nothing(self):
+        """Test that a failure getting the total is logged and nothing is queued."""
+        writer = FakeSheetWriter()
+
+        insert_total_daily(FakeCocos(error=ValueError('sin datos')), writer)
+
+        assert writer.appended == []
+
+    def test_portfolio_snapshot_is_saved(self, tmp_path):
+        """Test that the full portfolio is saved as the snapshot of the day of the account."""
+        store = PortfolioStore(str(tmp_path / 'portfolio.sqlite'))
+
+        insert_total_daily(FakeCocos({'ars': 1000.0, 'usd': 1.0}), FakeSheetWriter(), portfolio_store=store,
+                           account='pablo')
+
+        assert [row['total_ars'] for row in store.account_series('pablo')] == [1000.0]
+        assert store.ticker_series('GGAL')[0]['quantity'] == 10
+
+
+def test_total_row():
+    assert total_row({'ars': 10, 'usd': 0.015}, '01-01-2024') == ['01-01-2024', 10, 0.01]
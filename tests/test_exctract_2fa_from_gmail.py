@@ -0,0 +1,84 @@
+"""Tests for exctract_2fa_from_gmail module."""
+
+import imaplib
+import quopri
+import time
+import exctract_2fa_from_gmail as gmail
+
+HTML = b'<p>Tu codigo:</p><span style="color: #000; font-size: 32px">123456</span>'
+
+
+class FakeIMAP:
+    """IMAP connection holding (id, internal timestamp, body) messages."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.searches = []
+        self.fetched = []
+        self.deleted = []
+
+    def search(self, charset, criteria):
+        self.searches.append(criteria)
+        return 'OK', [b' '.join(message_id for message_id, _, _ in self.messages)]
+
+    def fetch(self, message_id, parts):
+        self.fetched.append(parts)
+        _, timestamp, body = next(m for m in self.messages if m[0] == message_id)
+        internal_date = imaplib.Time2Internaldate(timestamp).encode()
+        return 'OK', [(message_id + b' (INTERNALDATE ' + internal_date + b' BODY[TEXT] {1}', body), b')']
+
+    def store(self, message_id, flags, value):
+        self.deleted.append(message_id)
+
+    def expunge(self):
+        pass
+
+    def noop(self):
+        pass
+
+    def logout(self):
+        pass
+
+
+class TestExtraerCodigo:
+    """Test code extraction from raw message bodies."""
+
+    def test_regex_finds_code(self):
+        assert gmail.extraer_codigo(HTML) == '123456'
+
+    def test_quoted_printable_body(self):
+        assert gmail.extraer_codigo(quopri.encodestring(HTML)) == '123456'
+
+    def test_missing_code_returns_none(self):
+        assert gmail.extraer_codigo(b'<p>Hola</p>') is None
+
+    def test_imap_date_is_locale_independent(self):
+        assert gmail.formatear_fecha_imap(1709632800) == '05-Mar-2024'
+
+
+class TestEsperarCodigo:
+    """Test polling for the 2FA email."""
+
+    def test_returns_code_received_after_challenge(self, monkeypatch):
+        """Test that only the body is fetched and the used email is deleted."""
+        now = time.time()
+        mail = FakeIMAP([(b'1', now - 3600, b'<span style="font-size: 32px">999999</span>'), (b'2', now, HTML)])
+        monkeypatch.setattr(gmail, 'conectar_imap', lambda user, password: mail)
+
+        code = gmail.esperar_codigo_2FA('user', 'pass', 'no-reply@cocos.capital', now - 1, timeout=1, intervalo=0)
+
+        assert code == '123456'
+        assert mail.fetched == ['(INTERNALDATE BODY.PEEK[TEXT])']
+        assert mail.deleted == [b'2']
+        assert 'SINCE' in mail.searches[0]
+
+    def test_old_code_is_ignored_until_timeout(self, monkeypatch):
+        """Test that emails older than the challenge are not used."""
+        now = time.time()
+        mail = FakeIMAP([(b'1', now - 3600, HTML)])
+        monkeypatch.setattr(gmail, 'conectar_imap', lambda user, password: mail)
+
+        code = gmail.esperar_codigo_2FA('user', 'pass', 'no-reply@cocos.capital', now, timeout=0.05, intervalo=0.01)
+
+        assert code is None
+        assert mail.deleted == []
@@ -0,0 +1,62 @@
+"""Tests for the Cocos client against the local fake server (benchmarks/fake_cocos_server.py)."""
+
+import pytest
+from benchmarks.fake_cocos_server import FakeCocosServer, FaultProfile
+from benchmarks.synthetic import generate_transfers
+import cocos as cocos_module
+from cocos import CocosCapital, build_session
+
+TRANSFERS = generate_transfers(300, tickers=10, start='2023-01-02')
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def factory(**kwargs):
+        server = FakeCocosServer(transfers=TRANSFERS, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield factory
+    for server in servers:
+        server.stop()
+
+
+def connect(server, retries=3):
+    return CocosCapital('user', 'pass', session=build_session(retries=retries, backoff_factor=0),
+                        base_url=server.url, two_factor_code_provider=server.two_factor_code_provider)
+
+
+class TestFakeCocosServer:
+    """Test the client flows end to end over HTTP."""
+
+    def test_login_with_two_factor_and_fetch_transfers(self, make_server):
+        """Test the full login (token, 2FA challenge and verify, users/me) and a windowed transfer fetch."""
+        server = make_server()
+        cocos = connect(server)
+
+        assert cocos.account_id == 12345
+        assert server.requests_to('/auth/v1/factors/fake-factor/verify', 200) == 1
+        transfers = cocos.get_transfers('2023-01-01', '2025-12-31')
+        assert sorted(t['id'] for t in transfers) == sorted(t['id'] for t in TRANSFERS)
+        assert cocos.failed_transfer_windows == []
+
+    def test_rate_limited_requests_are_retried(self, make_server):
+        """Test that 429 responses with Retry-After are retried by the session until they succeed."""
+        server = make_server(faults=FaultProfile(rate_limit_rate=0.4, retry_after=0, seed=3))
+        cocos = connect(server, retries=10)
+
+        transfers = cocos.get_transfers('2023-01-01', '2025-12-31')
+
+        assert len(transfers) == len(TRANSFERS)
+        assert server.requests_to('/api/v1/transfers', 429) > 0
+
+    def test_failing_windows_are_reported(self, make_server, monkeypatch):
+        """Test that windows still failing after all retries are listed instead of aborting the fetch."""
+        monkeypatch.setattr(cocos_module.time, 'sleep', lambda seconds: None)
+        server = make_server(faults=FaultProfile(error_rate=1.0, paths=('/api/v1/transfers',)))
+        cocos = connect(server, retries=0)
+
+        assert cocos.get_transfers('2023-01-01', '2023-02-28') == []
+        assert sorted(cocos.failed_transfer_windows) == [('2023-01-01', '2023-01-31'), ('2023-02-01', '2023-02-28')]
@@ -0,0 +1,105 @@
+"""Tests for instrumentation module."""
+
+from types import SimpleNamespace
+import instrumentation
+from instrumentation import RunMetrics, endpoint_name, timed
+
+
+class FakeClock:
+    """Clock that advances only when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_response(method, url, status=200, body=b'{}', seconds=0.25, retries=0):
+    retry = SimpleNamespace(history=[None] * retries) if retries else None
+    return SimpleNamespace(
+        request=SimpleNamespace(method=method, url=url), status_code=status, content=body,
+        headers={'Content-Length': str(len(body))}, elapsed=SimpleNamespace(total_seconds=lambda: seconds),
+        raw=SimpleNamespace(retries=retry),
+    )
+
+
+class TestRunMetrics:
+    """Test the per-stage timing and the per-endpoint HTTP counters."""
+
+    def test_stage_accumulates_calls_and_seconds(self):
+        """Test that each stage adds its duration, even when the block raises."""
+        clock = FakeClock()
+        metrics = RunMetrics(clock=clock)
+
+        with metrics.stage('matching'):
+            clock.now += 1.5
+        try:
+            with metrics.stage('matching'):
+                clock.now += 0.5
+                raise ValueError
+        except ValueError:
+            pass
+
+        assert metrics.summary()['stages'] == {'matching': {'calls': 2, 'seconds': 2.0}}
+
+    def test_timed_uses_current_metrics(self, monkeypatch):
+        """Test that the decorator records into the run metrics of the module."""
+        metrics = RunMetrics()
+        monkeypatch.setattr(instrumentation, 'metrics', metrics)
+
+        @timed('transform')
+        def transform(value):
+            return value * 2
+
+        assert transform(3) == 6
+        assert metrics.summary()['stages']['transform']['calls'] == 1
+
+    def test_response_hook_groups_by_endpoint(self):
+        """Test that responses are grouped by endpoint with errors, retries and bytes."""
+        metrics = RunMetrics()
+        metrics.response_hook(fake_response('GET', 'https://api.cocos.capital/api/v1/markets/tickers/GGAL?segment=C'))
+        metrics.response_hook(fake_response('GET', 'https://api.cocos.capital/api/v1/markets/tickers/YPFD',
+                                            status=503, body=b'', retries=2))
+
+        http = metrics.summary()['http']
+        assert list(http) == ['GET /api/v1/markets/tickers/{ticker}']
+        stats = http['GET /api/v1/markets/tickers/{ticker}']
+        assert (stats['calls'], stats['errors'], stats['retries'], stats['bytes']) == (2, 1, 2, 2)
+        assert stats['status'] == {'200': 1, '503': 1}
+
+    def test_response_hook_does_not_read_streamed_body(self):
+        """Test that a streamed response without Content-Length is recorded without consuming its body."""
+        class StreamedResponse(SimpleNamespace):
+            @property
+            def content(self):
+                raise AssertionError("el body no se debe leer")
+
+        base = fake_response('GET', 'https://api.cocos.capital/api/v1/transfers?date_from=2023-01-01')
+        response = StreamedResponse(**{k: v for k, v in vars(base).items() if k != 'content'})
+        response.headers = {}
+        metrics = RunMetrics()
+
+        metrics.response_hook(response, stream=True)
+
+        assert metrics.summary()['http']['GET /api/v1/transfers']['bytes'] == 0
+
+    def test_report_writes_prometheus_file(self, tmp_path):
+        """Test that the report exports the metrics in the Prometheus text format."""
+        metrics = RunMetrics()
+        with metrics.stage('sheet_write'):
+            pass
+        metrics.response_hook(fake_response('POST', 'https://api.cocos.capital/auth/v1/token?grant_type=password'))
+        path = tmp_path / 'cocos_sync.prom'
+
+        metrics.report(str(path))
+
+        text = path.read_text()
+        assert 'cocos_sync_stage_seconds{stage="sheet_write"}' in text
+        assert 'cocos_sync_http_calls{method="POST",endpoint="/auth/v1/token"} 1' in text
+
+
+def test_endpoint_name():
+    assert endpoint_name('POST', 'https://api.cocos.capital/auth/v1/factors/abc-123/verify') == \
+        'POST /auth/v1/factors/{id}/verify'
+    assert endpoint_name('GET', 'http://127.0.0.1:8080/auth/v1/factors/default') == 'GET /auth/v1/factors/default'
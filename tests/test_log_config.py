@@ -2,7 +2,11 @@
 
 import pytest
 import logging
-from log_config import get_logger, setup_logging
+import os
+import subprocess
+import sys
+import pandas as pd
+from log_config import get_logger, setup_logging, log_frame, dump_frame
 
 
 class TestLogConfig:
@@ -31,3 +35,54 @@ class TestLogConfig:
         logger1 = get_logger('module1')
         logger2 = get_logger('module2')
         assert logger1.name != logger2.name
+
+
+    def test_import_does_not_load_settings(self):
+        """Test that importing log_config works without config.py and does not import settings."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "import sys, log_config; log_config.get_logger('x'); assert 'settings' not in sys.modules"
+        subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+class TestLogFrame:
+    """Test that DataFrames are only rendered in full when DEBUG is enabled."""
+
+    def test_info_logs_shape_without_rendering(self, caplog, monkeypatch):
+        """Test that at INFO only the shape and the distinct values are logged."""
+        def fail(*args, **kwargs):
+            raise AssertionError("the frame should not be rendered")
+
+        monkeypatch.setattr(pd.DataFrame, 'to_string', fail)
+        df = pd.DataFrame({'ticker': ['GGAL', 'GGAL', 'YPFD'], 'quantity': [1, 2, 3]})
+
+        with caplog.at_level(logging.INFO, logger='frames'):
+            log_frame(logging.getLogger('frames'), "Posiciones", df, by='ticker')
+
+        assert caplog.messages == ["Posiciones: 3 filas x 2 columnas, 2 ticker distintos"]
+
+    def test_debug_renders_full_frame(self, caplog):
+        """Test that at DEBUG every row is logged, without changing pandas global options."""
+        df = pd.DataFrame({'ticker': [f'T{i}' for i in range(100)]})
+
+        with caplog.at_level(logging.DEBUG, logger='frames'):
+            log_frame(logging.getLogger('frames'), "Posiciones", df)
+
+        assert 'T99' in caplog.messages[-1] and '...' not in caplog.messages[-1]
+        assert pd.get_option('display.max_rows') is not None
+
+    def test_dump_frame_writes_parquet(self, tmp_path):
+        """Test that a frame is saved as a Parquet debug artifact."""
+        pytest.importorskip('pyarrow')
+        df = pd.DataFrame({'ticker': ['GGAL'], 'quantity': [1]})
+
+        path = dump_frame(logging.getLogger('frames'), "Non matched buys", df, str(tmp_path))
+
+        assert path.endswith('_non_matched_buys.parquet')
+        pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+
+    def test_setup_logging_is_idempotent(self):
+        """Test that repeated get_logger calls do not add handlers."""
+        handlers = list(logging.getLogger().handlers)
+        get_logger('module1')
+        get_logger('module2')
+        assert logging.getLogger().handlers == handlers
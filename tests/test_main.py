@@ -0,0 +1,13 @@
+"""Tests for main module."""
+
+import main
+
+
+def test_sync_all_runs_all_command(monkeypatch):
+    """Test that the Cloud Functions entry point runs the 'all' command."""
+    calls = []
+    monkeypatch.setattr(main, 'main', lambda argv: calls.append(argv))
+
+    main.sync_all({'data': ''}, None)
+
+    assert calls == [['all']]
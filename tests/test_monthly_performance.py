@@ -0,0 +1,104 @@
+"""Tests for monthly_performance module."""
+
+import pandas as pd
+import pytest
+from monthly_performance import MONTHLY_COLUMNS, MonthlyPerformance, month_end_equity
+from sheet_writer import DryRunSheetWriter
+
+
+def position(ticker, apertura, cantidad, cierre=None, resultado=None, resultado_hoy=None, ids=('', '')):
+    return {'Ticker': ticker, 'Fecha de Apertura': apertura, 'Cantidad': cantidad,
+            'Estado': 'Cerrada' if cierre else 'Abierta', 'Fecha de Cierre': cierre or '',
+            'Rentabilidad Ars': resultado if cierre else '', 'Rentabilidad ARs': '' if cierre else resultado_hoy,
+            'Id Compra': ids[0], 'Id Venta': ids[1]}
+
+
+def positions(*rows):
+    return pd.DataFrame(list(rows))
+
+
+@pytest.fixture
+def performance(tmp_path):
+    return MonthlyPerformance(str(tmp_path / 'monthly.json'), 'Mensual')
+
+
+def written(writer):
+    return {write['range']: write['rows'][0] for write in writer.queue}
+
+
+class TestMonthlyPerformance:
+    """Test the incremental monthly aggregates and their tab."""
+
+    def test_rows_per_month(self, performance):
+        """Test realized result, win rate, unrealized result and equity change of each month."""
+        data = positions(position('GGAL', '2024-01-02T10:00:00', 10, '2024-01-20T10:00:00', 500.0),
+                         position('YPFD', '2024-01-03T10:00:00', 5, '2024-01-25T10:00:00', -200.0),
+                         position('AL30', '2024-01-04T10:00:00', 2, '2024-02-10T10:00:00', 100.0),
+                         position('GGAL', '2024-02-01T10:00:00', 3, resultado_hoy=50.0))
+        daily_totals = [{'day': '2024-01-31', 'total_ars': 1000.0}, {'day': '2024-02-15', 'total_ars': 1100.0}]
+
+        touched = performance.update(data, '2024-02', daily_totals)
+
+        assert touched == ['2024-01', '2024-02']
+        assert performance.rows(touched) == [
+            ['2024-01', 300.0, '', 2, 1, 50.0, 1000.0, '', ''],
+            ['2024-02', 100.0, 50.0, 1, 1, 100.0, 1100.0, 100.0, 10.0],
+        ]
+
+    def test_only_changed_months_are_written(self, performance):
+        """Test that re-processing the same positions writes nothing and a new close only rewrites its month."""
+        first = position('GGAL', '2024-01-02T10:00:00', 10, '2024-01-20T10:00:00', 500.0)
+        writer = DryRunSheetWriter()
+        performance.write(writer, performance.update(positions(first), '2024-03'))
+        performance.save()
+        assert written(writer)["'Mensual'!A1:I1"] == MONTHLY_COLUMNS
+
+        performance = MonthlyPerformance(performance.path, 'Mensual')
+        performance.load()
+        assert performance.update(positions(first), '2024-03') == []
+
+        writer = DryRunSheetWriter()
+        later = position('YPFD', '2024-02-01T10:00:00', 1, '2024-03-05T10:00:00', 10.0)
+        performance.write(writer, performance.update(positions(first, later), '2024-03'))
+
+        assert list(written(writer)) == ["'Mensual'!A3:I3"]
+
+    def test_earlier_month_shifts_later_rows(self, performance):
+        """Test that a month before the known ones (a backfill) rewrites the following rows."""
+        performance.update(positions(position('GGAL', '2024-05-02', 1, '2024-05-20', 1.0)), '2024-05')
+        writer = DryRunSheetWriter()
+        performance.has_header = True
+
+        touched = performance.update(positions(position('YPFD', '2024-03-02', 1, '2024-03-20', 1.0)), '2024-05')
+        performance.write(writer, touched)
+
+        assert touched == ['2024-03', '2024-05']
+        assert written(writer)["'Mensual'!A3:I3"][0] == '2024-05'
+
+    def test_identical_partial_closes_in_separate_runs_are_both_realized(self, performance):
+        """Test that two identical partial closes of one buy, processed in different runs, add up."""
+        first = position('GGAL', '2024-01-02T10:00:00', 4, '2024-01-20T11:00:00', 80.0, ids=(1, 2))
+        second = position('GGAL', '2024-01-02T10:00:00', 4, '2024-01-20T11:00:00', 80.0, ids=(1, 3))
+
+        performance.update(positions(first), '2024-01')
+        touched = performance.update(positions(second), '2024-01')
+
+        assert touched == ['2024-01']
+        assert performance.rows(['2024-01'])[0][1:5] == [160.0, 0.0, 2, 2]
+
+    def test_equal_partial_closes_are_both_realized(self, performance):
+        """Test that two equal partial closes of one buy on the same day add up instead of replacing each other."""
+        first = position('GGAL', '2024-01-02T10:00:00', 5, '2024-01-20T11:00:00', 100.0)
+        second = position('GGAL', '2024-01-02T10:00:00', 5, '2024-01-20T15:00:00', 50.0)
+
+        performance.update(positions(first), '2024-01')
+        performance.update(positions(second), '2024-01')
+
+        assert performance.rows(['2024-01'])[0][1:5] == [150.0, 0.0, 2, 2]
+
+
+def test_month_end_equity_uses_last_total_of_month():
+    equity = month_end_equity([{'day': '2024-01-10', 'total_ars': 10}, {'day': '2024-01-31', 'total_ars': None},
+                               {'day': '2024-01-30', 'total_ars': 12}, {'day': '2024-03-01', 'total_ars': 20}])
+
+    assert equity == {'2024-01': 12.0, '2024-03': 20.0}
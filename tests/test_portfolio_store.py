@@ -0,0 +1,58 @@
+"""Tests for portfolio_store module."""
+
+import datetime
+import pytest
+from portfolio_store import PortfolioStore, portfolio_positions
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PortfolioStore(str(tmp_path / 'portfolio.sqlite'))
+
+
+def portfolio(ars, positions):
+    return {'total': {'ars': ars, 'usd': ars / 1000},
+            'tickers': [{'ticker': ticker, 'quantity': quantity, 'last': price, 'amount': quantity * price}
+                        for ticker, quantity, price in positions]}
+
+
+def day(text, hour=10):
+    return datetime.datetime.strptime(text, '%Y-%m-%d').replace(hour=hour)
+
+
+class TestPortfolioStore:
+    """Test the local daily portfolio snapshots."""
+
+    def test_one_snapshot_per_day(self, store):
+        """Test that a later run on the same day replaces that day's total and positions."""
+        store.save(portfolio(1000, [('GGAL', 10, 100), ('AL30', 5, 50)]), taken_at=day('2024-01-31', 10))
+        store.save(portfolio(1100, [('GGAL', 10, 110)]), taken_at=day('2024-01-31', 17))
+        store.save(portfolio(1200, [('GGAL', 10, 120)]), taken_at=day('2024-02-01'))
+
+        assert store.account_series() == [
+            {'day': '2024-01-31', 'total_ars': 1100, 'total_usd': 1.1},
+            {'day': '2024-02-01', 'total_ars': 1200, 'total_usd': 1.2},
+        ]
+        assert store.ticker_series('AL30') == []
+        assert store.months() == ['2024-01', '2024-02']
+        assert store.snapshot('2024-01-31')['total']['ars'] == 1100
+
+    def test_series_by_account_and_range(self, store):
+        """Test that ticker series can be filtered by account and inclusive day range."""
+        for account, quantity in (('pablo', 10), ('sofia', 3)):
+            for text in ('2024-03-01', '2024-03-02', '2024-03-03'):
+                store.save(portfolio(1000, [('GGAL', quantity, 100)]), account=account, taken_at=day(text))
+
+        series = store.ticker_series('GGAL', since='2024-03-02', until='2024-03-03')
+
+        assert [(row['account'], row['day']) for row in series] == [
+            ('pablo', '2024-03-02'), ('sofia', '2024-03-02'), ('pablo', '2024-03-03'), ('sofia', '2024-03-03')]
+        assert {row['quantity'] for row in store.ticker_series('GGAL', account='sofia')} == {3}
+        assert store.account_series('pablo', until='2024-03-01')[0]['day'] == '2024-03-01'
+
+
+def test_portfolio_positions_accepts_field_aliases():
+    positions = portfolio_positions({'total': {'ars': 1}, 'positions': [
+        {'short_ticker': 'YPFD', 'qty': 2, 'price': 30.5}, {'description': 'sin ticker'}]})
+
+    assert positions == [{'ticker': 'YPFD', 'quantity': 2, 'price': 30.5, 'amount': None}]
@@ -0,0 +1,233 @@
+"""Tests for price_alerts module."""
+
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+import price_alerts
+from price_alerts import AlertRules, OpenLots, PriceWatcher, RefreshingFetch, TelegramSink, WebhookSink
+from rate_limiter import AsyncTokenBucket
+
+
+def buys(*rows):
+    return pd.DataFrame([{'id': i, 'ticker': ticker, 'type': 'BUY', 'date': '2024-01-02T10:00:00',
+                          'quantity': quantity, 'price': price, 'amount': -quantity * price}
+                         for i, (ticker, quantity, price) in enumerate(rows, start=1)])
+
+
+class RecordingSink:
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alerts):
+        self.alerts += alerts
+
+
+class FakeSession:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json, timeout):
+        self.posts.append((url, json))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+
+class ExpiringCocos:
+    """Cocos session whose first token the API rejects after a number of price requests."""
+
+    def __init__(self, valid_requests, expires_soon=False, refresh_works=True):
+        self.token = 'tok-1'
+        self.valid_requests = valid_requests
+        self.expires_soon = expires_soon
+        self.refresh_works = refresh_works
+        self.requests = 0
+        self.refreshes = 0
+        self.logins = 0
+
+    def token_is_expired(self):
+        return self.expires_soon
+
+    def refresh_session(self):
+        self.refreshes += 1
+        if self.refresh_works:
+            self.token, self.expires_soon = f'tok-{self.refreshes + 1}', False
+        return self.refresh_works
+
+    def login(self):
+        self.logins += 1
+        self.token = None
+
+    def get_price(self, ticker):
+        self.requests += 1
+        if self.token not in ('tok-1', None) or self.requests <= self.valid_requests:
+            return 120.0
+        response = requests.Response()
+        response.status_code = 401
+        raise requests.HTTPError("401 Unauthorized", response=response)
+
+
+class TestAlertRules:
+    """Test the vectorized threshold evaluation."""
+
+    def test_alerts_when_entering_a_zone(self):
+        """Test that a lot alerts once when it enters the gain or loss zone and again after leaving it."""
+        lots = OpenLots(buys(('GGAL', 10, 100.0), ('YPFD', 5, 50.0), ('GGAL', 2, 105.0)))
+        rules = AlertRules(lots, gain_pct=10, loss_pct=5)
+
+        first = rules.evaluate(np.array([111.0, 47.0]))
+        again = rules.evaluate(np.array([112.0, 47.0]))
+        rules.evaluate(np.array([100.0, 50.0]))
+        back = rules.evaluate(np.array([115.0, 50.0]))
+
+        assert [(a['id'], a['kind'], a['change_pct']) for a in first] == [(1, 'gain', 11.0), (2, 'loss', -6.0)]
+        assert again == []
+        assert [a['id'] for a in back] == [1]
+
+    def test_missing_price_keeps_zone_and_ticker_thresholds(self):
+        """Test that an unknown price does not alert or reset a lot, and that per-ticker thresholds apply."""
+        lots = OpenLots(buys(('GGAL', 10, 100.0), ('AL30', 1, 0.0), ('YPFD', 5, 50.0)))
+        rules = AlertRules(lots, gain_pct=10, loss_pct=10, thresholds={'YPFD': (2, 1)})
+
+        alerts = rules.evaluate(np.array([120.0, np.nan, 51.0]))
+        assert [(a['ticker'], a['threshold_pct']) for a in alerts] == [('GGAL', 10.0), ('YPFD', 2.0)]
+        assert rules.evaluate(np.array([np.nan, np.nan, np.nan])) == []
+        assert rules.zone.tolist() == [1, 0, 1]
+
+    def test_lots_without_ticker_or_quantity_are_dropped(self):
+        lots = OpenLots(buys(('GGAL', 10, 100.0), (None, 10, 1.0), ('YPFD', 0, 50.0)))
+
+        assert (len(lots), lots.tickers) == (1, ['GGAL'])
+        assert len(OpenLots(pd.DataFrame())) == 0
+
+
+class TestPriceWatcher:
+    """Test the asyncio polling scheduler."""
+
+    def test_polls_each_ticker_at_its_interval(self):
+        """Test that tickers are polled at their own interval and alerts reach every sink."""
+        polls = []
+
+        def fetch_price(ticker):
+            polls.append(ticker)
+            return 120.0 if ticker == 'GGAL' else 50.0
+
+        sinks = [RecordingSink(), RecordingSink()]
+        lots = OpenLots(buys(('GGAL', 10, 100.0), ('YPFD', 5, 50.0)))
+        watcher = PriceWatcher(fetch_price, lots, sinks, intervals={'GGAL': 0.02}, default_interval=0.2)
+
+        stats = watcher.run(duration=0.15)
+
+        assert polls.count('YPFD') == 1
+        assert polls.count('GGAL') >= 4
+        assert [alert['ticker'] for alert in sinks[1].alerts] == ['GGAL']
+        assert stats['alerts'] == 1 and stats['polls'] == len(polls)
+
+    def test_failures_are_counted_and_do_not_stop_the_watcher(self):
+        """Test that a failing price fetch or sink is logged and the next tick still runs."""
+        class BrokenSink:
+            def send(self, alerts):
+                raise RuntimeError("sin red")
+
+        def fetch_price(ticker):
+            if ticker == 'YPFD':
+                raise RuntimeError("503")
+            return 80.0
+
+        sink = RecordingSink()
+        watcher = PriceWatcher(fetch_price, OpenLots(buys(('GGAL', 1, 100.0), ('YPFD', 1, 50.0))),
+                               [BrokenSink(), sink], default_interval=0.02)
+
+        stats = watcher.run(duration=0.1)
+
+        assert stats['errors'] >= 2
+        assert [alert['kind'] for alert in sink.alerts] == ['loss']
+
+    def test_stop_from_another_thread(self):
+        """Test that stop() ends a watcher without duration while its tickers are waiting for their turn."""
+        watcher = PriceWatcher(lambda ticker: 100.0, OpenLots(buys(('GGAL', 1, 100.0))), [RecordingSink()],
+                               default_interval=60)
+        timer = threading.Timer(0.1, watcher.stop)
+        timer.start()
+
+        stats = watcher.run()
+
+        timer.join()
+        assert stats['polls'] == 1 and watcher.elapsed < 5
+
+    def test_latencies_keep_only_the_recent_window(self, monkeypatch):
+        """Test that a long-running watcher keeps only the last LATENCY_WINDOW latencies for its stats."""
+        monkeypatch.setattr(price_alerts, 'LATENCY_WINDOW', 3)
+        clock = iter(range(10, 100))
+        watcher = PriceWatcher(lambda ticker: None, OpenLots(buys(('GGAL', 1, 100.0))), [RecordingSink()],
+                               clock=lambda: next(clock))
+
+        for _ in range(5):
+            watcher._pending = [0.0]
+            asyncio.run(watcher.tick(None))
+
+        assert list(watcher.latencies) == [12.0, 13.0, 14.0]
+        assert watcher.polls == 5 and watcher.stats()['latency_max'] == 14.0
+
+    def test_token_that_expires_mid_run_is_renewed(self):
+        """Test that a 401 in the middle of a run renews the session once and the next polls keep working."""
+        cocos = ExpiringCocos(valid_requests=3)
+        fetch_price = RefreshingFetch(cocos, cocos.get_price)
+        watcher = PriceWatcher(fetch_price, OpenLots(buys(('GGAL', 10, 100.0), ('YPFD', 5, 100.0))),
+                               [RecordingSink()], default_interval=0.02)
+
+        stats = watcher.run(duration=0.15)
+
+        assert stats['errors'] == 0 and stats['polls'] > 4
+        assert (cocos.refreshes, fetch_price.renewals, cocos.token) == (1, 1, 'tok-2')
+
+
+def test_async_token_bucket_waits_when_empty():
+    now = [0.0]
+    waits = []
+
+    async def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = AsyncTokenBucket(60, capacity=2, clock=lambda: now[0], sleep=sleep)
+
+    async def acquire_all():
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+
+    asyncio.run(acquire_all())
+
+    assert waits == [pytest.approx(1.0)]
+
+
+def test_webhook_and_telegram_payloads():
+    alert = {'account': 'pablo', 'ticker': 'GGAL', 'id': 1, 'date': '2024-01-02', 'quantity': 10.0, 'cost': 100.0,
+             'price': 111.0, 'change_pct': 11.0, 'kind': 'gain', 'threshold_pct': 10.0}
+    webhook, telegram = FakeSession(), FakeSession()
+
+    WebhookSink('http://hooks.local/alertas', session=webhook).send([alert])
+    TelegramSink('TOKEN', 42, session=telegram).send([alert])
+
+    assert webhook.posts == [('http://hooks.local/alertas', {'alerts': [alert]})]
+    url, payload = telegram.posts[0]
+    assert url == 'https://api.telegram.org/botTOKEN/sendMessage'
+    assert payload['chat_id'] == 42 and payload['text'].startswith('GGAL [pablo]: +11.00% (ganancia')
+
+
+def test_refreshing_fetch_renews_expired_token_and_waits_after_a_failed_login():
+    now = [0.0]
+    cocos = ExpiringCocos(valid_requests=0, expires_soon=True, refresh_works=False)
+    fetch_price = RefreshingFetch(cocos, cocos.get_price, retry_interval=60, clock=lambda: now[0])
+
+    for _ in range(3):
+        with pytest.raises(requests.HTTPError):
+            fetch_price('GGAL')
+    now[0] = 61
+    with pytest.raises(requests.HTTPError):
+        fetch_price('GGAL')
+
+    assert (cocos.refreshes, cocos.logins) == (2, 2)
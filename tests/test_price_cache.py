@@ -0,0 +1,64 @@
+"""Tests for price_cache module."""
+
+from price_cache import PriceCache
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestPriceCache:
+    """Test TTL, LRU eviction and persistence of the price cache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted as hits or misses."""
+        cache = PriceCache(clock=FakeClock())
+        assert cache.get('GGAL', '48hs') == (False, None)
+        cache.set('GGAL', '48hs', 100)
+        assert cache.get('GGAL', '48hs') == (True, 100)
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_ttl_depends_on_term(self):
+        """Test that each term expires after its own TTL."""
+        clock = FakeClock()
+        cache = PriceCache({'48hs': 60, 'CI': 10}, clock=clock)
+        cache.set('GGAL', '48hs', 100)
+        cache.set('GGAL', 'CI', 99)
+
+        clock.now += 30
+        assert cache.get('GGAL', '48hs') == (True, 100)
+        assert cache.get('GGAL', 'CI') == (False, None)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = PriceCache(max_entries=2, clock=FakeClock())
+        cache.set('A', '48hs', 1)
+        cache.set('B', '48hs', 2)
+        cache.get('A', '48hs')
+        cache.set('C', '48hs', 3)
+
+        assert cache.get('A', '48hs') == (True, 1)
+        assert cache.get('B', '48hs') == (False, None)
+
+    def test_persistence_skips_expired_entries(self, tmp_path):
+        """Test that saved entries are reloaded while still fresh."""
+        path = str(tmp_path / 'prices.json')
+        clock = FakeClock()
+        cache = PriceCache({'48hs': 60, 'CI': 10}, path=path, clock=clock)
+        cache.set('GGAL', '48hs', 100)
+        cache.set('GGAL', 'CI', 99)
+        cache.save()
+
+        clock.now += 30
+        reloaded = PriceCache({'48hs': 60, 'CI': 10}, path=path, clock=clock)
+        assert reloaded.get('GGAL', '48hs') == (True, 100)
+        assert reloaded.get('GGAL', 'CI') == (False, None)
@@ -0,0 +1,80 @@
+"""Tests for price_service module."""
+
+import threading
+from price_cache import PriceCache
+from price_service import PriceService
+
+
+class FakeCocos:
+    """
+    Cocos client that answers price requests from a dict and records concurrency. With a barrier, each
+    request waits until as many requests as the barrier's parties are running at the same time.
+    """
+
+    def __init__(self, prices, barrier=None):
+        self.prices = prices
+        self.barrier = barrier
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_ticket_price(self, ticker):
+        with self.lock:
+            self.calls.append(ticker)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.barrier:
+                self.barrier.wait(timeout=5)
+        finally:
+            with self.lock:
+                self.active -= 1
+        if ticker not in self.prices:
+            raise ValueError(f"Unknown ticker {ticker}")
+        return [
+            {'short_ticker': ticker, 'term': '48hs', 'last': self.prices[ticker]},
+            {'short_ticker': ticker, 'term': 'CI', 'last': self.prices[ticker] - 1},
+        ]
+
+
+class TestPriceService:
+    """Test batched price fetching."""
+
+    def test_get_price_filters_by_term(self):
+        """Test that the price for the requested term is returned."""
+        service = PriceService(FakeCocos({'GGAL': 100}))
+        assert service.get_price('GGAL') == 100
+        assert service.get_price('GGAL', term='CI') == 99
+
+    def test_get_prices_fetches_each_ticker_once(self):
+        """Test that repeated tickers are only requested once."""
+        cocos = FakeCocos({'GGAL': 100, 'YPFD': 200})
+        prices = PriceService(cocos).get_prices(['GGAL', 'YPFD', 'GGAL', None])
+
+        assert prices == {'GGAL': 100, 'YPFD': 200}
+        assert sorted(cocos.calls) == ['GGAL', 'YPFD']
+
+    def test_get_prices_runs_concurrently_within_limit(self):
+        """Test that requests overlap but never exceed max_workers."""
+        # Each request waits until 3 are running: without overlap the barrier times out and the price is None
+        cocos = FakeCocos({f'T{i}': i for i in range(6)}, barrier=threading.Barrier(3))
+        prices = PriceService(cocos, max_workers=3).get_prices([f'T{i}' for i in range(6)])
+
+        assert prices == {f'T{i}': i for i in range(6)}
+        assert cocos.max_active == 3
+
+    def test_failed_ticker_returns_none(self):
+        """Test that a failing ticker does not break the batch."""
+        prices = PriceService(FakeCocos({'GGAL': 100})).get_prices(['GGAL', 'XXXX'])
+        assert prices == {'GGAL': 100, 'XXXX': None}
+
+    def test_cache_avoids_repeated_requests(self):
+        """Test that a cached price is not requested again and other terms are cached too."""
+        cocos = FakeCocos({'GGAL': 100})
+        service = PriceService(cocos, cache=PriceCache())
+
+        assert service.get_prices(['GGAL']) == {'GGAL': 100}
+        assert service.get_prices(['GGAL']) == {'GGAL': 100}
+        assert service.get_price('GGAL', term='CI') == 99
+        assert cocos.calls == ['GGAL']
@@ -0,0 +1,156 @@
+"""Tests for sheet_upsert module."""
+
+import re
+import pandas as pd
+import pytest
+from sheet_upsert import SheetUpsertWriter, PositionRowIndex, column_letter
+from sheet_writer import BatchSheetWriter, WriteJournal
+
+COLUMNS = ['Estado', 'Ticker', 'Fecha de Apertura', 'Cantidad', 'Precio Hoy', 'Ars Cierre']
+
+
+class FakeSpreadsheet:
+    """Spreadsheet that applies values_batch_update to the grid of its sheet."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.batch_updates = []
+
+    def values_batch_update(self, body):
+        self.batch_updates.append(body)
+        for item in body['data']:
+            row = int(re.search(r'!A(\d+):', item['range']).group(1))
+            while len(self.grid) < row:
+                self.grid.append([])
+            self.grid[row - 1] = list(item['values'][0])
+
+
+class FakeSheet:
+    def __init__(self, grid):
+        self.spreadsheet = FakeSpreadsheet(grid)
+
+
+class FakeGridConnector:
+    """Sheet connector backed by an in-memory grid."""
+
+    def __init__(self, rows=None):
+        self.grid = [list(row) for row in rows or []]
+        self.sheet = FakeSheet(self.grid)
+        self.reads = 0
+
+    def read_sheet_data(self, tab_name=None, skiprows=0, output_format='list'):
+        self.reads += 1
+        return [list(row) for row in self.grid]
+
+
+def position(estado, ticker, fecha, cantidad, precio_hoy='', ars_cierre=' '):
+    return [estado, ticker, fecha, cantidad, precio_hoy, ars_cierre]
+
+
+def frame(*rows):
+    return pd.DataFrame(list(rows), columns=COLUMNS)
+
+
+@pytest.fixture
+def upsert(tmp_path):
+    """Upsert a DataFrame with a fresh writer (as a new run would) and flush the queued writes."""
+    def run(connector, df):
+        index = PositionRowIndex(str(tmp_path / 'position_index.json'))
+        sheet_writer = BatchSheetWriter(connector, WriteJournal(str(tmp_path / 'sheet_journal.jsonl')))
+        resumen = SheetUpsertWriter(connector, 'Operaciones', index, sheet_writer).upsert(df)
+        sheet_writer.flush()
+        return resumen
+    return run
+
+
+class TestSheetUpsertWriter:
+    """Test that positions are updated in their own row instead of appended."""
+
+    def test_first_write_adds_header_and_rows(self, upsert):
+        """Test that an empty sheet gets the header and every position."""
+        connector = FakeGridConnector()
+        resumen = upsert(connector, frame(position('Abierta', 'GGAL', '2023-01-02', 10, 110)))
+
+        assert connector.grid == [COLUMNS, position('Abierta', 'GGAL', '2023-01-02', 10, 110)]
+        assert resumen['agregadas'] == 1
+
+    def test_closing_position_updates_row_in_place(self, upsert):
+        """Test that an open position that closes is rewritten in its row with one batch update."""
+        connector = FakeGridConnector()
+        upsert(connector, frame(
+            position('Abierta', 'GGAL', '2023-01-02', 10, 110),
+            position('Abierta', 'YPFD', '2023-01-03', 5, 200),
+        ))
+
+        resumen = upsert(connector, frame(
+            position('Cerrada', 'GGAL', '2023-01-02', 10, ars_cierre=1200),
+            position('Abierta', 'YPFD', '2023-01-03', 5, 200),
+        ))
+
+        assert len(connector.grid) == 3
+        assert connector.grid[1] == position('Cerrada', 'GGAL', '2023-01-02', 10, ars_cierre=1200)
+        assert resumen == {'actualizadas': 1, 'agregadas': 0, 'sin_cambios': 1, 'vaciadas': 0}
+        assert connector.sheet.spreadsheet.batch_updates[-1]['data'] == [
+            {'range': "'Operaciones'!A2:F2", 'values': [position('Cerrada', 'GGAL', '2023-01-02', 10, ars_cierre=1200)]},
+        ]
+
+    def test_unchanged_positions_are_not_written(self, upsert):
+        """Test that a second run without changes sends no further requests to the sheet."""
+        connector = FakeGridConnector()
+        data = frame(position('Abierta', 'GGAL', '2023-01-02', 10, 110))
+        upsert(connector, data)
+        upsert(connector, data)
+
+        assert len(connector.sheet.spreadsheet.batch_updates) == 1
+        assert len(connector.grid) == 2
+
+    def test_partial_close_reuses_open_row(self, upsert):
+        """Test that the open row replaced by a partial close is freed and reused."""
+        connector = FakeGridConnector()
+        upsert(connector, frame(position('Abierta', 'GGAL', '2023-01-02', 10, 110)))
+
+        resumen = upsert(connector, frame(
+            position('Cerrada', 'GGAL', '2023-01-02', 4, ars_cierre=480),
+            position('Abierta', 'GGAL', '2023-01-02', 6, 110),
+        ))
+
+        assert connector.grid[1:] == [
+            position('Cerrada', 'GGAL', '2023-01-02', 4, ars_cierre=480),
+            position('Abierta', 'GGAL', '2023-01-02', 6, 110),
+        ]
+        assert resumen['vaciadas'] == 1 and resumen['agregadas'] == 2
+
+    def test_rebuild_clears_duplicated_open_rows(self, upsert):
+        """Test that an append-only sheet is rebuilt keeping the closed row and clearing the stale open one."""
+        connector = FakeGridConnector([
+            COLUMNS,
+            ['Abierta', 'GGAL', '02-01-2023', '10', '110', ''],
+            ['Cerrada', 'GGAL', '02-01-2023', '10', '', '1200'],
+        ])
+
+        upsert(connector, frame(position('Cerrada', 'GGAL', '2023-01-02', 10, ars_cierre=1200)))
+
+        assert connector.reads == 1
+        assert connector.grid[1] == [''] * len(COLUMNS)
+        assert connector.grid[2] == position('Cerrada', 'GGAL', '2023-01-02', 10, ars_cierre=1200)
+
+    def test_positions_sharing_lot_and_size_get_their_own_row(self, upsert):
+        """Test that equal partial closes of one buy, and equal buys of the same day, are not merged."""
+        columns = ['Estado', 'Ticker', 'Fecha de Apertura', 'Cantidad', 'Fecha de Cierre']
+        opens = [['Abierta', 'YPFD', '2023-01-02T10:00:00', 10, ''], ['Abierta', 'YPFD', '2023-01-02T15:00:00', 10, '']]
+        first_close = ['Cerrada', 'GGAL', '2023-01-02T10:00:00', 5, '2023-01-03T11:00:00']
+        second_close = ['Cerrada', 'GGAL', '2023-01-02T10:00:00', 5, '2023-01-03T12:00:00']
+        connector = FakeGridConnector()
+
+        first = upsert(connector, pd.DataFrame(
+            [first_close, ['Abierta', 'GGAL', '2023-01-02T10:00:00', 5, '']] + opens, columns=columns))
+        # Una sincronización incremental sólo trae el cierre nuevo y las abiertas
+        second = upsert(connector, pd.DataFrame([second_close] + opens, columns=columns))
+
+        assert connector.grid[1:] == [first_close, second_close] + opens
+        assert first['agregadas'] == 4
+        assert second == {'actualizadas': 1, 'agregadas': 0, 'sin_cambios': 2, 'vaciadas': 0}
+
+
+def test_column_letter():
+    assert [column_letter(n) for n in (1, 15, 26, 27, 52)] == ['A', 'O', 'Z', 'AA', 'AZ']
@@ -0,0 +1,125 @@
+"""Tests for sheet_writer and rate_limiter modules."""
+
+import pytest
+from rate_limiter import TokenBucket
+from sheet_writer import BatchSheetWriter, WriteJournal
+
+
+class FakeSpreadsheet:
+    """Spreadsheet that records requests and can fail a number of times."""
+
+    def __init__(self, failures=0, rows=0):
+        self.failures = failures
+        self.requests = []
+        self.rows = rows
+
+    def _record(self, request):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("quota exceeded")
+        self.requests.append(request)
+
+    def values_batch_update(self, body):
+        self._record(('batch_update', body))
+
+    def values_append(self, range_name, params, body):
+        self._record(('append', range_name, body['values']))
+        self.rows += len(body['values'])
+
+    def values_get(self, range_name):
+        return {'values': [['x']] * self.rows}
+
+
+class FakeConnector:
+    def __init__(self, spreadsheet):
+        self.sheet = type('Sheet', (), {'spreadsheet': spreadsheet})()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return WriteJournal(str(tmp_path / 'sheet_journal.jsonl'))
+
+
+class TestBatchSheetWriter:
+    """Test batching and journaling of sheet writes."""
+
+    def test_updates_go_in_one_request_and_appends_one_per_tab(self, journal):
+        """Test that updates of several tabs share one batchUpdate and appends are grouped by tab."""
+        spreadsheet = FakeSpreadsheet()
+        writer = BatchSheetWriter(FakeConnector(spreadsheet), journal)
+        writer.update("'Operaciones'!A2:B2", [['Cerrada', 'GGAL']])
+        writer.update("'Resumen'!A5:B5", [['2023-01', 10]])
+        writer.append('Total diario', [['01-01-2023', 100.5, 1.5]])
+        writer.append('Total diario', [['02-01-2023', 101.5, 1.5]])
+
+        assert writer.flush()
+        assert [request[0] for request in spreadsheet.requests] == ['batch_update', 'append']
+        assert len(spreadsheet.requests[0][1]['data']) == 2
+        assert spreadsheet.requests[1][2] == [['01-01-2023', 100.5, 1.5], ['02-01-2023', 101.5, 1.5]]
+        assert journal.pending() == []
+
+    def test_failed_writes_are_replayed_on_next_flush(self, journal):
+        """Test that writes that failed stay in the journal and are sent by the next run."""
+        writer = BatchSheetWriter(FakeConnector(FakeSpreadsheet(failures=1)), journal)
+        writer.append('Total diario', [['01-01-2023', 100.5, 1.5]])
+        assert not writer.flush()
+        assert len(journal.pending()) == 1
+
+        spreadsheet = FakeSpreadsheet()
+        next_run = BatchSheetWriter(FakeConnector(spreadsheet), journal)
+        next_run.append('Total diario', [['02-01-2023', 101.5, 1.5]])
+        assert next_run.flush()
+
+        assert spreadsheet.requests == [
+            ('append', "'Total diario'!A1", [['01-01-2023', 100.5, 1.5], ['02-01-2023', 101.5, 1.5]]),
+        ]
+        assert journal.pending() == []
+
+    def test_confirmed_part_is_not_resent(self, journal):
+        """Test that when the append fails after the batch update, only the append is retried."""
+        spreadsheet = FakeSpreadsheet()
+        spreadsheet.values_append = lambda *args: (_ for _ in ()).throw(ConnectionError("timeout"))
+        writer = BatchSheetWriter(FakeConnector(spreadsheet), journal)
+        writer.update("'Operaciones'!A2:B2", [['Cerrada', 'GGAL']])
+        writer.append('Total diario', [['01-01-2023', 100.5, 1.5]])
+
+        assert not writer.flush()
+        assert [write['kind'] for write in journal.pending()] == ['append']
+
+    def test_append_that_reached_the_sheet_is_not_resent(self, journal):
+        """Test that an append sent before a crash, but not confirmed, is confirmed on replay without resending."""
+        spreadsheet = FakeSpreadsheet(rows=3)
+        writer = BatchSheetWriter(FakeConnector(spreadsheet), journal)
+        writer.append('Total diario', [['01-01-2023', 100.5, 1.5], ['02-01-2023', 101.5, 1.5]])
+        writer.journal.mark_done = lambda ids: (_ for _ in ()).throw(SystemExit("caída"))
+        with pytest.raises(SystemExit):
+            writer.flush()
+
+        next_run = BatchSheetWriter(FakeConnector(spreadsheet), WriteJournal(journal.path))
+        next_run.append('Total diario', [['03-01-2023', 102.5, 1.5]])
+        assert next_run.flush()
+
+        assert [request[2] for request in spreadsheet.requests] == [
+            [['01-01-2023', 100.5, 1.5], ['02-01-2023', 101.5, 1.5]],
+            [['03-01-2023', 102.5, 1.5]],
+        ]
+        assert spreadsheet.rows == 6 and journal.pending() == []
+
+
+class TestTokenBucket:
+    """Test the token bucket rate limiter."""
+
+    def test_waits_when_bucket_is_empty(self):
+        """Test that calls beyond the capacity wait for the refill."""
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(60, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            bucket.acquire()
+
+        assert waits == [pytest.approx(1.0)]
@@ -0,0 +1,223 @@
+"""Tests for trading module."""
+
+import logging
+import os
+import re
+import pandas as pd
+import pytest
+import trading
+from accounts import AccountProfile
+from dedup_index import DedupIndex
+from sheet_upsert import PositionRowIndex, SheetUpsertWriter
+from sheet_writer import BatchSheetWriter, WriteJournal
+from price_service import PriceService
+from trading import Trading
+from transfer_schema import transfers_frame
+
+
+class FakeCocos:
+    """Cocos client returning canned transfers and prices."""
+
+    def __init__(self, transfers, prices=None):
+        self.transfers = transfers
+        self.prices = prices or {}
+        self.transfer_calls = []
+        self.failed_transfer_windows = []
+
+    def get_transfers(self, date_from, date_to=None):
+        self.transfer_calls.append((date_from, date_to))
+        return [t for t in self.transfers if t['date'] >= date_from]
+
+    def get_transfers_frame(self, date_from, date_to=None, raw_sink=None):
+        transfers = self.get_transfers(date_from, date_to)
+        if raw_sink and transfers:
+            raw_sink(transfers)
+        return transfers_frame(transfers)
+
+    def get_ticket_price(self, ticker):
+        return [{'short_ticker': ticker, 'term': '48hs', 'last': self.prices.get(ticker)}]
+
+
+class FakeSpreadsheet:
+    """Spreadsheet that records values_append calls on its connector."""
+
+    def __init__(self, connector):
+        self.connector = connector
+
+    def values_append(self, range_name, params, body):
+        self.connector.appended.append((range_name.split('!')[0].strip("'"), body['values']))
+
+    def values_batch_update(self, body):
+        for item in body['data']:
+            self.connector.grid[int(re.search(r'!A(\d+):', item['range']).group(1))] = item['values'][0]
+
+    def values_get(self, range_name):
+        tab = range_name.split('!')[0].strip("'")
+        return {'values': [row for name, rows in self.connector.appended if name == tab for row in rows]}
+
+
+class FakeSheet:
+    def __init__(self, connector):
+        self.spreadsheet = FakeSpreadsheet(connector)
+
+
+class FakeSheetConnector:
+    """Sheet connector that keeps appended rows in memory."""
+
+    def __init__(self):
+        self.appended = []
+        self.grid = {}
+        self.sheet = FakeSheet(self)
+
+    def read_sheet_data(self, tab_name=None, skiprows=0, output_format='list'):
+        self.reads = getattr(self, 'reads', 0) + 1
+        rows = [row for _, data in self.appended for row in data]
+        return rows if output_format == 'list' else pd.DataFrame(rows[1:], columns=rows[0] if rows else None)
+
+
+def transfer(transfer_id, ticker, tipo, date, quantity, price):
+    signed_quantity = quantity if tipo == 'BUY' else -quantity
+    return {'id': transfer_id, 'ticker': ticker, 'type': tipo, 'date': date,
+            'quantity': signed_quantity, 'price': price, 'amount': -signed_quantity * price}
+
+
+@pytest.fixture
+def make_trading(tmp_path, monkeypatch):
+    """Build a Trading instance wired to in-memory fakes."""
+    monkeypatch.setattr(trading, 'SYNC_STATE_FILE', str(tmp_path / 'sync_state.json'))
+
+    sheet_connector = FakeSheetConnector()
+
+    def factory(cocos):
+        instance = Trading.__new__(Trading)
+        instance.account = AccountProfile(None, 'user', 'pass')
+        instance.cocos = cocos
+        instance.sheet_connector = sheet_connector
+        instance.price_service = PriceService(cocos)
+        instance.transfer_store = None
+        instance.portfolio_store = None
+        instance.monthly_performance = None
+        instance.sync_state_file = trading.SYNC_STATE_FILE
+        instance.dedup_index = DedupIndex(str(tmp_path / 'dedup_index.json'))
+        instance.sheet_writer = BatchSheetWriter(sheet_connector, WriteJournal(str(tmp_path / 'sheet_journal.jsonl')))
+        instance.upsert_writer = None
+        return instance
+
+    return factory
+
+
+class TestIncrementalSync:
+    """Test the incremental sync with a local high-water mark."""
+
+    def test_second_run_only_fetches_new_transfers(self, make_trading):
+        """Test that a later run starts at the stored date and closes the stored open lot."""
+        cocos = FakeCocos([transfer(1, 'GGAL', 'BUY', '2023-01-02', 10, 100)], prices={'GGAL': 110})
+        first_run = make_trading(cocos)
+        first_run.get_and_save_new_movements('2022-09-01')
+        first_run.flush_writes()
+
+        cocos.transfers.append(transfer(2, 'GGAL', 'SELL', '2023-01-05', 10, 120))
+        second_run = make_trading(cocos)
+        second_run.get_and_save_new_movements('2022-09-01')
+        second_run.flush_writes()
+
+        assert cocos.transfer_calls == [('2022-09-01', None), ('2023-01-02', None)]
+        header = second_run.sheet_connector.appended[0][1][0]
+        closed = second_run.sheet_connector.appended[1][1]
+        assert len(closed) == 1
+        assert closed[0][header.index('Estado')] == 'Cerrada'
+        assert closed[0][header.index('Ticker')] == 'GGAL'
+
+    def test_already_processed_transfers_are_skipped(self, make_trading):
+        """Test that transfers of the watermark day are not processed twice."""
+        cocos = FakeCocos([transfer(1, 'GGAL', 'BUY', '2023-01-02', 10, 100)], prices={'GGAL': 110})
+        first_run = make_trading(cocos)
+        first_run.get_and_save_new_movements('2022-09-01')
+        first_run.flush_writes()
+
+        cocos.transfers.append(transfer(2, 'GGAL', 'SELL', '2023-01-02', 10, 120))
+        second_run = make_trading(cocos)
+        second_run.get_and_save_new_movements('2022-09-01')
+        second_run.flush_writes()
+
+        closed = second_run.sheet_connector.appended[1][1]
+        assert len(closed) == 1
+        assert closed[0][0] == 'Cerrada'
+        state = trading.SyncState(trading.SYNC_STATE_FILE)
+        state.load()
+        assert state.open_buys.empty
+
+
+    def test_identical_partial_closes_in_separate_runs_keep_their_rows(self, make_trading, tmp_path):
+        """Test that two equal partial sells of one buy, synced in different runs, are both written in upsert mode."""
+        cocos = FakeCocos([transfer(1, 'GGAL', 'BUY', '2023-01-02T10:00:00', 10, 100)], prices={'GGAL': 110})
+        sells = [transfer(2, 'GGAL', 'SELL', '2023-02-01T10:00:00', 4, 120),
+                 transfer(3, 'GGAL', 'SELL', '2023-02-01T10:00:00', 4, 120)]
+
+        for new_transfers in ([], sells[:1], sells[1:]):
+            cocos.transfers += new_transfers
+            run = make_trading(cocos)
+            run.upsert_writer = SheetUpsertWriter(run.sheet_connector, 'Operaciones',
+                                                  PositionRowIndex(str(tmp_path / 'position_index.json')),
+                                                  run.sheet_writer)
+            run.get_and_save_new_movements('2022-09-01')
+            run.flush_writes()
+
+        grid = run.sheet_connector.grid
+        header = grid[1]
+        positions = sorted((row[header.index('Estado')], row[header.index('Cantidad')], row[header.index('Id Venta')])
+                           for number, row in grid.items() if number > 1 and any(row))
+        assert positions == [('Abierta', 2, ''), ('Cerrada', 4, '2'), ('Cerrada', 4, '3')]
+
+
+class TestDeduplication:
+    """Test that already inserted operations are filtered with the local index."""
+
+    def test_rows_are_not_inserted_twice(self, make_trading):
+        """Test that a second full run inserts nothing and does not read the sheet again."""
+        cocos = FakeCocos([
+            transfer(1, 'GGAL', 'BUY', '2023-01-02', 10, 100),
+            transfer(2, 'GGAL', 'SELL', '2023-01-05', 10, 120),
+        ])
+        instance = make_trading(cocos)
+        instance.get_and_save_range_movements('2022-09-01')
+        instance.flush_writes()
+        instance.get_and_save_range_movements('2022-09-01')
+        instance.flush_writes()
+
+        assert len(instance.sheet_connector.appended) == 1
+        assert instance.sheet_connector.reads == 1
+
+    def test_rebuild_from_sheet_uses_header_row(self, make_trading):
+        """Test that a lost index is rebuilt from the sheet and the header is not repeated."""
+        cocos = FakeCocos([transfer(1, 'GGAL', 'BUY', '2023-01-02', 10, 100)], prices={'GGAL': 110})
+        instance = make_trading(cocos)
+        instance.get_and_save_range_movements('2022-09-01')
+        instance.flush_writes()
+
+        os.remove(instance.dedup_index.path)
+        instance.dedup_index = DedupIndex(instance.dedup_index.path)
+        cocos.transfers.append(transfer(2, 'YPFD', 'BUY', '2023-01-03', 5, 200))
+        instance.get_and_save_range_movements('2022-09-01')
+        instance.flush_writes()
+
+        new_rows = instance.sheet_connector.appended[1][1]
+        assert len(new_rows) == 1
+        assert new_rows[0][1] == 'YPFD'
+
+
+def test_save_operations_logs_each_discarded_position(make_trading, caplog):
+    """Test that every position that cannot be converted is logged with its row, ticker, column and value."""
+    instance = make_trading(FakeCocos([]))
+    data = pd.DataFrame([
+        {'buy_ticker': 'GGAL', 'buy_date': '2023-01-02T10:00:00', 'buy_quantity': 10, 'buy_price': 100.0,
+         'buy_amount': -1000.0, 'sell_date': None, 'sell_amount': None},
+        {'buy_ticker': 'YPFD', 'buy_date': 'ayer', 'buy_quantity': 5, 'buy_price': 200.0,
+         'buy_amount': -1000.0, 'sell_date': None, 'sell_amount': None},
+    ])
+
+    with caplog.at_level(logging.WARNING, logger='trading'):
+        instance.save_operations(data)
+
+    assert "Posición descartada: fila 1 | ticker YPFD | columna buy_date | valor 'ayer'" in caplog.messages
+    assert len(instance.sheet_writer) == 1
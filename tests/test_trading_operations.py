@@ -0,0 +1,133 @@
+"""Tests for trading_operations module."""
+
+import pandas as pd
+import pytest
+from trading_operations import TradingOperations
+
+
+def make_transfers(rows):
+    """Build buys and sells DataFrames from (ticker, type, date, quantity, price) tuples."""
+    records = []
+    for ticker, tipo, date, quantity, price in rows:
+        signed_quantity = quantity if tipo == 'BUY' else -quantity
+        records.append({
+            'ticker': ticker,
+            'type': tipo,
+            'date': date,
+            'quantity': signed_quantity,
+            'price': price,
+            'amount': -signed_quantity * price,
+        })
+    df = pd.DataFrame(records)
+    return df[df['type'] == 'BUY'], df[df['type'] == 'SELL']
+
+
+class TestMatchExacto:
+    """Test exact matching of buys and sells."""
+
+    def test_pairs_same_ticker_and_quantity(self):
+        """Test that a buy is matched with a sell of the same ticker and quantity."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+            ('GGAL', 'SELL', '2023-01-05', 10, 120),
+        ])
+        ops = TradingOperations()
+        ops._match_exacto(buys, sells)
+
+        assert len(ops.posiciones_cerradas) == 1
+        row = ops.posiciones_cerradas.iloc[0]
+        assert row['buy_date'] == '2023-01-02'
+        assert row['sell_date'] == '2023-01-05'
+        assert row['observacion'] == 'Match exacto.'
+        assert ops.non_matched_buys.empty
+        assert ops.non_matched_sells.empty
+
+    def test_first_free_sell_is_used(self):
+        """Test that repeated quantities are paired in order of appearance."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+            ('GGAL', 'BUY', '2023-01-03', 10, 101),
+            ('GGAL', 'SELL', '2023-01-05', 10, 120),
+            ('GGAL', 'SELL', '2023-01-06', 10, 121),
+        ])
+        ops = TradingOperations()
+        ops._match_exacto(buys, sells)
+
+        assert ops.posiciones_cerradas['buy_date'].tolist() == ['2023-01-02', '2023-01-03']
+        assert ops.posiciones_cerradas['sell_date'].tolist() == ['2023-01-05', '2023-01-06']
+
+    def test_unmatched_rows_keep_their_index(self):
+        """Test that rows without an exact match are kept with their original index."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+            ('YPFD', 'BUY', '2023-01-03', 5, 200),
+            ('GGAL', 'SELL', '2023-01-05', 10, 120),
+            ('YPFD', 'SELL', '2023-01-06', 3, 210),
+        ])
+        ops = TradingOperations()
+        ops._match_exacto(buys, sells)
+
+        assert len(ops.posiciones_cerradas) == 1
+        assert ops.non_matched_buys.index.tolist() == [1]
+        assert ops.non_matched_sells.index.tolist() == [3]
+
+    def test_different_ticker_is_not_matched(self):
+        """Test that the same quantity on a different ticker is not matched."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+            ('YPFD', 'SELL', '2023-01-05', 10, 120),
+        ])
+        ops = TradingOperations()
+        ops._match_exacto(buys, sells)
+
+        assert ops.posiciones_cerradas.empty
+        assert len(ops.non_matched_buys) == 1
+        assert len(ops.non_matched_sells) == 1
+
+
+class TestMatchFifo:
+    """Test FIFO matching of the transfers left after exact matching."""
+
+    def test_accumulated_buys_are_closed_lot_by_lot(self):
+        """Test that a sell larger than every buy consumes the oldest lots first."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 3, 100),
+            ('GGAL', 'BUY', '2023-01-03', 7, 110),
+            ('GGAL', 'SELL', '2023-01-05', 10, 120),
+        ])
+        cerradas, abiertas, ventas = TradingOperations().analizar_match(buys, sells)
+
+        assert cerradas['buy_quantity'].tolist() == [3, 7]
+        assert cerradas['sell_quantity'].tolist() == [-3, -7]
+        assert cerradas['sell_amount'].tolist() == pytest.approx([360, 840])
+        assert abiertas.empty
+        assert ventas.empty
+
+    def test_partial_fill_leaves_open_remainder(self):
+        """Test that a partial sell splits the lot and keeps the rest open."""
+        buys, sells = make_transfers([
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+            ('GGAL', 'SELL', '2023-01-05', 4, 120),
+        ])
+        cerradas, abiertas, ventas = TradingOperations().analizar_match(buys, sells)
+
+        assert len(cerradas) == 1
+        assert cerradas.iloc[0]['buy_quantity'] == 4
+        assert cerradas.iloc[0]['buy_amount'] == pytest.approx(-400)
+        assert cerradas.iloc[0]['observacion'] == 'Match FIFO parcial.'
+        assert abiertas['quantity'].tolist() == [6]
+        assert abiertas['amount'].tolist() == pytest.approx([-600])
+        assert abiertas.index.tolist() == buys.index.tolist()
+        assert ventas.empty
+
+    def test_sell_without_previous_buy_stays_unmatched(self):
+        """Test that a sell dated before any buy of the ticker is not matched."""
+        buys, sells = make_transfers([
+            ('GGAL', 'SELL', '2023-01-01', 4, 120),
+            ('GGAL', 'BUY', '2023-01-02', 10, 100),
+        ])
+        cerradas, abiertas, ventas = TradingOperations().analizar_match(buys, sells)
+
+        assert cerradas.empty
+        assert abiertas['quantity'].tolist() == [10]
+        assert ventas['quantity'].tolist() == [-4]
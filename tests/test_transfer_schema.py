@@ -0,0 +1,75 @@
+"""Tests for transfer_schema module."""
+
+import pandas as pd
+from transfer_schema import TransferColumns, apply_transfer_schema, concat_transfer_frames, split_transfers, \
+    transfers_frame
+
+
+def transfer(transfer_id, ticker, tipo, date, quantity=10, price=100.0):
+    return {'id': transfer_id, 'ticker': ticker, 'type': tipo, 'date': date,
+            'quantity': quantity, 'price': price, 'amount': -quantity * price}
+
+
+class TestTypedFrame:
+    """Test the typed conversion of API transfers."""
+
+    def test_columns_get_compact_types(self):
+        """Test that ticker/type are categorical, date is datetime64 and amounts are numeric."""
+        df = transfers_frame([transfer(1, 'GGAL', 'BUY', '2023-01-02T10:00:00'),
+                              transfer(2, 'GGAL', 'SELL', '2023-01-05T09:00:00', quantity=-10)])
+
+        assert isinstance(df['ticker'].dtype, pd.CategoricalDtype)
+        assert isinstance(df['type'].dtype, pd.CategoricalDtype)
+        assert pd.api.types.is_datetime64_any_dtype(df['date'])
+        assert df['quantity'].tolist() == [10, -10]
+        assert df['id'].astype(str).tolist() == ['1', '2']
+
+    def test_missing_and_extra_fields(self):
+        """Test that missing fields become NaN/None, extra fields are kept and missing ids are not floats."""
+        df = transfers_frame([{'id': 1, 'ticker': 'GGAL', 'type': 'DEPOSIT', 'date': 'no es fecha'},
+                              dict(transfer(None, 'YPFD', 'BUY', '2023-01-03'), extra={'market': 'BCBA'})])
+
+        assert df['date'].isna().tolist() == [True, False]
+        assert df['quantity'].isna().tolist() == [True, False]
+        assert df['extra'].tolist() == [None, {'market': 'BCBA'}]
+        assert df['id'].astype(str).tolist()[0] == '1'
+
+    def test_columns_match_apply_schema(self):
+        """Test that streaming rows into columns gives the same frame as typing a whole DataFrame."""
+        rows = [transfer(1, 'GGAL', 'BUY', '2023-01-02'), transfer(2, 'AL30', 'SELL', '2023-01-03')]
+        streamed = TransferColumns()
+        for row in rows:
+            streamed.add(row)
+
+        pd.testing.assert_frame_equal(streamed.to_frame(), apply_transfer_schema(pd.DataFrame(rows)))
+
+    def test_concat_keeps_categories(self):
+        """Test that concatenating windows with different tickers keeps the categorical dtype."""
+        df = concat_transfer_frames([transfers_frame([transfer(1, 'GGAL', 'BUY', '2023-01-02')]),
+                                     transfers_frame([transfer(2, 'YPFD', 'SELL', '2023-02-02')])])
+
+        assert isinstance(df['ticker'].dtype, pd.CategoricalDtype)
+        assert df['ticker'].tolist() == ['GGAL', 'YPFD']
+
+
+class TestSplitTransfers:
+    """Test the single-pass split by transfer type."""
+
+    def test_split_keeps_order_and_index(self):
+        """Test that buys, sells and the rest keep their original order and index."""
+        df = transfers_frame([transfer(1, 'GGAL', 'SELL', '2023-01-02'), transfer(2, 'GGAL', 'BUY', '2023-01-03'),
+                              transfer(3, 'ARS', 'DEPOSIT', '2023-01-04'), transfer(4, 'YPFD', 'BUY', '2023-01-05')])
+
+        buys, sells, others = split_transfers(df)
+
+        assert buys.index.tolist() == [1, 3]
+        assert sells.index.tolist() == [0]
+        assert others['type'].tolist() == ['DEPOSIT']
+
+    def test_split_untyped_frame(self):
+        """Test that a frame with 'object' types and missing types is also split."""
+        df = pd.DataFrame({'type': ['BUY', None, 'SELL', 'BUY']})
+
+        buys, sells, others = split_transfers(df)
+
+        assert (buys.index.tolist(), sells.index.tolist(), others.index.tolist()) == ([0, 3], [2], [1])
@@ -0,0 +1,60 @@
+"""Tests for transfer_store module."""
+
+import pytest
+from transfer_store import TransferStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransferStore(str(tmp_path / 'transfers.sqlite'))
+
+
+def transfer(transfer_id, ticker, date, quantity=10):
+    return {'id': transfer_id, 'ticker': ticker, 'type': 'BUY', 'date': date,
+            'quantity': quantity, 'price': 100, 'amount': -quantity * 100, 'extra': {'market': 'BCBA'}}
+
+
+class TestTransferStore:
+    """Test the local SQLite transfer store."""
+
+    def test_append_is_idempotent_by_id(self, store):
+        """Test that appending the same transfer twice keeps a single copy with the latest data."""
+        store.append([transfer(1, 'GGAL', '2023-01-02')])
+        store.append([transfer(1, 'GGAL', '2023-01-02', quantity=5), transfer(2, 'YPFD', '2023-01-03')])
+
+        df = store.load()
+        assert store.count() == 2
+        assert df['quantity'].tolist() == [5, 10]
+
+    def test_load_preserves_raw_fields(self, store):
+        """Test that nested fields from the API response are returned unchanged."""
+        store.append([transfer(1, 'GGAL', '2023-01-02')])
+        assert store.load().iloc[0]['extra'] == {'market': 'BCBA'}
+
+    def test_load_filters_by_date_and_ticker(self, store):
+        """Test date range (inclusive, with time of day) and ticker filters."""
+        store.append([
+            transfer(1, 'GGAL', '2023-01-02T10:00:00'),
+            transfer(2, 'YPFD', '2023-01-05T15:30:00'),
+            transfer(3, 'GGAL', '2023-01-09T11:00:00'),
+        ])
+
+        assert store.load(since='2023-01-03', until='2023-01-05')['id'].tolist() == [2]
+        assert store.load(tickers=['GGAL'])['id'].tolist() == [1, 3]
+
+    def test_transfers_without_id_get_content_key(self, store):
+        """Test that transfers without an id are deduplicated by content."""
+        record = transfer(None, 'GGAL', '2023-01-02')
+        del record['id']
+        store.append([record])
+        store.append([record])
+        assert store.count() == 1
+
+    def test_transfers_with_and_without_id_are_all_kept(self, store):
+        """Test that transfers missing an id in a batch with ids get their own content key instead of 'nan'."""
+        store.append([transfer(1, 'GGAL', '2023-01-02'), transfer(None, 'YPFD', '2023-01-03'),
+                      transfer(None, 'GGAL', '2023-01-04')])
+        store.append([transfer(None, 'YPFD', '2023-01-03')])
+
+        assert store.count() == 3
+        assert store.load()['id'].tolist()[0] == 1
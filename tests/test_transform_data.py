@@ -0,0 +1,71 @@
+"""Tests for transform_data module."""
+
+import pandas as pd
+from transform_data import build_unique_key, filter_already_inserted, build_template_df, convert_to_template_format, \
+    formula_dias, TEMPLATE_COLUMNS
+
+
+class TestDeduplicationKey:
+    """Test the vectorized deduplication key."""
+
+    def test_integer_quantities_match_sheet_text(self):
+        """Test that 10.0 from the DataFrame and '10' from the sheet build the same key."""
+        df = pd.DataFrame({'Estado': ['Abierta'], 'Ticker': ['GGAL'], 'Cantidad': [10.0]})
+        sheet = pd.DataFrame({'Estado': ['Abierta'], 'Ticker': ['GGAL'], 'Cantidad': ['10']})
+        assert build_unique_key(df).tolist() == build_unique_key(sheet).tolist() == ['Abierta_GGAL_10']
+
+    def test_filter_already_inserted(self):
+        """Test that rows already present in the sheet are removed."""
+        df = pd.DataFrame({'Estado': ['Abierta', 'Cerrada'], 'Ticker': ['GGAL', 'GGAL'], 'Cantidad': [10, 10]})
+        sheet = pd.DataFrame({'Estado': ['Abierta'], 'Ticker': ['GGAL'], 'Cantidad': ['10']})
+        assert filter_already_inserted(df, sheet)['Estado'].tolist() == ['Cerrada']
+
+
+def positions():
+    closed = pd.DataFrame({
+        'buy_ticker': ['GGAL'], 'buy_date': ['2023-01-02T10:00:00'], 'buy_quantity': [10], 'buy_price': [100.0],
+        'buy_amount': [-1000.0], 'sell_date': ['2023-01-05T09:00:00'], 'sell_amount': [1200.0],
+        'observacion': ['Match FIFO.'],
+    })
+    opened = pd.DataFrame({
+        'buy_ticker': ['AL30'], 'buy_date': ['2023-01-01'], 'buy_quantity': [3], 'buy_price': [50.0],
+        'buy_amount': [-150.0], 'buy_Precio Hoy': [55.0],
+    })
+    return pd.concat([closed, opened], ignore_index=True)
+
+
+class TestBuildTemplate:
+    """Test the vectorized position builder."""
+
+    def test_open_and_closed_positions(self):
+        """Test the template columns for an open and a closed position."""
+        rows = convert_to_template_format(positions())
+        header = rows[0]
+        opened, closed = (dict(zip(header, row)) for row in rows[1:])
+
+        assert header == TEMPLATE_COLUMNS
+        assert (opened['Estado'], opened['Rentabilidad ARs'], opened['Rentabilidad a HOY %']) == ('Abierta', 15.0, 10.0)
+        assert opened['Dias'] == formula_dias()
+        assert opened['Ars Cierre'] == ' '
+        assert (closed['Estado'], closed['Dias'], closed['Rentabilidad Ars'], closed['Rentabilidad %']) == \
+            ('Cerrada', 2, 200.0, 20.0)
+        assert closed['Rentabilidad ARs'] == ''
+
+    def test_days_keep_their_type_in_mixed_frames(self):
+        """Test that a closed position writes the same integer days with or without open positions in the frame."""
+        mixed = build_template_df(positions())
+        only_closed = build_template_df(positions().iloc[:1])
+
+        dias = [df.loc[df['Estado'] == 'Cerrada', 'Dias'].tolist() for df in (mixed, only_closed)]
+        assert [repr(value) for value in dias[0] + dias[1]] == ['2', '2']
+
+    def test_invalid_rows_go_to_error_report(self):
+        """Test that a row with an invalid date is reported instead of becoming an empty row."""
+        df = positions()
+        df.loc[1, 'buy_date'] = 'not a date'
+        errores = []
+
+        template = build_template_df(df, errores)
+
+        assert template['Ticker'].tolist() == ['GGAL']
+        assert errores == [{'fila': 1, 'ticker': 'AL30', 'columna': 'buy_date', 'valor': 'not a date'}]
@@ -0,0 +1,66 @@
+import json
+import os
+from log_config import get_logger
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography es opcional: sin él no se persiste la sesión.
+    Fernet = None
+    InvalidToken = Exception
+
+logger = get_logger(__name__)
+
+
+class TokenStore:
+    """
+    Guarda la sesión de Cocos (token, refresh token, vencimiento y account_id) en un archivo cifrado.
+
+    El archivo se cifra con Fernet usando la clave indicada, que se genera una sola vez con
+    `Fernet.generate_key()`. Si falta la clave o el paquete `cryptography` no está instalado, el store
+    queda deshabilitado y nunca escribe los tokens en texto plano.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self._fernet = None
+
+        if not key:
+            logger.info("TokenStore deshabilitado: no hay clave de cifrado configurada.")
+        elif Fernet is None:
+            logger.warning("TokenStore deshabilitado: falta el paquete 'cryptography'.")
+        else:
+            self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+
+    @property
+    def enabled(self):
+        return self._fernet is not None
+
+    def load(self):
+        """Devuelve los datos de sesión guardados, o None si no hay o no se pueden descifrar."""
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                return json.loads(self._fernet.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken) as e:
+            logger.warning("No se pudo leer la sesión guardada en %s: %s", self.path, e)
+            return None
+
+    def save(self, session_data):
+        """Cifra y guarda los datos de sesión, con permisos sólo para el usuario actual."""
+        if not self.enabled:
+            return
+        encrypted = self._fernet.encrypt(json.dumps(session_data).encode())
+        tmp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encrypted)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("No se pudo guardar la sesión en %s: %s", self.path, e)
+
+    def clear(self):
+        """Borra la sesión guardada."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,34 +1,116 @@
+import datetime
+import tempfile
+import daily_total
 import transform_data
-from config import USER, PASS, GOOGLE_SHEET_FILE, SHEET_TAB, JSONGOOGLEFILE, prefix_buy
+from config import prefix_buy, config
+from accounts import SharedResources, load_accounts
+from helpers import dry_run_copy
 from cocos import CocosCapital
-from gspreadmanager import GoogleSheetConector
-from transform_data import filter_already_inserted, filter_another_operations_df, separate_transfers_by_type_df, get_now_str, prepare_dates_for_insert
+from transform_data import filter_another_operations_df, separate_transfers_by_type_df, prepare_dates_for_insert, \
+    transfer_ids, last_transfer_day, empty_transfers_df
 from log_config import get_logger
 from trading_operations import TradingOperations
+from price_service import PriceService
+from token_store import TokenStore
+from sync_state import SyncState
+from transfer_store import TransferStore
+from portfolio_store import PortfolioStore
+from monthly_performance import MonthlyPerformance
+from dedup_index import DedupIndex
+from sheet_upsert import SheetUpsertWriter, PositionRowIndex
+from sheet_writer import BatchSheetWriter, DryRunSheetWriter, WriteJournal
+from instrumentation import timed
+from settings import PRICE_FETCH_WORKERS, TOKEN_STORE_FILE, TOKEN_STORE_KEY, SYNC_STATE_FILE, TRANSFER_STORE_FILE, \
+    DEDUP_INDEX_FILE, SHEET_WRITE_MODE, POSITION_INDEX_FILE, SHEET_JOURNAL_FILE, PORTFOLIO_STORE_FILE, \
+    MONTHLY_PERFORMANCE_FILE
 import pandas as pd
 logger = get_logger(__name__)
 
 
 class Trading:
-    def __init__(self):
-        self.cocos = CocosCapital(USER, PASS)
-        self.sheet_connector = GoogleSheetConector(GOOGLE_SHEET_FILE, JSONGOOGLEFILE, SHEET_TAB)
-
-    def insert_data(self, data, tab_name=SHEET_TAB):
+    def __init__(self, dry_run=False, account=None, resources=None):
+        """
+        Args:
+            dry_run (bool): Simulación. Las escrituras a la planilla se acumulan en un DryRunSheetWriter sin
+                enviarse, y el estado de sincronización y los índices se usan desde copias temporales, así
+                la simulación no los modifica.
+            account (AccountProfile): Cuenta a sincronizar. Por defecto la cuenta única de config.py.
+            resources (SharedResources): Cliente de Google Sheets, cache de precios y limitador compartidos
+                con otras cuentas. Por defecto se crean para esta instancia.
+        """
+        self.account = account or load_accounts()[0]
+        resources = resources or SharedResources.from_settings()
+
+        state_files = [self.account.state_file(path) for path in (SYNC_STATE_FILE, DEDUP_INDEX_FILE,
+                                                                   POSITION_INDEX_FILE, MONTHLY_PERFORMANCE_FILE)]
+        # El histórico del portfolio es uno solo para todas las cuentas
+        portfolio_store_file = PORTFOLIO_STORE_FILE
+        if dry_run:
+            state_dir = tempfile.mkdtemp(prefix='cocos_sync_dry_run_')
+            state_files = [path and dry_run_copy(path, state_dir) for path in state_files]
+            portfolio_store_file = portfolio_store_file and dry_run_copy(portfolio_store_file, state_dir)
+        self.sync_state_file, dedup_index_file, position_index_file, monthly_performance_file = state_files
+        self.portfolio_store = PortfolioStore(portfolio_store_file) if portfolio_store_file else None
+
+        # Los logins se hacen de a uno: los códigos 2FA de todas las cuentas llegan a la misma casilla
+        with resources.login_lock:
+            token_store = TokenStore(self.account.state_file(TOKEN_STORE_FILE), TOKEN_STORE_KEY)
+            self.cocos = CocosCapital(self.account.user, self.account.password, token_store=token_store)
+        self.sheet_connector = resources.sheets.connector(self.account.sheet_file, self.account.sheet_tab)
+        self.price_cache = resources.price_cache
+        self.price_service = PriceService(self.cocos, max_workers=PRICE_FETCH_WORKERS, cache=self.price_cache)
+        transfer_store_file = self.account.state_file(TRANSFER_STORE_FILE)
+        self.transfer_store = TransferStore(transfer_store_file) if transfer_store_file else None
+        self.dedup_index = DedupIndex(dedup_index_file)
+        if dry_run:
+            self.sheet_writer = DryRunSheetWriter()
+        else:
+            self.sheet_writer = BatchSheetWriter(self.sheet_connector,
+                                                 WriteJournal(self.account.state_file(SHEET_JOURNAL_FILE)),
+                                                 resources.limiter)
+        self.monthly_performance = MonthlyPerformance(monthly_performance_file, self.account.monthly_tab) \
+            if monthly_performance_file else None
+        if self.monthly_performance and not dry_run:
+            # Crea la solapa del rendimiento mensual si no existe
+            resources.sheets.worksheet(self.account.sheet_file, self.account.monthly_tab)
+        self.upsert_writer = SheetUpsertWriter(self.sheet_connector, self.account.sheet_tab,
+                                               PositionRowIndex(position_index_file),
+                                               self.sheet_writer) if SHEET_WRITE_MODE == 'upsert' else None
+
+    def insert_data(self, data, tab_name=None):
+        tab_name = tab_name or self.account.sheet_tab
         if len(data) > 0:
             logger.info("insert_data Insertando %s operaciones", len(data))
-            self.sheet_connector.spreadsheet_append(data, tab_name)
+            self.sheet_writer.append(tab_name, data)
         else:
             logger.info("No hay datos para insertar. Largo Data: %s", len(data))
 
-    def get_and_filter_transfers(self, since, to=None):
+    def flush_writes(self):
+        """
+        Envía a Google Sheets todas las escrituras encoladas en la ejecución, junto con las que hayan
+        quedado pendientes de ejecuciones anteriores. Devuelve False si alguna quedó pendiente.
+        """
+        return self.sheet_writer.flush()
+
+    def get_and_filter_transfers(self, since, to=None, source='api'):
+        """
+        Obtiene las transferencias y las separa en compras, ventas y el resto.
 
-        # Obtengo las transferencias (compras y ventas) de la API
-        transfers = self.cocos.get_transfers(since, to)
-        logger.info("Main.py Transferencias obtenidas: %s", len(transfers))
+        Con source='api' las pide a Cocos y las guarda en el TransferStore local; con source='store'
+        las lee del TransferStore, sin llamadas a la API.
+        """
+        if source == 'store':
+            transfers = self.transfer_store.load(since, to)
+            logger.info("Main.py Transferencias leídas del store local: %s", len(transfers))
+        else:
+            # Obtengo las transferencias (compras y ventas) de la API, ya tipadas; cada ventana cruda se guarda
+            # en el TransferStore a medida que llega
+            raw_sink = self.transfer_store.append if self.transfer_store else None
+            transfers = self.cocos.get_transfers_frame(since, to, raw_sink=raw_sink)
+            logger.info("Main.py Transferencias obtenidas: %s", len(transfers))
 
-        # Convertir la lista de diccionarios a DataFrame
-        transfers = pd.DataFrame(transfers)
+        if transfers.empty:
+            transfers = empty_transfers_df()
 
         # Filtro las operaciones que no son ni compra ni venta.
         transfers = filter_another_operations_df(transfers)
@@ -42,26 +124,139 @@ class Trading:
 
         return buys_df, sells_df, restante_df
 
-    def get_and_save_range_movements(self, since, to=None):
+    def get_and_save_range_movements(self, since, to=None, source='api'):
 
-        buys_df, sells_df, restante_df = self.get_and_filter_transfers(since, to)
+        buys_df, sells_df, restante_df = self.get_and_filter_transfers(since, to, source)
 
         data = self.procesar_operaciones(buys_df, sells_df, restante_df)
 
-        # Convierte la data al formato del template de la planilla
-        data = transform_data.convert_to_template_format(data)
+        self.save_operations(data)
+
+    def save_operations(self, data):
+
+        # Convierte la data al formato del template de la planilla; las posiciones descartadas se informan una a una
+        errores = []
+        data = transform_data.build_template_df(data, errores)
+        for error in errores:
+            logger.warning("Posición descartada: fila %s | ticker %s | columna %s | valor %r",
+                           error['fila'], error['ticker'], error['columna'], error['valor'])
+        self.update_monthly_performance(data)
+
+        # En modo upsert cada posición se escribe en su fila: las cerradas y los precios se actualizan en el lugar
+        if self.upsert_writer:
+            self.upsert_writer.upsert(data)
+            return
+
+        # Las planillas del modo append conservan sus columnas: los ids sólo hacen falta para el upsert
+        data = data.drop(columns=transform_data.POSITION_ID_COLUMNS)
 
         # Filtro para dejar solo operaciones aun no insertadas.
         data = self.filter_new_operations(data)
 
-        # Insertar
-        self.insert_data(data)
+        # Insertar y registrar en el índice las operaciones insertadas
+        rows = transform_data.dataframe_to_rows(data, include_header=not self.dedup_index.has_header) if len(data) else []
+        self.insert_data(rows)
+        if len(data) > 0:
+            self.dedup_index.add(data)
+            self.dedup_index.has_header = True
+            self.dedup_index.save()
+
+    def update_monthly_performance(self, positions):
+        """
+        Actualiza los agregados por mes con las posiciones del template y el histórico de totales diarios, y
+        encola en la solapa de rendimiento mensual sólo las filas de los meses que cambiaron.
+
+        Las posiciones abiertas de 'positions' tienen que ser todas las abiertas (como en cada sincronización):
+        su resultado a hoy es el no realizado del mes actual. Los meses anteriores a la primera sincronización
+        se completan con un backfill.
+        """
+        if not self.monthly_performance:
+            return
+        self.monthly_performance.load()
+
+        daily_totals = None
+        if self.portfolio_store:
+            # Sólo hacen falta los totales desde el último mes conocido: los meses anteriores ya están cerrados
+            months = self.monthly_performance.months()
+            daily_totals = self.portfolio_store.account_series(self.account.name,
+                                                               since=f"{months[-1]}-01" if months else None)
+
+        current_month = datetime.date.today().strftime('%Y-%m')
+        touched = self.monthly_performance.update(positions, current_month, daily_totals)
+        self.monthly_performance.write(self.sheet_writer, touched)
+        self.monthly_performance.save()
+
+    def get_and_save_new_movements(self, since, to=None):
+        """
+        Sincronización incremental: procesa sólo las transferencias nuevas desde la última ejecución.
+
+        Usa el estado guardado en self.sync_state_file (marca de agua y lotes abiertos). Pide a la API las
+        transferencias desde la última fecha procesada (o desde 'since' en la primera ejecución), descarta
+        las que ya se procesaron y las empareja junto con los lotes que habían quedado abiertos. El estado
+        se guarda recién después de insertar, así una ejecución fallida se vuelve a procesar completa.
+        """
+        state = SyncState(self.sync_state_file)
+        if state.load():
+            since = state.last_date
+
+        buys_df, sells_df, restante_df = self.get_and_filter_transfers(since, to)
+
+        # Las transferencias del día de la marca de agua se vuelven a pedir: descartar las ya procesadas
+        buys_df = buys_df[~transfer_ids(buys_df).isin(state.seen_ids)]
+        sells_df = sells_df[~transfer_ids(sells_df).isin(state.seen_ids)]
+        nuevas = pd.concat([buys_df, sells_df])
+        logger.info("Transferencias nuevas desde %s: %s", since, len(nuevas))
+
+        last_date = last_transfer_day(nuevas)
+        seen_ids = []
+        if last_date:
+            dias = pd.to_datetime(nuevas[config['fecha']]).dt.strftime('%Y-%m-%d')
+            seen_ids = transfer_ids(nuevas)[dias == last_date].tolist()
+
+        # Sumar los lotes que habían quedado abiertos en la ejecución anterior
+        buys_df = pd.concat([state.open_buys, buys_df], ignore_index=True)
+        sells_df = pd.concat([state.open_sells, sells_df], ignore_index=True)
+
+        operaciones_cerradas, remaining_buys, remaining_sells = TradingOperations().analizar_match(buys_df, sells_df)
+        data = self.unir_operaciones(operaciones_cerradas, remaining_buys)
+
+        self.save_operations(data)
+
+        # Si faltó alguna ventana de movimientos, no avanzar la marca de agua: la próxima ejecución la reintenta
+        if self.cocos.failed_transfer_windows:
+            logger.warning("No se actualiza el estado de sincronización: faltaron las ventanas %s",
+                           self.cocos.failed_transfer_windows)
+            return
+
+        state.update(last_date, seen_ids, remaining_buys, remaining_sells)
+        state.save()
+
+    def refresh_open_prices(self):
+        """
+        Actualiza el 'Precio Hoy' de las posiciones abiertas sin pedir transferencias a la API.
+
+        Usa los lotes abiertos del estado de sincronización incremental y sólo tiene efecto en el modo
+        'upsert', donde cada posición abierta se reescribe en su fila.
+        """
+        if not self.upsert_writer:
+            logger.warning("La actualización de precios requiere SHEET_WRITE_MODE = 'upsert'.")
+            return
+
+        state = SyncState(self.sync_state_file)
+        if not state.load() or state.open_buys.empty:
+            logger.info("No hay posiciones abiertas para actualizar.")
+            return
+
+        self.save_operations(self.procesar_operaciones_abiertas(state.open_buys))
 
     def procesar_operaciones(self, buys_df, sells_df, restante_df):
 
         operaciones = TradingOperations()
         operaciones_cerradas, remaining_buys, remaining_sells = operaciones.analizar_match(buys_df, sells_df)
 
+        return self.unir_operaciones(operaciones_cerradas, remaining_buys)
+
+    def unir_operaciones(self, operaciones_cerradas, remaining_buys):
         # No deberia quedar reimaining_sells. Si hay remainings_buys son operaciones abiertas.
         operaciones_abiertas = self.procesar_operaciones_abiertas(remaining_buys)
 
@@ -69,18 +264,28 @@ class Trading:
 
         return data
 
+    @timed('dedup')
     def filter_new_operations(self, data):
-        # Filtro las operaciones que ya fueron insertadas en el spreadsheet
-        already_inserted = self.sheet_connector.read_sheet_data(tab_name=SHEET_TAB, output_format='pandas')
-
-        # Comprobar si hay datos ya insertados
-        if len(already_inserted) > 0:
-            data = filter_already_inserted(data, already_inserted)
+        # Filtro las operaciones que ya fueron insertadas, usando el índice local de deduplicación
+        if not self.dedup_index.load():
+            self.rebuild_dedup_index()
+
+        if len(self.dedup_index) > 0 and len(data) > 0:
+            already_inserted = self.dedup_index.contains(data)
+            logger.info("Operaciones ya insertadas: %s | A insertar: %s", sum(already_inserted),
+                        len(data) - sum(already_inserted))
+            data = data[[not inserted for inserted in already_inserted]]
         else:
             logger.info("No hay datos previamente insertados.")
 
         return data
 
+    def rebuild_dedup_index(self):
+        """Reconstruye el índice de deduplicación leyendo la planilla completa."""
+        sheet_rows = self.sheet_connector.read_sheet_data(tab_name=self.account.sheet_tab, output_format='list')
+        self.dedup_index.rebuild(sheet_rows)
+        self.dedup_index.save()
+
     def procesar_operaciones_abiertas(self, remaining_buys):
 
         # Obtener el precio de las operaciones abiertas
@@ -92,64 +297,20 @@ class Trading:
         return remaining_buys
 
     def get_price_for_open_operations(self, remaining_buys):
-        # Definir una función lambda que obtenga el precio usando el servicio de precios
-        get_price = lambda ticker: self.get_price_for_ticker(ticker)
+        # Consultar una sola vez cada ticker, en paralelo, y asignar el precio a cada operación abierta
+        prices = self.price_service.get_prices(remaining_buys['ticker'])
 
-        # Aplicar la función a la columna 'ticker' para obtener los precios
-        remaining_buys['Precio Hoy'] = remaining_buys['ticker'].apply(get_price)
-
-        return remaining_buys
+        return remaining_buys.assign(**{'Precio Hoy': remaining_buys['ticker'].map(prices)})
 
     def get_price_for_ticker(self, ticker, term="48hs"):
-        price_data = self.cocos.get_ticket_price(ticker)
-        if price_data:
-            price = next((subtipo['last'] for subtipo in price_data if
-                          subtipo['short_ticker'] == ticker and subtipo['term'] == term), None)
-            return price
-        return None
+        return self.price_service.get_price(ticker, term)
 
     def insert_total_daily(self):
         """
-        Inserta los totales diarios de la cuenta en una hoja de cálculo de Google Sheets.
+        Encola el total diario de la cuenta (ARS y USD) para la solapa del total diario de la cuenta, y
+        guarda la foto del portfolio en el histórico local.
 
-        Esta función recupera el total actual de la cuenta en ARS y USD, formatea la fecha actual
-        y los montos numéricos para asegurarse de que se inserten correctamente en Google Sheets,
-        y registra cada paso del proceso para facilitar la depuración. En caso de errores durante
-        la inserción, estos se registran con detalles completos para diagnóstico.
-
-        Args:
-            self: Referencia a la instancia actual de la clase.
-
-        Raises:
-            Exception: Captura cualquier excepción que ocurra durante la recuperación de los totales,
-                       el formateo de datos o la inserción en Google Sheets, y registra el error.
-
-        Returns:
-            None: La función no devuelve ningún valor, pero inserta los datos en Google Sheets.
+        Ver daily_total.insert_total_daily: los datos se envían a Google Sheets con flush_writes.
         """
-        try:
-            # Obtiene el total de la cuenta desde el objeto `cocos`
-            total = self.cocos.get_account_total()
-
-            # Obtiene la fecha y hora actual en formato de cadena
-            now_str = get_now_str()
-
-            # Registra en el log los datos antes de insertarlos
-            logger.debug(f"Fecha: {now_str}, Total ARS: {total['ars']}, Total USD: {total['usd']}")
-
-            # Formatea los números para reducir la precisión a dos decimales
-            ars_formatted = round(total['ars'], 2)
-            usd_formatted = round(total['usd'], 2)
-
-            # Prepara los datos para ser insertados en una lista de listas
-            to_insert = [[now_str, ars_formatted, usd_formatted]]
-
-            # Registra en el log los datos formateados que se van a insertar
-            logger.debug(f"Datos preparados para insertar: {to_insert}")
-
-            # Añade los datos formateados a la hoja de cálculo en Google Sheets
-            self.sheet_connector.spreadsheet_append(to_insert, 'Total diario')
-
-        except Exception as e:
-            # Registra un mensaje de error en caso de fallar la inserción de datos
-            logger.error("Error al insertar datos en Google Sheets", exc_info=True)
\ No newline at end of file
+        daily_total.insert_total_daily(self.cocos, self.sheet_writer, self.account.total_tab,
+                                       self.portfolio_store, self.account.name)
\ No newline at end of file
@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
-from log_config import get_logger
+from log_config import get_logger, log_frame
+from lot_ledger import LotLedger
+from instrumentation import timed
 from config import prefix_buy, prefix_sell, config
 logger = get_logger(__name__)
-pd.set_option('display.max_rows', None)
 
 class TradingOperations:
     def __init__(self):
@@ -16,208 +18,97 @@ class TradingOperations:
         self.non_matched_buys = pd.DataFrame()
         self.non_matched_sells = pd.DataFrame()
 
+    @timed('matching')
     def analizar_match(self, buys_df, sells_df):
         # Realizar la coincidencia exacta de transacciones
         self._match_exacto(buys_df, sells_df)
 
-        # Si hay transacciones no coincidentes, intentar una coincidencia acumulada
+        # Lo que no coincidió exactamente se empareja con el ledger FIFO por ticker
         if not self.non_matched_buys.empty and not self.non_matched_sells.empty:
-            self._match_acumulado()
+            self._match_fifo()
         else:
-            logger.info("No hay transacciones no coincidentes para coincidencia acumulada.")
-
-        if not self.non_matched_buys.empty or not self.non_matched_sells.empty:
-            self._match_ventas_acumuladas()
+            logger.info("No hay transacciones no coincidentes para el match FIFO.")
 
         # Retornar las posiciones cerradas y las transacciones no coincidentes (por ende abiertas)
         return self.posiciones_cerradas, self.non_matched_buys, self.non_matched_sells
 
     def _match_exacto(self, buys_df, sells_df):
+        """
+        Empareja compras y ventas con el mismo ticker y la misma cantidad (con signo opuesto).
+
+        En lugar de recorrer las compras y escanear todas las ventas por cada una, numera las
+        ocurrencias de cada par (ticker, cantidad) en ambos lados y hace un único merge sobre
+        (ticker, cantidad, ocurrencia). La n-ésima compra de un par queda emparejada con la
+        n-ésima venta del mismo par, que es lo mismo que tomar siempre la primera venta libre.
+        """
+        ticker_col = self.config['ticker']
+        cantidad_col = self.config['cantidad']
+
+        buy_keys = self._claves_de_match(buys_df[ticker_col], buys_df[cantidad_col])
+        # Las ventas vienen con cantidad negativa: se invierte el signo para compararlas con las compras.
+        sell_keys = self._claves_de_match(sells_df[ticker_col], -sells_df[cantidad_col])
+
+        pares = buy_keys.merge(sell_keys, on=['ticker', 'cantidad', 'ocurrencia'], suffixes=('_buy', '_sell'))
+        pares = pares.sort_values('posicion_buy', kind='stable')
 
-        # Inicializar DataFrame para coincidencias exactas
-        matched_df = pd.DataFrame()
-        # To do: matched_df lo puedo mover al init asi lo inicializo una sola vez. Pero usaria una linea igual para resetearlo?
-
-        # Iterar sobre buys_df para encontrar matches exactos
-        for buy_index, buy_row in buys_df.iterrows():
-            sell_match = sells_df[
-                (sells_df['quantity'] == -buy_row['quantity']) &
-                (sells_df[self.config['ticker']] == buy_row[self.config['ticker']])
-            ]
-            if not sell_match.empty:
-                sell_index = sell_match.index[0]
-                # Agregar prefijos a las columnas para identificar compra y venta
-                buy_row_prefixed = buy_row.add_prefix('buy_')
-                sell_row_prefixed = sell_match.iloc[0].add_prefix('sell_')
-                matched_row = pd.concat([buy_row_prefixed, sell_row_prefixed], axis=0).to_frame().T
-                matched_df = pd.concat([matched_df, matched_row], ignore_index=True)
-
-                # Eliminar las filas emparejadas
-                sells_df = sells_df.drop(sell_index)
-                buys_df = buys_df.drop(buy_index)
+        # Armar el DataFrame emparejado de una sola vez, con prefijos para identificar compra y venta
+        matched_buys = buys_df.iloc[pares['posicion_buy'].to_numpy()].add_prefix('buy_').reset_index(drop=True)
+        matched_sells = sells_df.iloc[pares['posicion_sell'].to_numpy()].add_prefix('sell_').reset_index(drop=True)
+        matched_df = pd.concat([matched_buys, matched_sells], axis=1)
 
         # Log del DataFrame emparejado
-        logger.info(f"Matched DataFrame: {matched_df}")
+        log_frame(logger, "Matched DataFrame", matched_df, by=f'buy_{ticker_col}')
 
         # Añadir una observación para coincidencias exactas
         matched_df['observacion'] = "Match exacto."
 
         # Guarda las posiciones cerradas y las que no coincidieron
         self.posiciones_cerradas = matched_df
-        self.non_matched_buys = buys_df
-        self.non_matched_sells = sells_df
+        self.non_matched_buys = self._excluir_posiciones(buys_df, pares['posicion_buy'])
+        self.non_matched_sells = self._excluir_posiciones(sells_df, pares['posicion_sell'])
 
         self.log_unmatched_and_closed_positions()
 
-    def _match_acumulado(self):
-
-        #self.filter_transactions_for_debug(['CECO2', 'AGRO'])
-
-        # Ordenar los DataFrames por fecha
-        self.non_matched_buys = self.non_matched_buys.sort_values(by=self.config['fecha'])
-        self.non_matched_sells = self.non_matched_sells.sort_values(by=self.config['fecha'])
-
-        buys_to_drop = []  # Lista para almacenar índices de compras a eliminar
-        matched_df = pd.DataFrame()
-        accumulated_data = {}
-
-        for buy_index, buy_row in self.non_matched_buys.iterrows():
-            buy_ticker = buy_row.to_dict()['ticker']
-
-            if buy_ticker not in accumulated_data:
-                accumulated_data[buy_ticker] = {'quantity': 0, 'amount': 0, 'buys_used': []}
-            accumulated_data[buy_ticker]['quantity'] += buy_row[self.config['cantidad']]
-            accumulated_data[buy_ticker]['amount'] += buy_row[self.config['monto']]
-            accumulated_data[buy_ticker]['buys_used'].append(buy_index)  # Añadir esta compra a la lista de usadas
-
-            buy_quantity_accumulated = accumulated_data[buy_ticker]['quantity']
-            buy_amount_accumulated = accumulated_data[buy_ticker]['amount']
-
-            logger.debug(
-                f"Acumulando compra: {buy_ticker} | cantidad: {buy_row.to_dict()['quantity']} | monto: {buy_row[self.config['monto']]} | buy_quantity_accumulated: {buy_quantity_accumulated} | buy_amount_accumulated: {buy_amount_accumulated}")
-
-            matching_sells = self.non_matched_sells[self.non_matched_sells['ticker'] == buy_ticker].copy()
-
-            sells_to_drop = []
-            for sell_index, sell_row in matching_sells.iterrows():
-                sell_quantity = abs(sell_row[self.config['cantidad']])
-
-                if buy_quantity_accumulated == sell_quantity:
-                    logger.debug(f"Match registrado. {buy_ticker} | {sell_quantity}")
-
-                    matched_buy_amount = (sell_quantity / buy_quantity_accumulated) * buy_amount_accumulated
-
-                    buy_row_prefixed = buy_row.add_prefix('buy_')
-                    buy_row_prefixed['buy_' + self.config['cantidad']] = buy_quantity_accumulated
-                    buy_row_prefixed['buy_' + self.config['monto']] = matched_buy_amount
-
-                    sell_row_prefixed = sell_row.add_prefix('sell_')
-                    matched_row = pd.concat([buy_row_prefixed, sell_row_prefixed], axis=0).to_frame().T
-
-                    matched_df = pd.concat([matched_df, matched_row], ignore_index=True)
-
-                    # Restablecer los acumulados después del match
-                    accumulated_data[buy_ticker]['quantity'] = 0
-                    accumulated_data[buy_ticker]['amount'] = 0
-
-                    sells_to_drop.append(sell_index)
-
-                    # Eliminamos todas las compras que se usaron para el match
-                    buys_to_drop.extend(accumulated_data[buy_ticker]['buys_used'])
-
-                    # Reiniciamos la lista de compras usadas para el próximo match
-                    accumulated_data[buy_ticker]['buys_used'] = []
-
-                    break
-
-            # Eliminar ventas que hicieron match
-            self.non_matched_sells = self.non_matched_sells.drop(sells_to_drop)
-
-        # Eliminar compras que hicieron match después del bucle principal
-        self.non_matched_buys = self.non_matched_buys.drop(buys_to_drop)
-
-        matched_df['observacion'] = "Compras acumuladas."
+    @staticmethod
+    def _claves_de_match(tickers, cantidades):
+        """
+        Arma la tabla de claves (ticker, cantidad, ocurrencia) usada por el match exacto.
+
+        'posicion' es la posición original de la fila y 'ocurrencia' cuenta cuántas veces apareció
+        antes el mismo par (ticker, cantidad). Las filas con ticker o cantidad vacíos no participan,
+        igual que en una comparación por igualdad.
+        """
+        claves = pd.DataFrame({
+            'ticker': tickers.to_numpy(),
+            'cantidad': cantidades.to_numpy(),
+            'posicion': range(len(tickers)),
+        })
+        claves = claves.dropna(subset=['ticker', 'cantidad'])
+        claves['ocurrencia'] = claves.groupby(['ticker', 'cantidad'], sort=False).cumcount()
+        return claves
+
+    @staticmethod
+    def _excluir_posiciones(df, posiciones):
+        """Devuelve el DataFrame sin las filas en las posiciones indicadas, conservando orden e índice."""
+        mask = np.ones(len(df), dtype=bool)
+        mask[posiciones.to_numpy()] = False
+        return df[mask]
+
+    def _match_fifo(self):
+        """
+        Empareja las compras y ventas restantes con un ledger FIFO por ticker.
+
+        Reemplaza las pasadas de compras acumuladas y ventas acumuladas: en una sola recorrida por fecha
+        consume las ventas contra los lotes de compra más antiguos, partiendo lotes en los cierres parciales.
+        """
+        ledger = LotLedger(self.config)
+        matched_df, self.non_matched_buys, self.non_matched_sells = ledger.match(
+            self.non_matched_buys, self.non_matched_sells)
 
         self.posiciones_cerradas = pd.concat([self.posiciones_cerradas, matched_df], ignore_index=True)
 
         self.log_unmatched_and_closed_positions()
 
-    def _match_ventas_acumuladas(self):
-        # Ordenar los DataFrames por fecha
-        self.non_matched_buys = self.non_matched_buys.sort_values(by=self.config['fecha'])
-        self.non_matched_sells = self.non_matched_sells.sort_values(by=self.config['fecha'])
-
-        sells_to_drop = []  # Lista para almacenar índices de ventas a eliminar
-        matched_df = pd.DataFrame()
-        accumulated_data = {}
-
-        for sell_index, sell_row in self.non_matched_sells.iterrows():
-            sell_ticker = sell_row['ticker']
-
-            if sell_ticker not in accumulated_data:
-                accumulated_data[sell_ticker] = {'quantity': 0, 'amount': 0, 'indices': [], 'last_date': None}
-            accumulated_data[sell_ticker]['quantity'] += abs(sell_row[self.config['cantidad']])
-            accumulated_data[sell_ticker]['amount'] += sell_row[self.config['monto']]
-            accumulated_data[sell_ticker]['indices'].append(sell_index)
-            accumulated_data[sell_ticker]['last_date'] = sell_row[self.config['fecha']]
-
-            sell_quantity_accumulated = accumulated_data[sell_ticker]['quantity']
-            sell_amount_accumulated = accumulated_data[sell_ticker]['amount']
-
-            logger.debug(
-                f"Acumulando venta: {sell_ticker} | cantidad: {sell_row[self.config['cantidad']]} |"
-                f"Cantidad Acumulada: {sell_quantity_accumulated} | Monto Acumulado: {sell_amount_accumulated}"
-            )
-
-            # Calcular el precio promedio ponderado por unidad de las ventas acumuladas
-            average_price_per_unit = sell_amount_accumulated / sell_quantity_accumulated if sell_quantity_accumulated != 0 else 0
-
-            # Filtrar las compras correspondientes al ticker actual
-            matching_buys = self.non_matched_buys[self.non_matched_buys['ticker'] == sell_ticker].copy()
-
-            buys_to_drop = []
-            for buy_index, buy_row in matching_buys.iterrows():
-                buy_quantity = buy_row[self.config['cantidad']]
-                logger.info("Comparando compra con venta: %s | %s", buy_quantity, sell_quantity_accumulated)
-                if sell_quantity_accumulated == buy_quantity:
-                    logger.info(f"Match registrado. {sell_ticker} | {buy_quantity}")
-
-                    matched_sell_amount = sell_quantity_accumulated * average_price_per_unit
-
-                    sell_row_prefixed = buy_row.add_prefix('sell_')
-                    sell_row_prefixed['sell_' + self.config['cantidad']] = sell_quantity_accumulated
-                    sell_row_prefixed['sell_' + self.config['monto']] = matched_sell_amount
-                    sell_row_prefixed['sell_' + self.config['fecha']] = accumulated_data[sell_ticker]['last_date']
-
-                    buy_row_prefixed = buy_row.add_prefix('buy_')
-                    matched_row = pd.concat([sell_row_prefixed, buy_row_prefixed], axis=0).to_frame().T
-
-                    matched_df = pd.concat([matched_df, matched_row], ignore_index=True)
-
-                    # Restablecer los acumulados después del match
-                    accumulated_data[sell_ticker]['quantity'] = 0
-                    accumulated_data[sell_ticker]['amount'] = 0
-
-                    buys_to_drop.append(buy_index)
-
-                    # Eliminamos todas las compras que se usaron para el match
-                    sells_to_drop.extend(accumulated_data[sell_ticker]['indices'])
-
-                    # Reiniciamos la lista de compras usadas para el próximo match
-                    accumulated_data[sell_ticker]['indices'] = []
-
-                    break
-
-            # Eliminar compras que hicieron match después del bucle principal
-            self.non_matched_buys = self.non_matched_buys.drop(buys_to_drop)
-
-        # Eliminar ventas que hicieron match
-        self.non_matched_sells = self.non_matched_sells.drop(sells_to_drop)
-
-        matched_df['observacion'] = "Ventas acumuladas."
-
-        self.posiciones_cerradas = pd.concat([self.posiciones_cerradas, matched_df], ignore_index=True)
-
     def filter_transactions_for_debug(self, tickers_to_debug):
         """Filtra las transacciones de compra y venta por tickers específicos para depuración."""
         self.non_matched_buys = self.non_matched_buys[
@@ -227,9 +118,10 @@ class TradingOperations:
 
     def log_unmatched_and_closed_positions(self):
         """Registra en el log las compras y ventas no emparejadas, y las posiciones cerradas."""
-        logger.info(f"Non matched buys: {self.non_matched_buys}")
-        logger.info(f"Non matched sells: {self.non_matched_sells}")
-        logger.info(f"Posiciones cerradas: {self.posiciones_cerradas}")
+        ticker_col = self.config['ticker']
+        log_frame(logger, "Non matched buys", self.non_matched_buys, by=ticker_col)
+        log_frame(logger, "Non matched sells", self.non_matched_sells, by=ticker_col)
+        log_frame(logger, "Posiciones cerradas", self.posiciones_cerradas, by=f'buy_{ticker_col}')
 
 
 # Todo: Manejo de dividendos
@@ -0,0 +1,154 @@
+"""
+Esquema tipado de las transferencias de la API de Cocos.
+
+En lugar de armar un DataFrame con columnas 'object' a partir de la lista completa de diccionarios, las
+transferencias se acumulan por columna a medida que se leen y se convierten una sola vez a tipos compactos:
+ticker y tipo categóricos, fecha datetime64 y cantidades y montos numéricos.
+"""
+import numpy as np
+import pandas as pd
+from config import config
+
+# Tipo de cada columna conocida: 'category', 'datetime', 'numeric', 'id' (int64 si todos los ids son enteros,
+# si no 'object') u 'object' (se deja como viene). Las columnas que no están en el esquema quedan como 'object'.
+TRANSFER_SCHEMA = {
+    'id': 'id',
+    config['ticker']: 'category',
+    'type': 'category',
+    config['fecha']: 'datetime',
+    config['cantidad']: 'numeric',
+    config['precio']: 'numeric',
+    config['monto']: 'numeric',
+}
+
+# Grupo de cada tipo de transferencia en split_transfers: compras, ventas y el resto
+TYPE_GROUPS = {'BUY': 0, 'SELL': 1}
+OTHER_GROUP = 2
+
+
+def numeric_array(values):
+    """Los valores como array numérico de numpy si ya son todos números (int o float), si no None."""
+    try:
+        array = np.asarray(values)
+    except (TypeError, ValueError):
+        return None
+    return array if array.ndim == 1 and array.dtype.kind in 'if' else None
+
+
+def convert_column(values, kind):
+    """Convierte una columna (lista o array) al tipo del esquema. Lo que no se puede convertir queda NaN/NaT."""
+    if kind == 'category':
+        return pd.Series(values, dtype='category')
+    if kind == 'datetime':
+        return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', format='ISO8601')
+    array = numeric_array(values) if kind in ('numeric', 'id') else None
+    if kind == 'numeric':
+        return pd.Series(array) if array is not None else pd.to_numeric(pd.Series(values, dtype=object),
+                                                                        errors='coerce')
+    if kind == 'id' and array is not None and array.dtype.kind == 'i':
+        # Con algún id faltante o no entero la columna queda 'object', así no se escriben como '1.0'
+        return pd.Series(array)
+    return pd.Series(values, dtype=object)
+
+
+def apply_transfer_schema(df):
+    """Devuelve el DataFrame con las columnas del esquema convertidas a su tipo (las que ya lo tienen no cambian)."""
+    converted = {}
+    for column, kind in TRANSFER_SCHEMA.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == 'category' and isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if kind == 'datetime' and pd.api.types.is_datetime64_any_dtype(series):
+            continue
+        if kind in ('numeric', 'id') and pd.api.types.is_numeric_dtype(series):
+            continue
+        converted[column] = convert_column(series.to_numpy(dtype=object), kind).set_axis(df.index)
+    return df.assign(**converted) if converted else df
+
+
+class TransferColumns:
+    """
+    Acumula transferencias (diccionarios) por columna, para convertirlas a un DataFrame tipado sin guardar
+    la lista completa de diccionarios. Las columnas que faltan en una transferencia quedan en None.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, transfer):
+        for column, values in self.columns.items():
+            values.append(transfer.get(column))
+        if not self.columns.keys() >= transfer.keys():
+            for column in transfer.keys() - self.columns.keys():
+                self.columns[column] = [None] * self.rows + [transfer[column]]
+        self.rows += 1
+
+    def extend(self, transfers):
+        for transfer in transfers:
+            self.add(transfer)
+        return self
+
+    def to_frame(self):
+        """DataFrame tipado con las columnas del esquema primero, en su orden, y después el resto."""
+        if not self.rows:
+            return empty_transfers_frame()
+        ordered = [column for column in TRANSFER_SCHEMA if column in self.columns]
+        ordered += [column for column in self.columns if column not in TRANSFER_SCHEMA]
+        return pd.DataFrame({column: convert_column(self.columns[column], TRANSFER_SCHEMA.get(column, 'object'))
+                             for column in ordered})
+
+
+def transfers_frame(transfers):
+    """DataFrame tipado a partir de una lista (o iterable) de transferencias."""
+    return TransferColumns().extend(transfers).to_frame()
+
+
+def empty_transfers_frame():
+    """DataFrame de transferencias vacío, con las columnas y los tipos del esquema."""
+    return pd.DataFrame({column: convert_column([], kind) for column, kind in TRANSFER_SCHEMA.items()
+                         if kind != 'id'})
+
+
+def concat_transfer_frames(frames):
+    """
+    Concatena DataFrames tipados conservando las columnas categóricas (pd.concat las pasa a 'object' si las
+    categorías difieren entre partes).
+    """
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return empty_transfers_frame()
+    categorical = [column for column in frames[0].columns if isinstance(frames[0][column].dtype, pd.CategoricalDtype)]
+    for column in categorical:
+        categories = pd.Index(sorted(set().union(*(frame[column].cat.categories for frame in frames
+                                                    if column in frame.columns))))
+        frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)})
+                  if column in frame.columns else frame for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def split_transfers(df):
+    """
+    Separa las transferencias en compras, ventas y el resto con una sola pasada por la columna 'type'.
+
+    Con 'type' categórico sólo se clasifican las categorías (pocas) y cada fila toma el grupo de su código.
+    Cada parte conserva el orden y el índice original.
+    """
+    if isinstance(df['type'].dtype, pd.CategoricalDtype):
+        categories = df['type'].cat.categories
+        codes = df['type'].cat.codes.to_numpy()
+    else:
+        codes, categories = pd.factorize(df['type'])
+    # El código -1 (tipo vacío) cae en la última posición: el resto
+    group_of_code = np.array([TYPE_GROUPS.get(category, OTHER_GROUP) for category in categories] + [OTHER_GROUP])
+    groups = group_of_code[codes]
+
+    order = np.argsort(groups, kind='stable')
+    bounds = np.searchsorted(groups[order], [1, 2])
+    buys, sells, others = np.split(order, bounds)
+    return df.iloc[buys], df.iloc[sells], df.iloc[others]
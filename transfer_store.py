@@ -0,0 +1,112 @@
+import datetime
+import json
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from log_config import get_logger
+from config import config
+from transfer_schema import transfers_frame
+from transform_data import transfer_ids
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    id TEXT PRIMARY KEY,
+    ticker TEXT,
+    type TEXT,
+    date TEXT,
+    quantity REAL,
+    amount REAL,
+    price REAL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transfers_date ON transfers (date);
+CREATE INDEX IF NOT EXISTS idx_transfers_ticker_date ON transfers (ticker, date);
+"""
+
+
+class TransferStore:
+    """
+    Copia local de las transferencias de la API de Cocos en una base SQLite.
+
+    Cada transferencia se guarda una sola vez, identificada por su id (o por una clave de contenido si
+    la API no trae id), junto con el JSON original para poder reconstruir exactamente la respuesta.
+    Los índices por fecha y por ticker permiten volver a procesar la historia sin pedirla a la API.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def append(self, transfers):
+        """
+        Agrega transferencias crudas (lista de diccionarios) y reemplaza las que ya estaban.
+
+        Returns:
+            int: Cantidad de transferencias escritas.
+        """
+        if not transfers:
+            return 0
+
+        df = pd.DataFrame(transfers)
+        ids = transfer_ids(df).tolist()
+        rows = [
+            (transfer_id,
+             transfer.get(config['ticker']),
+             transfer.get('type'),
+             str(transfer.get(config['fecha'])),
+             transfer.get(config['cantidad']),
+             transfer.get(config['monto']),
+             transfer.get(config['precio']),
+             json.dumps(transfer, default=str))
+            for transfer_id, transfer in zip(ids, transfers)
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+        logger.info("TransferStore: %s transferencias guardadas en %s", len(rows), self.path)
+        return len(rows)
+
+    def load(self, since=None, until=None, tickers=None):
+        """
+        Devuelve las transferencias guardadas como DataFrame tipado (ver transfer_schema), con las mismas
+        columnas que la API.
+
+        Args:
+            since (str, opcional): Fecha desde ('YYYY-MM-DD'), inclusive.
+            until (str, opcional): Fecha hasta ('YYYY-MM-DD'), inclusive.
+            tickers (list, opcional): Tickers a incluir.
+        """
+        conditions, params = [], []
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            # Las fechas pueden traer hora: se compara contra el día siguiente para incluir todo 'until'
+            next_day = datetime.date.fromisoformat(until[:10]) + datetime.timedelta(days=1)
+            conditions.append("date < ?")
+            params.append(next_day.isoformat())
+        if tickers:
+            conditions.append(f"ticker IN ({', '.join('?' * len(tickers))})")
+            params.extend(tickers)
+
+        query = "SELECT raw FROM transfers"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date, rowid"
+
+        # Las filas se convierten a columnas tipadas a medida que se leen del cursor
+        with closing(self._connect()) as conn:
+            df = transfers_frame(json.loads(raw) for (raw,) in conn.execute(query, params))
+
+        logger.info("TransferStore: %s transferencias leídas de %s", len(df), self.path)
+        return df
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM transfers").fetchone()[0]
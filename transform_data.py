@@ -1,10 +1,27 @@
-from datetime import datetime
-from log_config import get_logger
+from helpers import format_number, get_now_str
+from log_config import get_logger, log_frame
+from instrumentation import timed
+import numpy as np
 import pandas as pd
 from config import prefix_buy, prefix_sell, config
+from transfer_schema import empty_transfers_frame, split_transfers
 
 logger = get_logger(__name__)
 
+# Columnas que identifican una operación ya insertada en la planilla.
+DEDUP_KEY_COLUMNS = ['Estado', 'Ticker', 'Cantidad']
+
+# Columnas del template de operaciones de la planilla, en orden.
+TEMPLATE_COLUMNS = ['Estado', 'Ticker', 'Fecha de Apertura', 'Cantidad', 'Precio Ingreso', 'Monto Ingreso',
+                    'Precio Hoy', 'Rentabilidad a HOY %', 'Rentabilidad ARs', 'Fecha de Cierre', 'Dias', 'Ars Cierre',
+                    'Rentabilidad Ars', 'Rentabilidad %', 'Observaciones', 'Id Compra', 'Id Venta']
+
+# Ids de las transferencias de compra y venta de cada posición: la identifican en el modo upsert
+POSITION_ID_COLUMNS = ['Id Compra', 'Id Venta']
+
+# Formato de fecha y hora de la API de Cocos, con el que se escriben las fechas en la planilla.
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
 
 def filter_another_operations_df(df):
     # Crear una máscara para excluir los tickers específicos
@@ -27,47 +44,82 @@ def filter_only(transfers, ticker):
 
 
 def convert_to_template_format(df):
-    # Crear un nuevo DataFrame con las columnas requeridas
+    # Convertir DataFrame a una lista de listas, incluyendo los encabezados
+    return dataframe_to_rows(build_template_df(df))
+
+
+@timed('transform')
+def build_template_df(df, errores=None):
+    """
+    Arma el DataFrame con las columnas del template de la planilla, a partir de las posiciones emparejadas.
 
-    # Crear registros de posiciones cerradas
-    df = df.apply(crear_registro_posicion_df, axis=1)
+    Las filas que no se pueden convertir (fechas o montos inválidos) no se incluyen: se registran en el
+    log y, si se pasa una lista en 'errores', se agregan a ella (ver crear_registros_posiciones_df).
+    """
+    # Crear registros de posiciones, calculando cada columna sobre el DataFrame completo
+    df = crear_registros_posiciones_df(df, errores)
 
     # Ordenar por la columna 'Fecha de Apertura'
     df = df.sort_values(by='Fecha de Apertura')
 
     df = clean_and_prepare_dataframe(df)
+    log_frame(logger, "Posiciones para la planilla", df, by='Ticker')
 
-    # Convertir DataFrame a una lista de listas, incluyendo los encabezados
-    data_list = [df.columns.tolist()] + df.values.tolist()
+    return df
 
-    return data_list
 
+def dataframe_to_rows(df, include_header=True):
+    """Convierte el DataFrame a una lista de listas para insertar, con los encabezados como primera fila."""
+    rows = df.values.tolist()
+    return [df.columns.tolist()] + rows if include_header else rows
+
+
+def empty_transfers_df():
+    """DataFrame de transferencias vacío, con las columnas (y los tipos) que usa el resto del flujo."""
+    return empty_transfers_frame()
 
-def separate_transfers_by_type_df(df):
-    # Filtrar las compras
-    buys = df[df['type'] == 'BUY']
 
-    # Filtrar las ventas
-    sells = df[df['type'] == 'SELL']
+def transfer_ids(df):
+    """
+    Devuelve un identificador estable por transferencia.
+
+    Usa la columna 'id' de la API; las transferencias sin id (o todas, si no hay columna 'id') usan una clave
+    armada con ticker, tipo, fecha, cantidad y monto.
+    """
+    if 'id' not in df.columns:
+        return content_transfer_ids(df)
 
-    # Filtrar el resto de tipos que no son ni compra ni venta
-    restante = df[~df['type'].isin(['BUY', 'SELL'])]
+    ids = df['id']
+    text = ids.astype(str)
+    if pd.api.types.is_float_dtype(ids):
+        # Con ids faltantes la columna queda como float: los ids enteros se escriben sin '.0'
+        enteros = ids.notna() & (ids % 1 == 0)
+        text[enteros] = ids[enteros].astype('int64').astype(str).to_numpy()
+    faltantes = ids.isna()
+    if faltantes.any():
+        text[faltantes] = content_transfer_ids(df[faltantes]).to_numpy()
+    return text
 
-    return buys, sells, restante
 
+def content_transfer_ids(df):
+    """Clave de contenido de cada transferencia: ticker, tipo, fecha, cantidad y monto."""
+    columns = [config['ticker'], 'type', config['fecha'], config['cantidad'], config['monto']]
+    ids = df[columns[0]].astype(str)
+    for col in columns[1:]:
+        ids = ids + '|' + df[col].astype(str)
+    return ids
 
-def format_number(val):
-    """Convert numbers to a string with a fixed precision and replace '.' with ','."""
-    if isinstance(val, float):
-        return "{:.2f}".format(round(val, 2)).replace('.', ',')
-    if isinstance(val, int):
-        return str(val)
-    return val
 
+def last_transfer_day(df):
+    """Devuelve el día ('YYYY-MM-DD') de la transferencia más reciente, o None si no hay transferencias."""
+    if df.empty:
+        return None
+    return pd.to_datetime(df[config['fecha']]).max().strftime('%Y-%m-%d')
 
-def get_now_str():
-    now = datetime.now()
-    return now.strftime("%d-%m-%Y")
+
+def separate_transfers_by_type_df(df):
+    """Separa compras, ventas y el resto de los tipos en una sola pasada (ver transfer_schema.split_transfers)."""
+    return split_transfers(df)
 
 
 def prepare_dates_for_insert(df):
@@ -116,6 +168,106 @@ def clean_and_prepare_dataframe(df):
     return df
 
 
+def format_api_date(series):
+    """Vuelve a escribir las fechas ya convertidas a datetime64 como en la API; otras columnas quedan igual."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(API_DATE_FORMAT).astype(object)
+    return series
+
+
+def normalize_key_column(series):
+    """
+    Convierte una columna a string para armar claves, de forma que los números enteros queden igual
+    vengan del DataFrame (10.0) o de la planilla ('10').
+    """
+    text = series.astype(str)
+    numbers = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+    is_integer = numbers.notna() & (numbers % 1 == 0)
+    text[is_integer] = numbers[is_integer].astype('int64').astype(str)
+    return text
+
+
+def build_unique_key(df, key_columns=None):
+    """Arma la clave de deduplicación concatenando las columnas clave como texto, sin recorrer fila por fila."""
+    key_columns = key_columns or DEDUP_KEY_COLUMNS
+    unique_key = normalize_key_column(df[key_columns[0]])
+    for col in key_columns[1:]:
+        unique_key = unique_key + '_' + normalize_key_column(df[col])
+    return unique_key
+
+
+def normalize_date_column(series):
+    """
+    Convierte una columna de fechas a 'YYYY-MM-DD' para armar claves, tanto si viene de la API
+    ('2023-01-02T00:00:00') como si viene formateada por la planilla ('02-01-2023').
+    Los valores que no son fechas quedan como texto.
+    """
+    text = series.astype(str)
+    iso = text.str.match(r'\d{4}-')
+    dates = pd.concat([
+        pd.to_datetime(text[iso].str[:10], errors='coerce', format='%Y-%m-%d'),
+        pd.to_datetime(text[~iso], errors='coerce', format='%d-%m-%Y'),
+    ]).reindex(text.index)
+    text[dates.notna()] = dates[dates.notna()].dt.strftime('%Y-%m-%d')
+    return text
+
+
+def normalize_timestamp_column(series):
+    """
+    Convierte una columna de fechas a 'YYYY-MM-DDTHH:MM:SS' para armar claves, tanto si viene de la API
+    como si la planilla la devuelve formateada ('02-01-2023 10:00:00' o '02-01-2023').
+    Los valores vacíos quedan vacíos y los que no son fechas quedan como texto.
+    """
+    # Se trabaja por posición: el índice de las posiciones puede tener etiquetas repetidas
+    text = pd.Series(series.fillna('').astype(str).str.strip().to_numpy(), dtype=object)
+    iso = text.str.match(r'\d{4}-')
+    local = text.where(~iso).str.replace('/', '-', regex=False)
+    dates = pd.to_datetime(text.where(iso).str[:19], errors='coerce', format='ISO8601')
+    for formato in ('%d-%m-%Y %H:%M:%S', '%d-%m-%Y'):
+        dates = dates.fillna(pd.to_datetime(local, errors='coerce', format=formato))
+    text[dates.notna()] = dates[dates.notna()].dt.strftime(API_DATE_FORMAT)
+    return pd.Series(text.to_numpy(), index=series.index, dtype=object)
+
+
+def normalize_id_column(series):
+    """Convierte una columna de ids de transferencias a texto, con los ids faltantes como ''."""
+    text = normalize_key_column(series.astype(object).where(series.notna(), ''))
+    return text.where(~text.isin(['nan', 'None', '<NA>']), '')
+
+
+def build_position_key(df):
+    """
+    Arma la clave única de cada posición.
+
+    Si la posición tiene el id de su compra, la clave es '#<id compra>_<id venta>' (sin venta mientras está
+    abierta): una venta consume cada lote una sola vez, así que la clave no se repite entre ejecuciones y
+    una abierta que se cierra en parte conserva la suya. Las filas sin ids (por ejemplo, las escritas antes
+    de agregar esas columnas) usan ticker, fecha y hora de apertura, cantidad, fecha y hora de cierre y un
+    número de orden entre las filas que coinciden en todo lo anterior.
+    """
+    cierre = df['Fecha de Cierre'] if 'Fecha de Cierre' in df.columns else pd.Series('', index=df.index)
+    base = (df['Ticker'].astype(str) + '_' + normalize_timestamp_column(df['Fecha de Apertura']) + '_'
+            + normalize_key_column(df['Cantidad']) + '_' + normalize_timestamp_column(cierre))
+    contenido = base + '_' + base.groupby(base).cumcount().astype(str)
+    if 'Id Compra' not in df.columns:
+        return contenido
+
+    compra = normalize_id_column(df['Id Compra'])
+    venta = normalize_id_column(df['Id Venta']) if 'Id Venta' in df.columns else pd.Series('', index=df.index)
+    por_id = ('#' + compra + '_' + venta).to_numpy()
+    return pd.Series(np.where(compra.to_numpy() != '', por_id, contenido.to_numpy()), index=df.index, dtype=object)
+
+
+def position_lot(clave):
+    """Devuelve el lote de una clave armada con build_position_key: su compra, o su ticker y fecha de apertura."""
+    return clave.rsplit('_', 1 if clave.startswith('#') else 3)[0]
+
+
+def position_identity(clave):
+    """Devuelve la clave sin el número de orden, que sólo tienen las claves armadas sin ids."""
+    return clave if clave.startswith('#') else clave.rsplit('_', 1)[0]
+
+
 def filter_already_inserted(transfers_df, already_inserted_df):
     """
     Filtra las transferencias que ya han sido insertadas previamente para evitar duplicados.
@@ -127,7 +279,7 @@ def filter_already_inserted(transfers_df, already_inserted_df):
     Returns:
         pd.DataFrame: DataFrame de transferencias que aún no han sido insertadas.
 
-    Esta función utiliza un merge para identificar las transferencias duplicadas basadas en cinco columnas clave.
+    Compara una clave armada con las columnas de DEDUP_KEY_COLUMNS (estado, ticker y cantidad).
     """
 
     # Comprobar el tipo de datos de transfers_df y already_inserted_df
@@ -139,7 +291,7 @@ def filter_already_inserted(transfers_df, already_inserted_df):
     logger.debug("Columnas en already_inserted_df: %s", already_inserted_df.columns)
 
     # Definir las columnas clave para la comparación
-    key_columns = ['Estado', 'Ticker', 'Cantidad']
+    key_columns = DEDUP_KEY_COLUMNS
 
     # Verificar que las columnas clave existan en ambos DataFrames
     missing_columns_transfers = [col for col in key_columns if col not in transfers_df.columns]
@@ -152,22 +304,12 @@ def filter_already_inserted(transfers_df, already_inserted_df):
         logger.error("Columnas faltantes en already_inserted_df: %s", missing_columns_inserted)
         return pd.DataFrame()
 
-    # Convertir las columnas clave a string para estandarización
-    for col in key_columns:
-        if col in transfers_df.columns:
-            transfers_df[col] = transfers_df[col].astype(str)
-        if col in already_inserted_df.columns:
-            already_inserted_df[col] = already_inserted_df[col].astype(str)
-
     # Crear una clave única combinando las columnas clave
-    transfers_df['unique_key'] = transfers_df[key_columns].apply(lambda row: '_'.join(row.values), axis=1)
-    already_inserted_df['unique_key'] = already_inserted_df[key_columns].apply(lambda row: '_'.join(row.values), axis=1)
-
-    # Realizar un merge para encontrar las transferencias no duplicadas
-    filtered_transfers_df = transfers_df[~transfers_df['unique_key'].isin(already_inserted_df['unique_key'])]
+    unique_key = build_unique_key(transfers_df, key_columns)
+    already_inserted_keys = build_unique_key(already_inserted_df, key_columns)
 
-    # Eliminar la columna de clave única antes de devolver el DataFrame
-    filtered_transfers_df.drop(columns=['unique_key'], inplace=True)
+    # Quedarse con las transferencias cuya clave no está insertada
+    filtered_transfers_df = transfers_df[~unique_key.isin(already_inserted_keys)]
 
     logger.info("Total de transferencias recibidas: %s", len(transfers_df))
     logger.info("Total de transferencias ya insertadas: %s", len(already_inserted_df))
@@ -187,13 +329,6 @@ def calcular_rentabilidad_porcentaje(monto_ingreso, rentabilidad_ars):
     return (rentabilidad_ars / monto_ingreso) * 100
 
 
-def calcular_dias_entre_fechas(fecha_compra, fecha_venta):
-    # Calcular la cantidad de días entre dos fechas
-    fecha_compra = pd.to_datetime(fecha_compra)
-    fecha_venta = pd.to_datetime(fecha_venta)
-    return (fecha_venta - fecha_compra).days
-
-
 def calcular_cagr(vi, vf, dias):
     """
     Calcula la tasa de retorno anualizada (CAGR) de una inversión.
@@ -211,64 +346,108 @@ def calcular_cagr(vi, vf, dias):
     return cagr
 
 
-def crear_registro_posicion_df(row):
-    try:
-        monto_ingreso = abs(row[f"{prefix_buy}{config['monto']}"])
-        monto_egreso = row[f"{prefix_sell}{config['monto']}"]
-
-        ticker = row[f"{prefix_buy}{config['ticker']}"]
-        fecha_apertura = row[f"{prefix_buy}{config['fecha']}"]
-        cantidad = row[f"{prefix_buy}{config['cantidad']}"]
-        precio_ingreso = abs(row[f"{prefix_buy}{config['precio']}"])
-        fecha_cierre = row[f"{prefix_sell}{config['fecha']}"]
-        observaciones = row.get('observacion', '')
-        rentabilidad_ars = calcular_rentabilidad_ars(monto_ingreso, monto_egreso)
-
-        # Van a depender de si la operación está abierta o cerrada
-        dias = calcular_dias_entre_fechas(fecha_apertura, fecha_cierre)
-        rentabilidad_ars_hoy = ''
-        rentabilidad_a_hoy = ''
-
-        # Obtener el precio hoy si existe, de lo contrario dejarlo vacío
-        precio_hoy = row.get('buy_Precio Hoy', '')
-
-        # if monto_egreso is nan, then the operation is still open
-        estado = 'Abierta' if pd.isna(monto_egreso) or monto_egreso == '' else 'Cerrada'
-
-        if estado == 'Abierta':
-            dias = formula_dias()
-
-            # Calcular rentabilidad a HOY
-            if precio_hoy != '':
-                rentabilidad_ars_hoy = (precio_hoy - precio_ingreso) * cantidad
-                rentabilidad_a_hoy = calcular_rentabilidad_porcentaje(monto_ingreso, rentabilidad_ars_hoy)
-
-
-        return pd.Series({
-            'Estado': estado,
-            'Ticker': ticker,
-            'Fecha de Apertura': fecha_apertura,
-            'Cantidad': cantidad,
-            'Precio Ingreso': precio_ingreso,
-            'Monto Ingreso': monto_ingreso,
-            'Precio Hoy': precio_hoy,
-            'Rentabilidad a HOY %': rentabilidad_a_hoy,
-            'Rentabilidad ARs': rentabilidad_ars_hoy,
-            'Fecha de Cierre': fecha_cierre,
-            'Dias': dias,
-            'Ars Cierre': monto_egreso,
-            'Rentabilidad Ars': rentabilidad_ars,
-            'Rentabilidad %': calcular_rentabilidad_porcentaje(monto_ingreso, rentabilidad_ars),
-            'Observaciones': observaciones
-        })
-
-    except KeyError as e:
-        print(f"Error: clave {e} no encontrada en el DataFrame")
-        return pd.Series()
-
-    except Exception as e:
-        print(f"Error inesperado: {e}")
-        return pd.Series()
+def crear_registros_posiciones_df(df, errores=None):
+    """
+    Arma los registros del template para todas las posiciones a la vez.
+
+    Cada columna se calcula como una expresión sobre la columna completa, con una sola conversión de
+    fechas por columna. Una posición está abierta si no tiene monto de venta. Las filas con fecha de
+    apertura, cantidad, precio o monto de compra inválidos, o con una fecha de cierre o monto de venta
+    que no se pueden convertir, se descartan y se informan en 'errores' como diccionarios con la fila,
+    el ticker, la columna y el valor.
+    """
+    def columna(prefijo, clave):
+        nombre = f"{prefijo}{config[clave]}"
+        return df[nombre] if nombre in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+
+    def columna_id(prefijo):
+        nombre = f"{prefijo}id"
+        return normalize_id_column(df[nombre]) if nombre in df.columns else pd.Series('', index=df.index)
+
+    if df.empty:
+        return pd.DataFrame(columns=TEMPLATE_COLUMNS)
+
+    requeridas = [f"{prefix_buy}{config[clave]}" for clave in ('ticker', 'fecha', 'cantidad', 'precio', 'monto')]
+    faltantes = [col for col in requeridas if col not in df.columns]
+    if faltantes:
+        logger.error("Faltan las columnas %s: no se puede armar ninguna posición", faltantes)
+        if errores is not None:
+            errores.extend({'fila': idx, 'ticker': None, 'columna': faltantes[0], 'valor': None} for idx in df.index)
+        return pd.DataFrame(columns=TEMPLATE_COLUMNS)
+
+    # Una conversión por columna; lo que no se puede convertir queda como NaN/NaT
+    originales = {
+        'fecha_apertura': columna(prefix_buy, 'fecha'),
+        'fecha_cierre': columna(prefix_sell, 'fecha'),
+        'cantidad': columna(prefix_buy, 'cantidad'),
+        'precio_ingreso': columna(prefix_buy, 'precio'),
+        'monto_ingreso': columna(prefix_buy, 'monto'),
+        'monto_egreso': columna(prefix_sell, 'monto'),
+    }
+    convertidas = {
+        nombre: pd.to_datetime(original, errors='coerce', format='ISO8601') if nombre.startswith('fecha')
+        else pd.to_numeric(original, errors='coerce')
+        for nombre, original in originales.items()
+    }
+
+    # Errores: datos de compra faltantes, o valores de venta presentes que no se pudieron convertir
+    invalidas = np.zeros(len(df), dtype=bool)
+    for nombre, original in originales.items():
+        mal = convertidas[nombre].isna().to_numpy(copy=True)
+        if nombre in ('fecha_cierre', 'monto_egreso'):
+            mal &= (original.notna() & (original.astype(str) != '')).to_numpy()
+        if mal.any() and errores is not None:
+            errores.extend(
+                {'fila': idx, 'ticker': ticker, 'columna': original.name, 'valor': valor}
+                for idx, ticker, valor in zip(df.index[mal], columna(prefix_buy, 'ticker')[mal], original[mal]))
+        invalidas |= mal
+
+    if invalidas.any():
+        logger.warning("Se descartan %s posiciones que no se pudieron convertir", int(invalidas.sum()))
+        df = df[~invalidas]
+        convertidas = {nombre: convertida[~invalidas] for nombre, convertida in convertidas.items()}
+
+    fecha_apertura = convertidas['fecha_apertura']
+    fecha_cierre = convertidas['fecha_cierre']
+    cantidad = convertidas['cantidad']
+    precio_ingreso = convertidas['precio_ingreso'].abs()
+    monto_ingreso = convertidas['monto_ingreso'].abs()
+    monto_egreso = convertidas['monto_egreso']
+
+    abierta = monto_egreso.isna()
+    rentabilidad_ars = calcular_rentabilidad_ars(monto_ingreso, monto_egreso)
+
+    # Precio de hoy y rentabilidad a hoy: sólo para las abiertas
+    precio_hoy = df['buy_Precio Hoy'] if 'buy_Precio Hoy' in df.columns else pd.Series('', index=df.index)
+    rentabilidad_ars_hoy = (pd.to_numeric(precio_hoy, errors='coerce') - precio_ingreso) * cantidad
+    rentabilidad_a_hoy = calcular_rentabilidad_porcentaje(monto_ingreso, rentabilidad_ars_hoy)
+    sin_precio = abierta & (precio_hoy.astype(str) == '')
+    rentabilidad_ars_hoy = rentabilidad_ars_hoy.astype(object).where(abierta & ~sin_precio, '')
+    rentabilidad_a_hoy = rentabilidad_a_hoy.astype(object).where(abierta & ~sin_precio, '')
+
+    # Días enteros en las cerradas y la fórmula en las abiertas, con el mismo tipo sin importar la mezcla del lote
+    dias = (fecha_cierre - fecha_apertura).dt.days.astype('Int64').astype(object).where(~abierta, formula_dias())
+
+    return pd.DataFrame({
+        'Estado': np.where(abierta, 'Abierta', 'Cerrada'),
+        'Ticker': columna(prefix_buy, 'ticker').astype(object),
+        'Fecha de Apertura': format_api_date(columna(prefix_buy, 'fecha')),
+        'Cantidad': columna(prefix_buy, 'cantidad'),
+        'Precio Ingreso': precio_ingreso,
+        'Monto Ingreso': monto_ingreso,
+        'Precio Hoy': precio_hoy,
+        'Rentabilidad a HOY %': rentabilidad_a_hoy,
+        'Rentabilidad ARs': rentabilidad_ars_hoy,
+        'Fecha de Cierre': format_api_date(columna(prefix_sell, 'fecha')),
+        'Dias': dias,
+        'Ars Cierre': monto_egreso,
+        'Rentabilidad Ars': rentabilidad_ars,
+        'Rentabilidad %': calcular_rentabilidad_porcentaje(monto_ingreso, rentabilidad_ars),
+        'Observaciones': df['observacion'] if 'observacion' in df.columns else '',
+        'Id Compra': columna_id(prefix_buy),
+        'Id Venta': columna_id(prefix_sell),
+    }, index=df.index, columns=TEMPLATE_COLUMNS)
+
 
 def formula_dias():
     return '=DAYS(TODAY(); INDIRECT("C" & ROW()))'